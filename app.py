@@ -1,13 +1,17 @@
 """
 FastAPI Backend para Chatbot Turístico Huaraz
 """
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Optional
+from contextlib import asynccontextmanager
+import asyncio
 import json
+import os
+import threading
 from datetime import datetime
 from pathlib import Path
 
@@ -19,13 +23,70 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from main import ChatbotTouristico
+from src.handlers.rag_tools import get_rag_instance
+from src.utils.admission import AdmissionRejected, create_admission_controller
+from src.utils.config import load_server_config
+from src.utils.connections import ConnectionManager
+from src.utils.dedupe import RequestDeduplicator
 from src.utils.helpers import Logger
+from src.utils.session_store import get_session_store
+from src.utils.warmup import StartupWarmup
+
+
+def warm_tour_catalogue():
+    """Foto del catálogo en memoria, catálogo tipado y actualización en segundo plano"""
+    from src.rag.catalogue import get_catalogue
+    from src.rag.price_scraper import get_scraper, warm_catalogue
+    
+    scraper = get_scraper()
+    get_catalogue(scraper.tours)
+    scraper.add_price_listener(push_price_alerts)
+    warm_catalogue()
+    if not scraper.tours:
+        raise RuntimeError("No hay caché ni foto del catálogo de tours")
+
+
+def warm_http_pool():
+    """Sesión HTTP compartida (scraper, crawler y clima)"""
+    from src.rag.fetcher import get_http_session
+    
+    get_http_session()
+
+
+# Precarga al arrancar: sin el agente o el catálogo el servidor no está listo;
+# si falla el índice RAG la búsqueda web responde que no está disponible
+warmup = StartupWarmup(
+    {
+        "agent": lambda: get_chatbot(),
+        "rag": get_rag_instance,
+        "catalogue": warm_tour_catalogue,
+        "http": warm_http_pool,
+    },
+    required=["agent", "catalogue"]
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Precargar componentes en paralelo sin bloquear el arranque del servidor"""
+    if os.getenv("WARMUP_ON_STARTUP", "true").lower() != "false":
+        warmup.start()
+    else:
+        warmup.skip()
+    yield
+    warmup.stop()
+    await manager.close_all()
+    admission.close()
+    # Enviar las escrituras de historial pendientes antes de terminar el worker
+    await asyncio.to_thread(get_session_store().flush)
+
 
 # Inicializar FastAPI
 app = FastAPI(
     title="Chatbot Turístico Huaraz",
     description="Asistente virtual para turismo en Huaraz, Perú",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -44,17 +105,20 @@ app.mount("/static", StaticFiles(directory=str(static_path)), name="static")
 
 # Inicializar chatbot global
 chatbot_instance = None
+chatbot_lock = threading.Lock()
 
 def get_chatbot():
-    """Obtener instancia del chatbot"""
+    """Obtener instancia del chatbot (se construye una sola vez, normalmente en la precarga)"""
     global chatbot_instance
     if chatbot_instance is None:
-        try:
-            chatbot_instance = ChatbotTouristico(llm_provider="openai")
-            Logger.info("Chatbot inicializado correctamente")
-        except Exception as e:
-            Logger.error(f"Error al inicializar chatbot: {e}")
-            raise HTTPException(status_code=500, detail=f"Error al inicializar chatbot: {str(e)}")
+        with chatbot_lock:
+            if chatbot_instance is None:
+                try:
+                    chatbot_instance = ChatbotTouristico(llm_provider="openai", session_store=get_session_store())
+                    Logger.info("Chatbot inicializado correctamente")
+                except Exception as e:
+                    Logger.error(f"Error al inicializar chatbot: {e}")
+                    raise HTTPException(status_code=500, detail=f"Error al inicializar chatbot: {str(e)}")
     return chatbot_instance
 
 
@@ -62,41 +126,87 @@ def get_chatbot():
 class ChatMessage(BaseModel):
     message: str
     session_id: Optional[str] = "default"
+    # Id del mensaje asignado por el cliente: los reenvíos con el mismo id no repiten la consulta
+    message_id: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     response: str
     timestamp: str
     session_id: str
+    message_id: Optional[str] = None
+    duplicate: bool = False
+
 
+# Conexiones WebSocket activas por sesión. El historial de cada sesión vive en
+# el almacén de sesiones (compartido entre workers), no en este proceso
+websocket_settings = load_server_config().get("websocket") or {}
+manager = ConnectionManager(
+    queue_size=int(websocket_settings.get("queue_size", 32)),
+    send_timeout=float(websocket_settings.get("send_timeout_seconds", 5))
+)
 
-# Almacenar conexiones WebSocket activas
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.conversation_history: Dict[str, List[Dict]] = {}
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+# Límites de consultas al agente (sesión, IP, global) y pool de hilos del agente
+admission = create_admission_controller()
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+# Mensajes en curso / respondidos por (session_id, message_id)
+dedupe_settings = load_server_config().get("dedupe") or {}
+deduplicator = RequestDeduplicator(ttl=float(dedupe_settings.get("ttl_seconds", 300)))
 
-    async def send_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
 
-    def add_to_history(self, session_id: str, role: str, content: str):
-        if session_id not in self.conversation_history:
-            self.conversation_history[session_id] = []
-        self.conversation_history[session_id].append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
+# Proxies de confianza delante del servidor (Cloud Run: 1). Cada uno agrega
+# una dirección al final de X-Forwarded-For; las anteriores las elige el cliente
+trusted_proxy_hops = int(load_server_config().get("trusted_proxy_hops", 1))
+
 
+def client_ip(connection) -> Optional[str]:
+    """
+    IP del cliente para los límites por IP.
+
+    Se toma la dirección que agregó el proxy de confianza más externo
+    (trusted_proxy_hops saltos desde la derecha de X-Forwarded-For), nunca
+    las que envía el cliente; sin proxies o sin ese salto, la IP de la conexión.
+    """
+    hops = connection.headers.get("x-forwarded-for", "").split(",")
+    hops = [hop.strip() for hop in hops if hop.strip()]
+    if trusted_proxy_hops > 0 and len(hops) >= trusted_proxy_hops:
+        return hops[-trusted_proxy_hops]
+    return connection.client.host if connection.client else None
 
-manager = ConnectionManager()
+
+async def answer(session_id: str, ip: Optional[str], user_message: str, message_id: Optional[str]):
+    """
+    Respuesta del agente a un mensaje, una sola vez por message_id.
+
+    Returns:
+        (respuesta, True si el mensaje era un reenvío)
+    """
+    chatbot = get_chatbot()
+    # El agente guarda el intercambio en el historial de la sesión. Si falla,
+    # su disculpa no se guarda: un reintento vuelve a ejecutar el agente
+    result, duplicate = await deduplicator.run(
+        session_id, message_id,
+        lambda: admission.run(session_id, ip, user_message, chatbot.answer_query, user_message, session_id),
+        cacheable=lambda result: result["success"]
+    )
+    return result["response"], duplicate
+
+
+def push_price_alerts(changes: List[Dict]):
+    """Avisar a los clientes conectados de los cambios de precio de un scrape"""
+    lines = [f"{change['name']}: {change['previous_price']} → {change['price']}" for change in changes[:5]]
+    if len(changes) > 5:
+        lines.append(f"y {len(changes) - 5} tours más")
+    alert = {
+        "type": "alert",
+        "kind": "price_change",
+        "content": "Precios actualizados:\n" + "\n".join(lines),
+        "changes": changes,
+        "timestamp": datetime.now().isoformat()
+    }
+    manager.broadcast_threadsafe(json.dumps(alert, ensure_ascii=False))
+    Logger.info(f"🔔 Aviso de {len(changes)} cambios de precio a {manager.connection_count} conexiones")
 
 
 # Endpoints
@@ -119,32 +229,69 @@ async def read_root():
 
 @app.get("/health")
 async def health_check():
-    """Verificar estado del servidor"""
+    """
+    Verificar que el proceso está vivo (liveness).
+    
+    Siempre responde 200; para saber si puede recibir tráfico usar /ready.
+    """
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "chatbot_initialized": chatbot_instance is not None
+        "ready": warmup.ready,
+        "chatbot_initialized": chatbot_instance is not None,
+        "catalogue": catalogue_status()
     }
 
 
+def catalogue_status() -> Dict:
+    """Estado del catálogo de tours (el scraper se importa al primer uso)"""
+    from src.rag.price_scraper import catalogue_status as scraper_catalogue_status
+    
+    return scraper_catalogue_status()
+
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Verificar si el servidor puede recibir tráfico (readiness).
+    
+    Responde 503 hasta que la precarga del agente y del catálogo de tours
+    termine sin errores, para que el balanceador retenga el tráfico.
+    """
+    status = warmup.status()
+    status["timestamp"] = datetime.now().isoformat()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(message: ChatMessage):
+async def chat(message: ChatMessage, request: Request):
     """
     Endpoint para enviar mensajes al chatbot
+    
+    Responde 429 al superar un límite de consultas y 503 si el agente está
+    saturado, ambos con Retry-After.
     """
     try:
-        chatbot = get_chatbot()
-        response = chatbot.process_query(message.message)
-        
-        # Guardar en historial
-        manager.add_to_history(message.session_id, "user", message.message)
-        manager.add_to_history(message.session_id, "assistant", response)
+        response, duplicate = await answer(
+            message.session_id, client_ip(request), message.message, message.message_id
+        )
         
         return ChatResponse(
             response=response,
             timestamp=datetime.now().isoformat(),
-            session_id=message.session_id
+            session_id=message.session_id,
+            message_id=message.message_id,
+            duplicate=duplicate
+        )
+    except AdmissionRejected as e:
+        Logger.warning(f"⏳ /chat rechazado ({message.session_id}): {e}")
+        raise HTTPException(
+            status_code=e.status_code,
+            detail={"reason": e.reason, "retry_after": e.retry_after},
+            headers={"Retry-After": str(e.retry_after)}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         Logger.error(f"Error en /chat: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -155,15 +302,15 @@ async def get_history(session_id: str):
     """Obtener historial de conversación"""
     return {
         "session_id": session_id,
-        "history": manager.conversation_history.get(session_id, [])
+        # SQLite / Redis hacen E/S bloqueante: fuera del event loop
+        "history": await asyncio.to_thread(get_session_store().get, session_id)
     }
 
 
 @app.delete("/history/{session_id}")
 async def clear_history(session_id: str):
     """Limpiar historial de conversación"""
-    if session_id in manager.conversation_history:
-        manager.conversation_history[session_id] = []
+    await asyncio.to_thread(get_session_store().clear, session_id)
     return {"message": "Historial limpiado", "session_id": session_id}
 
 
@@ -172,8 +319,8 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """
     WebSocket para chat en tiempo real
     """
-    await manager.connect(websocket)
-    chatbot = get_chatbot()
+    await manager.connect(websocket, session_id)
+    ip = client_ip(websocket)
     
     try:
         # Mensaje de bienvenida
@@ -189,31 +336,43 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             data = await websocket.receive_text()
             message_data = json.loads(data)
             user_message = message_data.get("message", "")
+            message_id = message_data.get("message_id")
             
             if not user_message:
                 continue
             
-            # Guardar mensaje del usuario
-            manager.add_to_history(session_id, "user", user_message)
             Logger.info(f"📩 Mensaje recibido de {session_id}: {user_message[:50]}...")
             
             # Procesar con el chatbot
             try:
                 Logger.info("🤖 Procesando con el chatbot...")
-                response = chatbot.process_query(user_message)
+                response, duplicate = await answer(session_id, ip, user_message, message_id)
+                if duplicate:
+                    Logger.info(f"♻️ Mensaje reenviado {message_id}: se usa la respuesta ya calculada")
                 Logger.info(f"✅ Respuesta generada: {response[:100]}...")
                 
-                manager.add_to_history(session_id, "assistant", response)
-                
                 # Enviar respuesta
                 response_message = {
                     "type": "bot",
                     "content": response,
+                    "message_id": message_id,
                     "timestamp": datetime.now().isoformat()
                 }
                 await manager.send_message(json.dumps(response_message), websocket)
                 Logger.info("📤 Respuesta enviada al cliente")
                 
+            except AdmissionRejected as e:
+                Logger.warning(f"⏳ WebSocket rechazado ({session_id}): {e}")
+                busy_message = {
+                    "type": "busy",
+                    "content": f"{e.reason}. Intenta de nuevo en {e.retry_after} segundos.",
+                    "reason": e.reason,
+                    "retry_after": e.retry_after,
+                    "message_id": message_id,
+                    "timestamp": datetime.now().isoformat()
+                }
+                await manager.send_message(json.dumps(busy_message), websocket)
+                
             except Exception as e:
                 Logger.error(f"❌ Error en WebSocket: {str(e)}")
                 import traceback
@@ -222,6 +381,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                 error_message = {
                     "type": "error",
                     "content": f"Error al procesar tu mensaje: {str(e)}",
+                    "message_id": message_id,
                     "timestamp": datetime.now().isoformat()
                 }
                 await manager.send_message(json.dumps(error_message), websocket)
@@ -260,13 +420,18 @@ async def get_attractions():
 @app.get("/stats")
 async def get_stats():
     """Obtener estadísticas de uso"""
-    total_conversations = len(manager.conversation_history)
-    total_messages = sum(len(msgs) for msgs in manager.conversation_history.values())
+    sessions = await asyncio.to_thread(get_session_store().stats)
     
     return {
-        "total_conversations": total_conversations,
-        "total_messages": total_messages,
-        "active_connections": len(manager.active_connections),
+        "total_conversations": sessions["sessions"],
+        "total_messages": sessions["messages"],
+        "evicted_sessions": sessions.get("evicted", 0),
+        "expired_sessions": sessions.get("expired", 0),
+        "active_connections": manager.connection_count,
+        "connected_sessions": len(manager.sessions()),
+        "dropped_connections": manager.dropped,
+        "admission": admission.stats(),
+        "dedupe": deduplicator.stats(),
         "timestamp": datetime.now().isoformat()
     }
 
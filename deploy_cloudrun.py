@@ -140,9 +140,32 @@ def get_environment_variables():
         "LOG_LEVEL": "INFO"
     })
     
+    # El índice del artefacto solo sirve con el mismo backend de embeddings
+    if os.getenv("RAG_EMBEDDING_BACKEND"):
+        env_vars["RAG_EMBEDDING_BACKEND"] = os.getenv("RAG_EMBEDDING_BACKEND")
+    
     print("✅ Variables de entorno configuradas")
     return env_vars
 
+def build_data_artifact(env_vars):
+    """Construir y validar el artefacto de datos que se copia a la imagen"""
+    print("\n📦 Construyendo artefacto de datos (índice RAG + catálogo de tours)...")
+    
+    cmd = [sys.executable, "scripts/build_artifact.py"]
+    
+    # Crawl grabado: build reproducible sin descargar el sitio
+    fixtures = os.getenv("ARTIFACT_FIXTURES")
+    if fixtures:
+        cmd.extend(["--fixtures", fixtures])
+    
+    try:
+        subprocess.run(cmd, check=True, env={**os.environ, **env_vars})
+        print("✅ Artefacto de datos listo")
+    except subprocess.CalledProcessError:
+        print("❌ No se pudo construir el artefacto de datos")
+        print("   Prueba con un crawl grabado: ARTIFACT_FIXTURES=data/rag_cache/crawl")
+        sys.exit(1)
+
 def deploy_to_cloudrun(env_vars):
     """Deploy a Cloud Run"""
     print("\n🚀 Desplegando a Google Cloud Run...")
@@ -240,6 +263,7 @@ def main():
         setup_gcloud()
         enable_apis()
         env_vars = get_environment_variables()
+        build_data_artifact(env_vars)
         service_url = deploy_to_cloudrun(env_vars)
         show_next_steps(service_url)
         
@@ -3,6 +3,7 @@ Aplicación Principal del Chatbot Turístico
 """
 import sys
 from pathlib import Path
+from typing import Any, Dict, Optional
 
 # Cargar variables de entorno
 from dotenv import load_dotenv
@@ -16,17 +17,20 @@ from src.llm.base import LLMFactory
 from src.agents.touristic_agent import TouristicAgent, AgentBuilder
 from src.utils.helpers import Logger, UserPreferences, EnvironmentConfig
 from src.utils.config import ConfigLoader
+from src.utils.session_store import DEFAULT_SESSION, SessionStore
 
 
 class ChatbotTouristico:
     """Aplicación principal del chatbot turístico"""
     
-    def __init__(self, llm_provider: str = "openai"):
+    def __init__(self, llm_provider: str = "openai", session_store: Optional[SessionStore] = None):
         """
         Inicializar el chatbot.
         
         Args:
             llm_provider: Proveedor de LLM a usar (openai)
+            session_store: Almacén del historial por sesión (por defecto en memoria,
+                           app.py usa el compartido entre workers)
         """
         Logger.info("Inicializando Chatbot Turístico Huaraz...")
         
@@ -47,7 +51,8 @@ class ChatbotTouristico:
         # Crear agente
         self.agent = AgentBuilder.create_agent(
             self.llm,
-            max_iterations=self.agent_config.get("agent", {}).get("max_iterations", 10)
+            max_iterations=self.agent_config.get("agent", {}).get("max_iterations", 10),
+            session_store=session_store
         )
         
         # Preferencias del usuario
@@ -147,31 +152,48 @@ class ChatbotTouristico:
         
         print()
     
-    def process_query(self, user_input: str) -> str:
+    def process_query(self, user_input: str, session_id: str = DEFAULT_SESSION) -> str:
         """
         Procesar una consulta sin interfaz interactiva.
         
         Args:
             user_input: Pregunta del usuario
+            session_id: Conversación a la que pertenece la consulta
         
         Returns:
             Respuesta del agente
         """
+        return self.answer_query(user_input, session_id)["response"]
+    
+    def answer_query(self, user_input: str, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
+        """
+        Procesar una consulta indicando si el agente respondió o falló.
+        
+        Args:
+            user_input: Pregunta del usuario
+            session_id: Conversación a la que pertenece la consulta
+        
+        Returns:
+            success (False si el agente falló) y response (respuesta o disculpa)
+        """
         try:
             Logger.info(f"🔍 Procesando query: {user_input[:100]}...")
-            response = self.agent.process_query(user_input)
+            response = self.agent.process_query(user_input, session_id=session_id)
             
             if response["success"]:
                 Logger.info("✅ Query procesada exitosamente")
-                return response["response"]
+                return {"success": True, "response": response["response"]}
             else:
                 Logger.warning(f"⚠️ Query procesada con advertencia: {response.get('response', 'Error')}")
-                return response.get("response", "Lo siento, no pude procesar tu consulta.")
+                return {
+                    "success": False,
+                    "response": response.get("response", "Lo siento, no pude procesar tu consulta.")
+                }
         except Exception as e:
             Logger.error(f"❌ Error en process_query: {str(e)}")
             import traceback
             Logger.error(traceback.format_exc())
-            return f"Lo siento, ocurrió un error al procesar tu consulta: {str(e)}"
+            return {"success": False, "response": f"Lo siento, ocurrió un error al procesar tu consulta: {str(e)}"}
 
 
 def main():
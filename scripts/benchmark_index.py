@@ -0,0 +1,105 @@
+"""
+Benchmark de recall vs latencia de los tipos de índice vectorial
+
+Genera un corpus sintético con estructura de clusters (parecido a embeddings
+reales de páginas similares), construye cada tipo de índice y compara
+contra la búsqueda exacta (flat):
+
+    python scripts/benchmark_index.py --rows 200000 --dim 384
+"""
+import sys
+import time
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from src.rag.ann import AnnConfig, ann_search, build_ann_index
+from src.rag.index_store import normalize_rows
+
+
+def synthetic_corpus(rows: int, dim: int, clusters: int, queries: int, seed: int = 7):
+    """Vectores normalizados agrupados en clusters y consultas cercanas al corpus"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    corpus = centers[labels] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+
+    picked = rng.choice(rows, size=queries, replace=False)
+    query_set = corpus[picked] + 0.3 * rng.standard_normal((queries, dim)).astype(np.float32)
+    return normalize_rows(corpus), normalize_rows(query_set)
+
+
+def exact_search(vectors: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    """Búsqueda exacta, igual a la de ChunkIndex sin índice aproximado"""
+    scores = vectors @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def measure(search, queries: np.ndarray):
+    """Ejecutar las consultas y devolver (resultados, latencias en ms)"""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def recall_at_k(results, truth, k: int) -> float:
+    hits = sum(len(set(map(int, found[:k])) & set(map(int, expected))) for found, expected in zip(results, truth))
+    return hits / (k * len(truth))
+
+
+def print_row(name: str, params: str, build: float, latencies: np.ndarray, recall: float):
+    print(f"{name:<9} {params:<14} {build:>8.2f} {np.percentile(latencies, 50):>8.3f} "
+          f"{np.percentile(latencies, 95):>8.3f} {recall:>8.3f}")
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark de índices vectoriales (recall vs latencia)")
+    parser.add_argument('--rows', type=int, default=100000, help='Vectores en el corpus')
+    parser.add_argument('--dim', type=int, default=384, help='Dimensión de los vectores')
+    parser.add_argument('--clusters', type=int, default=500, help='Clusters del corpus sintético')
+    parser.add_argument('--queries', type=int, default=200, help='Consultas a medir')
+    parser.add_argument('-k', type=int, default=10, help='Resultados por consulta (recall@k)')
+    parser.add_argument('--types', default='ivf-flat,ivf-pq,hnsw', help='Tipos de índice a comparar')
+    args = parser.parse_args()
+
+    print(f"Corpus sintético: {args.rows} vectores x {args.dim} dims, {args.queries} consultas, k={args.k}\n")
+    vectors, queries = synthetic_corpus(args.rows, args.dim, args.clusters, args.queries)
+
+    print(f"{'índice':<9} {'parámetros':<14} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'recall':>8}")
+    print("-" * 60)
+
+    truth, latencies = measure(lambda q: exact_search(vectors, q, args.k), queries)
+    print_row("flat", "-", 0.0, latencies, 1.0)
+
+    sweeps = {
+        "ivf-flat": ("nprobe", [1, 4, 8, 16, 32]),
+        "ivf-pq": ("nprobe", [1, 4, 8, 16, 32]),
+        "hnsw": ("ef_search", [16, 32, 64, 128]),
+    }
+    for index_type in [t.strip() for t in args.types.split(",") if t.strip()]:
+        config = AnnConfig(type=index_type, min_rows=0)
+        start = time.perf_counter()
+        index = build_ann_index(vectors, config)
+        build = time.perf_counter() - start
+
+        param, values = sweeps[index_type]
+        for value in values:
+            tuned = config.with_overrides(**{param: value})
+            results, latencies = measure(
+                lambda q: ann_search(index, vectors, q, args.k, tuned)[0], queries
+            )
+            print_row(index_type, f"{param}={value}", build, latencies, recall_at_k(results, truth, args.k))
+
+
+if __name__ == "__main__":
+    main()
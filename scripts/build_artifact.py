@@ -0,0 +1,99 @@
+"""
+Construir el artefacto de datos para la imagen del contenedor
+
+Descarga el sitio con el crawler (o lee un crawl grabado), genera el índice
+RAG y el catálogo de tours en data/artifact y los valida. El Dockerfile ejecuta
+este script con --check: la imagen no se construye sin un artefacto válido
+(salvo con --build-arg ALLOW_MISSING_ARTIFACT=true, que agrega --if-present).
+
+    python scripts/build_artifact.py
+    python scripts/build_artifact.py --fixtures data/rag_cache/crawl
+    python scripts/build_artifact.py --embedding-backend local
+    python scripts/build_artifact.py --check
+    python scripts/build_artifact.py --check --if-present
+
+El backend de embeddings debe ser el mismo que usa el servidor
+(RAG_EMBEDDING_BACKEND); con "openai" se necesita OPENAI_API_KEY.
+"""
+import sys
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+import logging
+
+from src.rag.artifact import DEFAULT_ARTIFACT_DIR, ArtifactError, build_artifact, validate_artifact
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Construir el artefacto de datos (índice RAG + catálogo)")
+    parser.add_argument('--output', type=Path, default=DEFAULT_ARTIFACT_DIR, help='Directorio del artefacto')
+    parser.add_argument('--fixtures', type=Path, help='Crawl grabado (state.json + pages/) en lugar de descargar')
+    parser.add_argument('--crawl-dir', type=Path, default=Path('data/rag_cache/crawl'),
+                        help='Dónde guardar el crawl (sirve luego como --fixtures)')
+    parser.add_argument('--max-pages', type=int, default=300, help='Máximo de páginas del crawl')
+    parser.add_argument('--concurrency', type=int, default=8, help='Descargas simultáneas')
+    parser.add_argument('--embedding-backend', help='openai, local o sentence-transformers (por defecto RAG_EMBEDDING_BACKEND)')
+    parser.add_argument('--check', action='store_true', help='Solo validar el artefacto existente')
+    parser.add_argument('--if-present', action='store_true',
+                        help='Con --check: no fallar si no hay artefacto (sí si hay uno inválido); solo para desarrollo')
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    if args.check:
+        if not args.output.exists():
+            if args.if_present:
+                print(f"⚠️ Sin artefacto en {args.output}: la imagen no incluye índice RAG "
+                      f"(se usarán el caché montado y la foto del catálogo)")
+                return
+            print(f"❌ Sin artefacto en {args.output}: ejecuta python scripts/build_artifact.py "
+                  f"(o --fixtures <crawl> --embedding-backend local) antes de construir la imagen")
+            sys.exit(1)
+        try:
+            manifest = validate_artifact(args.output)
+        except ArtifactError as e:
+            print(f"❌ Artefacto inválido ({args.output}): {e}")
+            sys.exit(1)
+        print(f"✅ Artefacto {manifest.version}: {manifest.chunks} chunks, {manifest.tours} tours, "
+              f"{manifest.embedding_model}, origen {manifest.source}")
+        return
+
+    from src.rag.crawler import SiteCrawler
+
+    if args.fixtures:
+        if not (args.fixtures / "state.json").exists():
+            print(f"❌ No hay un crawl grabado en: {args.fixtures}")
+            sys.exit(1)
+        pages = SiteCrawler(state_dir=args.fixtures).pages()
+        source = f"fixtures:{args.fixtures.as_posix()}"
+    else:
+        crawler = SiteCrawler(max_pages=args.max_pages, concurrency=args.concurrency, state_dir=args.crawl_dir)
+        pages = crawler.run(resume=False)
+        source = "crawl"
+    print(f"📄 {len(pages)} páginas ({source})")
+
+    try:
+        manifest = build_artifact(args.output, pages, source, embedding_backend=args.embedding_backend)
+    except ArtifactError as e:
+        print(f"❌ No se pudo construir el artefacto: {e}")
+        sys.exit(1)
+
+    print(f"✅ Artefacto {manifest.version} en {args.output}")
+    print(f"   {manifest.pages} páginas, {manifest.chunks} chunks, {manifest.tours} tours ({manifest.embedding_model})")
+
+
+if __name__ == "__main__":
+    main()
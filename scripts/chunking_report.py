@@ -0,0 +1,98 @@
+"""
+Comparar estrategias de chunking (recursive vs structured)
+
+Usa las páginas del último crawl (scripts/crawl_site.py) o descarga las URLs
+indicadas, divide con ambas estrategias y reporta cantidad de chunks, tamaño
+estimado del índice y una medida de recuperación: para cada página se busca
+su título y se verifica si algún chunk de esa página aparece en el top-k
+(con --rerank, también con knowledge.rerank activado, para compararlos).
+Se usan embeddings locales para no llamar a la API.
+
+    python scripts/chunking_report.py
+    python scripts/chunking_report.py --rerank
+    python scripts/chunking_report.py --urls https://www.huarazturismo.com/trekking-laguna-69.php ...
+"""
+import sys
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import logging
+
+from src.rag.chunking import chunk_stats
+from src.rag.crawler import SiteCrawler
+from src.rag.fetcher import fetch_many
+from src.rag.index_store import ChunkIndex
+from src.rag.web_loader import HuarazWebRAG
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def load_pages(urls):
+    """Páginas (url, html) del último crawl o de las URLs indicadas"""
+    if urls:
+        return [(result.url, result.html) for result in fetch_many(urls) if result.ok]
+    return [(page.url, page.html) for page in SiteCrawler().pages()]
+
+
+def hit_rate(rag: HuarazWebRAG, queries, k: int, rerank: bool):
+    """Fracción de consultas cuyo top-k incluye un chunk de la página buscada"""
+    hits = 0
+    for source, query in queries:
+        results = rag.search(query, k=k, mode="hybrid", score_threshold=0.0, rerank=rerank)
+        hits += any(doc.metadata.get("source") == source for doc in results)
+    return round(hits / len(queries), 3) if queries else None
+
+
+def evaluate(strategy: str, pages, k: int, rerank: bool = False):
+    """Construir el índice con una estrategia y medir tamaño y recuperación"""
+    rag = HuarazWebRAG(embedding_backend="local")
+    rag.chunking_strategy = strategy
+    if strategy == "recursive":
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        rag.text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+
+    documents = [doc for doc in (rag.page_to_document(url, html) for url, html in pages) if doc]
+    splits = rag.split_documents(documents)
+    vectors = rag.embeddings.embed_documents([doc.page_content for doc in splits])
+    rag.vector_store = ChunkIndex.from_documents(splits, vectors, rag.embedding_model)
+    rag.build_lexical_index()
+
+    stats = chunk_stats(splits)
+    stats["index_bytes"] = stats["total_chars"] + len(splits) * rag.vector_store.manifest.dim * 4
+
+    queries = [(doc.metadata["source"], doc.metadata.get("title", "").split("|")[0].strip())
+               for doc in documents if doc.metadata.get("title")]
+    stats[f"hit@{k}"] = hit_rate(rag, queries, k, rerank=False)
+    if rerank:
+        stats[f"hit@{k} (rerank)"] = hit_rate(rag, queries, k, rerank=True)
+    return stats
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Comparar estrategias de chunking")
+    parser.add_argument('--urls', nargs='*', help='URLs a usar (por defecto las del último crawl)')
+    parser.add_argument('-k', type=int, default=3, help='Resultados por búsqueda')
+    parser.add_argument('--rerank', action='store_true', help='Medir también con re-ranking')
+    args = parser.parse_args()
+
+    pages = load_pages(args.urls)
+    if not pages:
+        print("❌ No hay páginas: ejecuta scripts/crawl_site.py o indica --urls")
+        sys.exit(1)
+
+    print(f"📄 {len(pages)} páginas\n")
+    for strategy in ("recursive", "structured"):
+        stats = evaluate(strategy, pages, args.k, rerank=args.rerank)
+        print(f"{strategy}:")
+        for key, value in stats.items():
+            print(f"   {key}: {value}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
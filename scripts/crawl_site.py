@@ -0,0 +1,58 @@
+"""
+Script para descubrir páginas de huarazturismo.com con el crawler y
+alimentar en un solo ciclo el índice RAG y el catálogo de precios
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+from src.rag.crawler import SiteCrawler
+from src.rag.price_scraper import HuarazPriceScraper
+from src.rag.web_loader import HuarazWebRAG
+import logging
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Función principal"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Crawl de huarazturismo.com")
+    parser.add_argument('--max-pages', type=int, default=300, help='Máximo de páginas por ciclo')
+    parser.add_argument('--concurrency', type=int, default=8, help='Descargas simultáneas')
+    parser.add_argument('--restart', action='store_true', help='Ignorar un ciclo interrumpido y empezar de nuevo')
+    parser.add_argument('--skip-rag', action='store_true', help='No actualizar el índice RAG')
+    parser.add_argument('--skip-prices', action='store_true', help='No actualizar el catálogo de precios')
+    args = parser.parse_args()
+    
+    load_dotenv()
+    
+    crawler = SiteCrawler(max_pages=args.max_pages, concurrency=args.concurrency)
+    pages = crawler.run(resume=not args.restart)
+    print(f"\n✅ {len(pages)} páginas descargadas ({len(crawler.state.errors)} errores)")
+    
+    if not pages:
+        sys.exit(1)
+    
+    if not args.skip_prices:
+        scraper = HuarazPriceScraper()
+        tours = scraper.load_from_pages(pages)
+        if tours:
+            scraper.save_to_cache()
+        print(f"💰 Catálogo: {len(tours)} tours")
+    
+    if not args.skip_rag:
+        rag = HuarazWebRAG()
+        ok = rag.index_pages(pages)
+        print(f"📚 Índice RAG: {'actualizado' if ok else 'sin cambios'}")
+
+
+if __name__ == "__main__":
+    main()
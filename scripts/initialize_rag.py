@@ -81,6 +81,37 @@ def initialize_rag_system(force_reload: bool = False):
         return False
 
 
+def migrate_legacy_cache() -> bool:
+    """
+    Convertir el caché antiguo (faiss_index/ + vector_store.pkl) al formato
+    versionado de data/rag_cache/index sin volver a generar embeddings.
+    
+    El formato antiguo usa pickle: solo ejecutar sobre archivos generados
+    por este mismo proyecto.
+    """
+    load_dotenv()
+    
+    from langchain_community.vectorstores import FAISS
+    from src.rag.index_store import ChunkIndex
+    
+    rag = HuarazWebRAG(openai_api_key=os.getenv("OPENAI_API_KEY") or "migration")
+    legacy_path = rag.cache_dir / "faiss_index"
+    
+    if not legacy_path.exists():
+        logger.error(f"❌ No se encontró caché antiguo en: {legacy_path}")
+        return False
+    
+    store = FAISS.load_local(str(legacy_path), rag.embeddings, allow_dangerous_deserialization=True)
+    ids = [store.index_to_docstore_id[i] for i in range(store.index.ntotal)]
+    documents = [store.docstore.search(doc_id) for doc_id in ids]
+    vectors = store.index.reconstruct_n(0, store.index.ntotal)
+    
+    rag.vector_store = ChunkIndex.from_documents(documents, vectors, rag.embedding_model)
+    rag.save_vector_store()
+    logger.info(f"✅ Migrados {len(documents)} chunks a: {rag.index_dir}")
+    return True
+
+
 def main():
     """Función principal"""
     import argparse
@@ -92,8 +123,17 @@ def main():
         help='Forzar recarga de contenido web (ignorar caché)'
     )
     
+    parser.add_argument(
+        '--migrate-legacy',
+        action='store_true',
+        help='Convertir el caché pickle antiguo al formato versionado'
+    )
+    
     args = parser.parse_args()
     
+    if args.migrate_legacy:
+        sys.exit(0 if migrate_legacy_cache() else 1)
+    
     success = initialize_rag_system(force_reload=args.force_reload)
     
     if success:
@@ -0,0 +1,78 @@
+"""
+Consultar y compactar el historial de precios de tours
+
+El historial se registra en cada scrape (scripts/scrape_prices.py,
+scripts/crawl_site.py) en data/rag_cache/price_history.sqlite.
+
+    python scripts/price_history.py latest
+    python scripts/price_history.py changes --days 7
+    python scripts/price_history.py history https://www.huarazturismo.com/trekking-laguna-69.php
+    python scripts/price_history.py compact --keep-days 30
+"""
+import sys
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from datetime import datetime
+import logging
+import time
+
+from src.rag.price_scraper import HuarazPriceScraper
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Historial de precios de tours")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("latest", help="Último precio por tour")
+    changes = subparsers.add_parser("changes", help="Cambios recientes")
+    changes.add_argument('--days', type=float, default=7, help='Días hacia atrás')
+    changes.add_argument('--all', action='store_true', help='Incluir cambios que no son de precio')
+    history = subparsers.add_parser("history", help="Serie de precios de un tour")
+    history.add_argument('tour', help='URL del tour')
+    compact = subparsers.add_parser("compact", help="Eliminar observaciones sin cambios")
+    compact.add_argument('--keep-days', type=float, default=30, help='Conservar las observaciones recientes')
+    subparsers.add_parser("stats", help="Tamaño del historial")
+    args = parser.parse_args()
+
+    store = HuarazPriceScraper().history
+
+    if args.command == "latest":
+        for row in store.latest():
+            print(f"{row['price'] or 'consultar':>10}  {format_time(row['last_changed'])}  {row['url']}")
+
+    elif args.command == "changes":
+        since = time.time() - args.days * 86400
+        rows = store.changes_since(since, price_only=not args.all)
+        print(f"📈 {len(rows)} cambios desde {format_time(since)}\n")
+        for row in rows:
+            previous = row['previous_price'] or 'nuevo'
+            print(f"{format_time(row['scraped_at'])}  {previous:>10} → {row['price'] or '-':<10}  {row['url']}")
+
+    elif args.command == "history":
+        for row in store.history(args.tour):
+            print(f"{format_time(row['scraped_at'])}  {row['price'] or '-'}")
+
+    elif args.command == "compact":
+        removed = store.compact(older_than=time.time() - args.keep_days * 86400)
+        print(f"✅ {removed} observaciones eliminadas")
+
+    else:
+        for key, value in store.stats().items():
+            if key in ("first_scrape", "last_scrape") and value:
+                value = format_time(value)
+            print(f"   {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
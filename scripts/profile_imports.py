@@ -0,0 +1,90 @@
+"""
+Perfil del tiempo de importación al arrancar
+
+Ejecuta `python -X importtime -c "import <módulo>"` en un proceso nuevo y
+lista los módulos con mayor tiempo acumulado (incluye sus dependencias).
+En Cloud Run el arranque en frío lo domina la importación de app.py.
+
+    python scripts/profile_imports.py
+    python scripts/profile_imports.py --module main --top 40
+    python scripts/profile_imports.py --prefix src.
+"""
+import sys
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from typing import List, Tuple
+import re
+import subprocess
+
+PROJECT_ROOT = Path(__file__).parent.parent
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def profile_imports(module: str) -> Tuple[float, List[Tuple[str, int, int, int]]]:
+    """
+    Importar un módulo en un proceso nuevo con -X importtime.
+
+    Args:
+        module: Módulo a importar (ej: "app")
+
+    Returns:
+        (segundos totales, [(módulo, propio µs, acumulado µs, profundidad)])
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(PROJECT_ROOT), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            rows.append((name, int(own), int(cumulative), (len(indent) - 1) // 2))
+
+    total = sum(own for _, own, _, _ in rows) / 1e6
+    return total, rows
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Perfil del tiempo de importación")
+    parser.add_argument('--module', default='app', help='Módulo a importar (por defecto app)')
+    parser.add_argument('--top', type=int, default=25, help='Módulos a mostrar')
+    parser.add_argument('--prefix', default='', help='Mostrar solo módulos con este prefijo (ej: src.)')
+    parser.add_argument('--top-level', action='store_true', help='Agrupar por paquete de primer nivel')
+    args = parser.parse_args()
+
+    total, rows = profile_imports(args.module)
+
+    if args.top_level:
+        # Tiempo propio sumado por paquete raíz (fastapi, langchain_core, src, ...)
+        packages = {}
+        for name, own, _, _ in rows:
+            root = name.split(".")[0]
+            packages[root] = packages.get(root, 0) + own
+        ranking = sorted(packages.items(), key=lambda item: -item[1])
+        print(f"⏱️ import {args.module}: {total:.3f}s ({len(rows)} módulos)\n")
+        for name, own in ranking[:args.top]:
+            print(f"{own / 1000:>9.1f} ms  {own / 1e6 / total:>6.1%}  {name}")
+        return
+
+    ranking = sorted(
+        (row for row in rows if row[0].startswith(args.prefix)),
+        key=lambda row: -row[2]
+    )
+    print(f"⏱️ import {args.module}: {total:.3f}s ({len(rows)} módulos)\n")
+    print(f"{'acumulado':>12} {'propio':>10}  módulo")
+    for name, own, cumulative, _ in ranking[:args.top]:
+        print(f"{cumulative / 1000:>9.1f} ms {own / 1000:>7.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,8 @@
 Agente Turístico con capacidades AgentIC y RAG
 """
 from typing import Optional, List, Dict, Any
-from langgraph.prebuilt import create_react_agent
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage, AIMessage, trim_messages
-from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from src.handlers.tools import (
     search_attractions,
     get_attraction_details,
@@ -20,15 +18,24 @@ from src.handlers.tools import (
 from src.handlers.rag_tools import (
     search_web_tourism_info,
     get_tour_price,
-    list_all_tours_with_prices
+    list_all_tours_with_prices,
+    find_tours
 )
+from src.handlers.tool_output import compact_stale_tool_messages
 from src.prompt_engineering.prompts import PromptManager
+from src.utils.session_store import DEFAULT_SESSION, InMemorySessionStore, SessionStore, make_message
 
 
 class TouristicAgent:
     """Agente turístico con capacidades agénticas"""
     
-    def __init__(self, llm: Any, max_iterations: int = 10, memory_k: int = 10):
+    def __init__(
+        self,
+        llm: Any,
+        max_iterations: int = 10,
+        memory_k: int = 10,
+        session_store: Optional[SessionStore] = None
+    ):
         """
         Inicializar el agente turístico.
         
@@ -36,15 +43,16 @@ class TouristicAgent:
             llm: Modelo de lenguaje a utilizar
             max_iterations: Máximo número de iteraciones del agente
             memory_k: Número de mensajes a mantener en memoria (default: 10)
+            session_store: Almacén del historial por sesión (por defecto en memoria)
         """
         self.llm = llm
         self.max_iterations = max_iterations
         self.memory_k = memory_k
         self.tools = self._setup_tools()
-        self.conversation_history: List[Dict[str, str]] = []
         self.user_context: Dict[str, Any] = {}
-        # Sistema de memoria conversacional
-        self.chat_history = InMemoryChatMessageHistory()
+        # Memoria conversacional por sesión: con un almacén compartido
+        # (SQLite/Redis) cualquier worker puede continuar la conversación
+        self.session_store = session_store or InMemorySessionStore()
         self.agent_executor = self._create_agent_executor()
     
     def _setup_tools(self) -> List:
@@ -65,48 +73,49 @@ class TouristicAgent:
             search_web_tourism_info,
             # Herramientas de scraping de precios (más precisas)
             get_tour_price,
-            list_all_tours_with_prices
+            list_all_tours_with_prices,
+            find_tours
         ]
     
     def _create_agent_executor(self) -> Any:
         """Crear el ejecutor del agente"""
+        # langgraph se importa al construir el agente, no al importar el módulo
+        from langgraph.prebuilt import create_react_agent
+        
         # Crear agente reactivo con herramientas
-        # create_react_agent solo acepta model y tools como argumentos principales
+        # El pre_model_hook compacta resultados de herramientas antes de cada paso
         agent = create_react_agent(
             self.llm,
-            self.tools
+            self.tools,
+            pre_model_hook=compact_stale_tool_messages
         )
         
         return agent
     
-    def process_query(self, user_input: str) -> Dict[str, Any]:
+    def get_session_messages(self, session_id: str = DEFAULT_SESSION) -> List[BaseMessage]:
+        """Últimos memory_k mensajes de la sesión como mensajes de LangChain"""
+        return [
+            HumanMessage(content=message["content"]) if message["role"] == "user"
+            else AIMessage(content=message["content"])
+            for message in self.session_store.get(session_id, limit=self.memory_k)
+        ]
+    
+    def process_query(self, user_input: str, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
         """
         Procesar una consulta del usuario.
         
         Args:
             user_input: Pregunta del usuario
+            session_id: Conversación a la que pertenece la consulta
         
         Returns:
             Respuesta del agente
         """
         try:
-            # Agregar mensaje del usuario al historial
-            self.chat_history.add_user_message(user_input)
-            
-            # Obtener mensajes del historial y limitar a los últimos K mensajes
-            all_messages = self.chat_history.messages
+            user_message = make_message("user", user_input)
             
-            # Usar trim_messages para mantener solo los últimos K mensajes
-            # Esto mantiene el contexto reciente sin sobrecargar el modelo
-            trimmed_messages = trim_messages(
-                all_messages,
-                max_tokens=self.memory_k * 200,  # Aproximadamente K mensajes
-                strategy="last",
-                token_counter=len
-            )
-            
-            # Agregar el mensaje actual
-            messages_to_send = list(trimmed_messages) + [HumanMessage(content=user_input)]
+            # Historial reciente de la sesión (últimos K mensajes) + mensaje actual
+            messages_to_send = self.get_session_messages(session_id) + [HumanMessage(content=user_input)]
             
             # Invocar el agente con el historial
             response = self.agent_executor.invoke({
@@ -135,18 +144,8 @@ class TouristicAgent:
             else:
                 output_text = str(response)
             
-            # Guardar respuesta del asistente en memoria
-            self.chat_history.add_ai_message(output_text)
-            
-            # Guardar en historial de conversación (mantener últimos 10)
-            self.conversation_history.append({
-                "user": user_input,
-                "assistant": output_text
-            })
-            
-            # Limitar historial a últimos 10 intercambios
-            if len(self.conversation_history) > self.memory_k:
-                self.conversation_history = self.conversation_history[-self.memory_k:]
+            # Guardar el intercambio en la sesión (la escritura se envía en lote)
+            self.session_store.append(session_id, [user_message, make_message("assistant", output_text)])
             
             return {
                 "success": True,
@@ -161,29 +160,31 @@ class TouristicAgent:
                 "response": "Disculpa, ocurrió un error procesando tu consulta. Por favor, intenta de nuevo."
             }
     
-    def get_conversation_history(self) -> str:
+    def get_conversation_history(self, session_id: str = DEFAULT_SESSION) -> str:
         """Obtener historial de conversación formateado"""
-        history_text = ""
-        for exchange in self.conversation_history:
-            history_text += f"Usuario: {exchange['user']}\nAsistente: {exchange['assistant']}\n\n"
-        return history_text
+        labels = {"user": "Usuario", "assistant": "Asistente"}
+        return "".join(
+            f"{labels.get(message['role'], message['role'])}: {message['content']}\n"
+            + ("\n" if message["role"] == "assistant" else "")
+            for message in self.session_store.get(session_id)
+        )
     
-    def get_memory_summary(self) -> Dict[str, Any]:
+    def get_memory_summary(self, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
         """Obtener resumen del estado de la memoria"""
+        history = self.session_store.get(session_id)
         return {
-            "total_messages": len(self.chat_history.messages),
-            "conversation_exchanges": len(self.conversation_history),
+            "total_messages": len(history),
+            "conversation_exchanges": sum(1 for message in history if message["role"] == "user"),
             "memory_limit": self.memory_k,
             "messages_in_history": [
-                {"role": msg.type, "preview": str(msg.content)[:100]} 
-                for msg in self.chat_history.messages[-5:]  # Últimos 5 mensajes
+                {"role": message["role"], "preview": message["content"][:100]}
+                for message in history[-5:]  # Últimos 5 mensajes
             ]
         }
     
-    def clear_memory(self) -> None:
+    def clear_memory(self, session_id: str = DEFAULT_SESSION) -> None:
         """Limpiar completamente la memoria de conversación"""
-        self.conversation_history = []
-        self.chat_history.clear()
+        self.session_store.clear(session_id)
         self.user_context = {}
     
     def set_user_context(self, context: Dict[str, Any]) -> None:
@@ -195,11 +196,6 @@ class TouristicAgent:
                     Ejemplo: {"budget": "mid_range", "fitness_level": "medio", "interests": ["nature", "culture"]}
         """
         self.user_context = context
-        context_msg = f"Contexto del usuario: {context}"
-        self.conversation_history.append({
-            "user": "Información del usuario",
-            "assistant": context_msg
-        })
 
 
 class AgentBuilder:
@@ -209,7 +205,8 @@ class AgentBuilder:
     def create_agent(
         llm: Any,
         agent_type: str = "standard",
-        max_iterations: int = 10
+        max_iterations: int = 10,
+        session_store: Optional[SessionStore] = None
     ) -> TouristicAgent:
         """
         Crear un agente turístico personalizado.
@@ -218,11 +215,12 @@ class AgentBuilder:
             llm: Modelo de lenguaje
             agent_type: Tipo de agente ("standard", "expert", "budget")
             max_iterations: Máximo de iteraciones
+            session_store: Almacén del historial por sesión
         
         Returns:
             Instancia del agente
         """
-        agent = TouristicAgent(llm, max_iterations)
+        agent = TouristicAgent(llm, max_iterations, session_store=session_store)
         
         if agent_type == "expert":
             # Para expertos: más iteraciones y herramientas avanzadas
@@ -1,75 +1,123 @@
 """
 Herramientas RAG para búsqueda web híbrida
+
+Los módulos pesados (índice RAG, numpy, scraper con bs4/requests) se importan
+dentro de las herramientas, al primer uso: importar este módulo (y con él
+main.py / app.py) no los carga.
 """
-from typing import Dict, Any, Optional
+from typing import TYPE_CHECKING, Dict, Any, Optional
 from langchain_core.tools import tool
-from src.rag.web_loader import HuarazWebRAG, format_search_results
-from src.rag.price_scraper import get_scraper, HuarazPriceScraper
+from src.handlers.tool_output import (
+    BOOKING_CONTACT,
+    compact_payload,
+    get_token_limit,
+    short_name,
+    tour_payload,
+    truncate_to_tokens
+)
 import logging
+import threading
+
+if TYPE_CHECKING:
+    from src.rag.batching import QueryBatcher
+    from src.rag.web_loader import HuarazWebRAG
 
 logger = logging.getLogger(__name__)
 
+# Respuesta mientras no hay ninguna foto del catálogo (el scraping nunca corre en la consulta)
+CATALOGUE_WARMING = ("⚠️ El catálogo de precios se está actualizando. "
+                     f"Consulta precios por {BOOKING_CONTACT} o intenta en unos minutos.")
+
 # Instancia global del sistema RAG
-_rag_instance: Optional[HuarazWebRAG] = None
+_rag_instance: Optional["HuarazWebRAG"] = None
+_rag_lock = threading.Lock()
 
+# Agrupa búsquedas concurrentes (varias sesiones o herramientas en paralelo)
+_query_batcher: Optional["QueryBatcher"] = None
+_batcher_lock = threading.Lock()
 
-def get_rag_instance() -> HuarazWebRAG:
+
+def get_rag_instance() -> "HuarazWebRAG":
     """Obtener o crear instancia del sistema RAG"""
     global _rag_instance
     
     if _rag_instance is None:
-        logger.info("Inicializando sistema RAG...")
-        _rag_instance = HuarazWebRAG()
-        
-        # Intentar inicializar (usará caché si está disponible)
-        if not _rag_instance.initialize(force_reload=False):
-            logger.warning("No se pudo inicializar completamente el sistema RAG")
+        with _rag_lock:
+            if _rag_instance is None:
+                from src.rag.web_loader import HuarazWebRAG
+                
+                logger.info("Inicializando sistema RAG...")
+                rag = HuarazWebRAG()
+                
+                # Intentar inicializar (usará caché si está disponible)
+                if not rag.initialize(force_reload=False):
+                    logger.warning("No se pudo inicializar completamente el sistema RAG")
+                _rag_instance = rag
     
     return _rag_instance
 
 
+def get_query_batcher() -> "QueryBatcher":
+    """Obtener o crear el micro-batcher de consultas RAG"""
+    global _query_batcher
+    
+    if _query_batcher is None:
+        # Lock propio: get_rag_instance toma _rag_lock
+        with _batcher_lock:
+            if _query_batcher is None:
+                from src.rag.batching import QueryBatcher
+                
+                _query_batcher = QueryBatcher(get_rag_instance())
+    
+    return _query_batcher
+
+
 @tool
 def get_tour_price(tour_name: str) -> str:
     """
     Obtener información completa de un tour específico desde huarazturismo.com.
-    Incluye precio actualizado, duración, qué incluye, y enlace clickeable para más detalles.
+    Incluye precio actualizado, duración, qué incluye y URL para más detalles.
     
     Args:
         tour_name: Nombre del tour o destino (ej: "laguna 69", "pastoruri", "paquete 3d", "trekking santa cruz")
     
     Returns:
-        Información detallada del tour con enlace clickeable para ver detalles completos
+        JSON compacto con los datos del tour (formatear para el usuario en la respuesta final)
     """
+    from src.rag.price_scraper import get_scraper, warm_catalogue
+    
     try:
         scraper = get_scraper()
         
-        # Si no hay datos en caché, hacer scraping
+        # Sin ninguna foto del catálogo: actualizar en segundo plano, no en la consulta
         if not scraper.tours:
-            logger.info("Realizando scraping de tours...")
-            scraper.scrape_all_tours()
-            scraper.save_to_cache()
+            warm_catalogue()
+            return CATALOGUE_WARMING
         
         # Buscar el tour
         tour = scraper.get_tour_by_name(tour_name)
+        related = 0
         
-        if tour:
-            formatted = scraper.format_tour_info(tour, include_html_link=True)
-            
-            # Si no tiene descripción completa, agregar nota
-            if not tour.description or len(tour.description) < 50:
-                formatted += "\n💡 **Tip**: Para más detalles específicos sobre este destino, pregúntame sobre características, altitud, mejor época para visitar, etc.\n"
-            
-            return formatted
-        else:
+        if not tour:
             # Intentar búsqueda más amplia
             results = scraper.search_tours(tour_name)
             if results:
-                formatted = scraper.format_tour_info(results[0], include_html_link=True)
-                if len(results) > 1:
-                    formatted += f"\n\n📌 También encontré {len(results)-1} tour(es) relacionado(s). ¿Quieres ver más opciones?\n"
-                return formatted
-            else:
-                return f"No encontré información específica sobre '{tour_name}'.\n\n✅ Tours disponibles: laguna 69, pastoruri, llanganuco, chavin, paron, churup, santa cruz, entre otros.\n\n💡 Tip: Usa list_all_tours_with_prices() para ver todos los tours."
+                tour = results[0]
+                related = len(results) - 1
+        
+        if not tour:
+            available = sorted({short_name(t.name, 40) for t in scraper.tours})
+            return compact_payload("get_tour_price", {
+                "found": False,
+                "query": tour_name,
+                "items": available
+            })
+        
+        payload = tour_payload(tour, detailed=True)
+        payload["booking"] = BOOKING_CONTACT
+        if related:
+            payload["related"] = related
+        return compact_payload("get_tour_price", payload)
     
     except Exception as e:
         logger.error(f"Error obteniendo precio: {str(e)}")
@@ -84,24 +132,97 @@ def list_all_tours_with_prices() -> str:
     Incluye precios y duraciones actualizadas.
     
     Returns:
-        Lista completa categorizada con precios actualizados desde huarazturismo.com
+        JSON compacto agrupado por tipo: [nombre, precio, duración]
     """
+    from src.rag.price_scraper import get_scraper, warm_catalogue
+    
     try:
         scraper = get_scraper()
         
-        # Si no hay datos, hacer scraping
+        # Sin ninguna foto del catálogo: actualizar en segundo plano, no en la consulta
         if not scraper.tours:
-            logger.info("Realizando scraping de tours...")
-            scraper.scrape_all_tours()
-            scraper.save_to_cache()
+            warm_catalogue()
+            return CATALOGUE_WARMING
+        
+        grouped = {"package": [], "tour": [], "trekking": []}
+        for tour in scraper.tours:
+            row = [short_name(tour.name, 45), tour.price or "consultar"]
+            if tour.duration:
+                row.append(tour.duration)
+            grouped.setdefault(tour.tour_type, []).append(row)
         
-        return scraper.get_all_tours_summary()
+        return compact_payload("list_all_tours_with_prices", grouped)
     
     except Exception as e:
         logger.error(f"Error listando tours: {str(e)}")
         return f"Error al obtener lista de tours: {str(e)}"
 
 
+@tool
+def find_tours(
+    max_price: Optional[float] = None,
+    min_price: Optional[float] = None,
+    tour_type: Optional[str] = None,
+    max_days: Optional[float] = None,
+    difficulty: Optional[str] = None,
+    sort_by: str = "price"
+) -> str:
+    """
+    Filtrar tours por presupuesto, tipo, duración y dificultad (precios en soles).
+    Usar para "tours de menos de 100 soles", "paquetes de 3 días o menos",
+    "trekking fácil", "lo más barato de un día".
+    
+    Args:
+        max_price: Precio máximo por persona en soles
+        min_price: Precio mínimo por persona en soles
+        tour_type: "package" (paquetes), "tour" (full day) o "trekking"
+        max_days: Duración máxima en días (1 = excursiones de un día o menos)
+        difficulty: "facil", "moderado" o "dificil"
+        sort_by: "price" (más barato primero) o "days" (más corto primero)
+    
+    Returns:
+        JSON compacto: [nombre, precio, duración, tipo, dificultad] ordenados
+    """
+    from src.rag.price_scraper import get_scraper, warm_catalogue
+    
+    try:
+        scraper = get_scraper()
+        
+        # Sin ninguna foto del catálogo: actualizar en segundo plano, no en la consulta
+        if not scraper.tours:
+            warm_catalogue()
+            return CATALOGUE_WARMING
+        
+        from src.rag.catalogue import get_catalogue
+        
+        catalogue = get_catalogue(scraper.tours)
+        positions = catalogue.query(
+            max_price=max_price,
+            min_price=min_price,
+            tour_type=tour_type or None,
+            max_days=max_days,
+            difficulty=difficulty or None,
+            sort_by=sort_by
+        )
+        
+        items = []
+        for position in positions:
+            tour = catalogue.tours[position]
+            row = catalogue.row(position)
+            item = [short_name(tour.name, 45), tour.price or "consultar", row["duration"] or "", row["type"]]
+            if row["difficulty"]:
+                item.append(row["difficulty"])
+            items.append(item)
+        
+        return compact_payload("find_tours", {"count": len(items), "items": items})
+    
+    except ValueError as e:
+        return f"Filtro no válido: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error filtrando tours: {str(e)}")
+        return f"Error al filtrar tours: {str(e)}"
+
+
 @tool
 def search_web_tourism_info(query: str, max_results: int = 3) -> str:
     """
@@ -121,15 +242,23 @@ def search_web_tourism_info(query: str, max_results: int = 3) -> str:
         if not rag.vector_store:
             return "⚠️ Sistema de búsqueda web no disponible temporalmente. Usando conocimiento base."
         
-        # Buscar en el vector store
-        results = rag.search(query, k=max_results)
+        # Búsqueda híbrida: embeddings + BM25 (nombres propios, precios, "3d 2n"),
+        # con umbral de similitud, MMR y sin chunks duplicados
+        results = get_query_batcher().search(query, k=min(max_results, rag.top_k), mode="hybrid", mmr=True)
         
         if not results:
             return f"No se encontró información web específica sobre: {query}"
         
-        # Formatear resultados
-        formatted = format_search_results(results)
-        return formatted
+        # Repartir el presupuesto de tokens entre los resultados
+        per_result = max(get_token_limit("search_web_tourism_info") // len(results) - 15, 30)
+        payload = [
+            {
+                "src": doc.metadata.get('source', ''),
+                "text": truncate_to_tokens(" ".join(doc.page_content.split()), per_result)
+            }
+            for doc in results
+        ]
+        return compact_payload("search_web_tourism_info", payload)
         
     except Exception as e:
         logger.error(f"Error en búsqueda web: {str(e)}")
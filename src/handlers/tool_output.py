@@ -0,0 +1,223 @@
+"""
+Compactación de resultados de herramientas antes de reingresar al contexto del LLM
+"""
+from typing import Any, Dict, Optional
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Límite de tokens por herramienta para el payload que ve el modelo
+TOOL_TOKEN_LIMITS: Dict[str, int] = {
+    "list_all_tours_with_prices": 700,
+    "get_tour_price": 300,
+    "find_tours": 400,
+    "search_web_tourism_info": 450,
+    "get_current_weather": 250,
+    "get_weather_forecast": 350,
+}
+
+DEFAULT_TOKEN_LIMIT = 400
+
+# Resultados de pasos anteriores del ReAct se reducen a este tamaño
+STALE_TOOL_TOKEN_LIMIT = 120
+
+# Aproximación caracteres/token para español (evita depender de tiktoken)
+CHARS_PER_TOKEN = 4
+
+BOOKING_CONTACT = "WhatsApp +51 943833972 | reservas@huarazviajes.com"
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimar número de tokens de un texto"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Recortar un texto para que no exceda un número de tokens.
+
+    Args:
+        text: Texto a recortar
+        max_tokens: Máximo de tokens permitidos
+
+    Returns:
+        Texto recortado (con "…" si se truncó)
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max(max_chars - 1, 0)].rstrip() + "…"
+
+
+def get_token_limit(tool_name: str) -> int:
+    """Obtener límite de tokens configurado para una herramienta"""
+    return TOOL_TOKEN_LIMITS.get(tool_name, DEFAULT_TOKEN_LIMIT)
+
+
+def short_name(name: str, max_chars: int = 60) -> str:
+    """
+    Acortar nombres de tours (los títulos del sitio incluyen listas SEO).
+
+    Args:
+        name: Nombre completo del tour
+        max_chars: Longitud máxima
+
+    Returns:
+        Primer segmento del título, limpio y acotado
+    """
+    first = re.split(r"[,|\r\n]", name, maxsplit=1)[0]
+    first = re.sub(r"\s+", " ", first).strip()
+    return first[:max_chars]
+
+
+def tour_payload(tour: Any, detailed: bool = False) -> Dict[str, Any]:
+    """
+    Convertir un TourInfo en un payload compacto para el modelo.
+
+    Args:
+        tour: Instancia de TourInfo
+        detailed: Incluir descripción, dificultad e "incluye"
+
+    Returns:
+        Diccionario sin campos vacíos
+    """
+    payload = {
+        "name": short_name(tour.name),
+        "type": tour.tour_type,
+        "price": tour.price,
+        "duration": tour.duration,
+        "url": tour.url,
+    }
+    if detailed:
+        payload["difficulty"] = tour.difficulty
+        payload["description"] = truncate_to_tokens(tour.description, 50) if tour.description else None
+        payload["includes"] = [truncate_to_tokens(item.strip(), 20)
+                               for item in (tour.includes or [])[:5]
+                               if item and len(item.strip()) > 3]
+    return {key: value for key, value in payload.items() if value}
+
+
+def compact_payload(tool_name: str, payload: Any, max_tokens: Optional[int] = None) -> str:
+    """
+    Serializar un payload estructurado respetando el límite de la herramienta.
+
+    Las listas se recortan elemento a elemento (indicando cuántos se omitieron).
+    Si aun así no cabe, se devuelve un resumen JSON válido (herramienta y
+    cantidad de elementos); solo el texto plano se trunca por caracteres.
+
+    Args:
+        tool_name: Nombre de la herramienta que produce el resultado
+        payload: Datos a serializar (dict, list o str)
+        max_tokens: Límite explícito (por defecto el de TOOL_TOKEN_LIMITS)
+
+    Returns:
+        JSON compacto listo para reingresar al contexto
+    """
+    max_tokens = max_tokens or get_token_limit(tool_name)
+
+    def dumps(value: Any) -> str:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+    if isinstance(payload, str):
+        return truncate_to_tokens(payload, max_tokens)
+
+    text = dumps(payload)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # Recortar listas elemento a elemento, empezando por la más larga
+    if isinstance(payload, list):
+        trimmed: Dict[str, Any] = {"items": list(payload)}
+    elif isinstance(payload, dict):
+        trimmed = {key: list(value) if isinstance(value, list) else value
+                   for key, value in payload.items()}
+    else:
+        trimmed = {}
+
+    # Un resultado ya recortado conserva la cuenta de omitidos previa
+    previous = trimmed.get("omitted")
+    omitted = previous if isinstance(previous, int) and not isinstance(previous, bool) else 0
+    while True:
+        lists = [value for value in trimmed.values() if isinstance(value, list) and value]
+        if not lists:
+            break
+        max(lists, key=len).pop()
+        omitted += 1
+        text = dumps(dict(trimmed, omitted=omitted))
+        if estimate_tokens(text) <= max_tokens:
+            logger.debug(f"{tool_name}: {omitted} elementos omitidos por límite de tokens")
+            return text
+
+    return summary_payload(tool_name, payload)
+
+
+def summary_payload(tool_name: str, payload: Any) -> str:
+    """Resumen JSON válido de un resultado que no cabe en el límite"""
+    if isinstance(payload, list):
+        items = len(payload)
+    elif isinstance(payload, dict):
+        items = sum(len(value) for value in payload.values() if isinstance(value, list))
+    else:
+        items = 1
+    return json.dumps({"tool": tool_name, "items": items, "omitted": True}, separators=(",", ":"))
+
+
+def compact_tool_content(tool_name: str, content: str, max_tokens: int) -> str:
+    """
+    Reducir el contenido de un ToolMessage sin romper su JSON.
+
+    Args:
+        tool_name: Herramienta que produjo el resultado
+        content: Contenido del mensaje (JSON compacto o texto)
+        max_tokens: Límite de tokens
+
+    Returns:
+        JSON recompactado con compact_payload, o texto truncado si no es JSON
+    """
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return truncate_to_tokens(content, max_tokens)
+    if isinstance(payload, str):
+        return json.dumps(truncate_to_tokens(payload, max_tokens), ensure_ascii=False)
+    return compact_payload(tool_name, payload, max_tokens)
+
+
+def compact_stale_tool_messages(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pre-model hook para el agente ReAct.
+
+    Aplica el límite de tokens de cada herramienta a los resultados del último
+    paso y reduce a STALE_TOOL_TOKEN_LIMIT los de pasos anteriores, que de otro
+    modo se reenvían en cada iteración. No modifica el estado persistido, solo
+    la entrada al LLM.
+
+    Args:
+        state: Estado del grafo con la clave "messages"
+
+    Returns:
+        Diccionario con "llm_input_messages"
+    """
+    from langchain_core.messages import ToolMessage
+
+    messages = list(state.get("messages", []))
+
+    # Índice de la última llamada a herramientas: todo lo anterior es "viejo"
+    last_tool_call = -1
+    for i, message in enumerate(messages):
+        if getattr(message, "tool_calls", None):
+            last_tool_call = i
+
+    compacted = []
+    for i, message in enumerate(messages):
+        if isinstance(message, ToolMessage) and isinstance(message.content, str):
+            limit = STALE_TOOL_TOKEN_LIMIT if i < last_tool_call else get_token_limit(message.name or "")
+            if estimate_tokens(message.content) > limit:
+                message = message.model_copy(update={
+                    "content": compact_tool_content(message.name or "", message.content, limit)
+                })
+        compacted.append(message)
+
+    return {"llm_input_messages": compacted}
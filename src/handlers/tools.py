@@ -4,7 +4,6 @@ Herramientas para el Agente Turístico
 from typing import List, Dict, Any, Optional
 from langchain_core.tools import tool
 from data.knowledge.huaraz_knowledge import HuarazKnowledgeBase, Attraction
-import requests
 import os
 from datetime import datetime
 
@@ -248,6 +247,10 @@ def get_current_weather(location: str = "Huaraz") -> str:
     Returns:
         Información detallada del clima actual
     """
+    # requests se importa al primer uso: no pesa en el arranque del servidor
+    import requests
+    from src.rag.fetcher import get_http_session
+    
     try:
         # API Key de OpenWeatherMap (requiere configuración en .env)
         api_key = os.getenv("OPENWEATHER_API_KEY")
@@ -278,7 +281,7 @@ def get_current_weather(location: str = "Huaraz") -> str:
             "lang": "es"
         }
         
-        response = requests.get(base_url, params=params, timeout=10)
+        response = get_http_session().get(base_url, params=params, timeout=10)
         response.raise_for_status()
         
         data = response.json()
@@ -363,6 +366,10 @@ def get_weather_forecast(days: int = 3) -> str:
 
 💡 Configura OPENWEATHER_API_KEY para pronósticos en tiempo real."""
     
+    # requests se importa al primer uso: no pesa en el arranque del servidor
+    import requests
+    from src.rag.fetcher import get_http_session
+    
     try:
         base_url = "http://api.openweathermap.org/data/2.5/forecast"
         params = {
@@ -373,7 +380,7 @@ def get_weather_forecast(days: int = 3) -> str:
             "cnt": min(days * 8, 40)  # 8 mediciones por día
         }
         
-        response = requests.get(base_url, params=params, timeout=10)
+        response = get_http_session().get(base_url, params=params, timeout=10)
         response.raise_for_status()
         
         data = response.json()
@@ -5,8 +5,6 @@ import os
 from typing import Optional, Dict, Any
 from abc import ABC, abstractmethod
 
-from langchain_openai import ChatOpenAI
-
 
 class LLMClient(ABC):
     """Clase base para clientes LLM"""
@@ -33,6 +31,9 @@ class OpenAIClient(LLMClient):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
     
     def get_model(self) -> Any:
+        # langchain_openai/openai tardan ~0.5 s en importarse: solo al crear el modelo
+        from langchain_openai import ChatOpenAI
+        
         return ChatOpenAI(
             model=self.model_name,
             temperature=self.temperature,
@@ -37,6 +37,9 @@ Haces preguntas para entender mejor las necesidades y das recomendaciones person
    
    - **list_all_tours_with_prices()**: Lista TODO con precios
      Usa para "¿qué tours hay?", "opciones", "paquetes disponibles"
+   
+   - **find_tours(max_price, min_price, tour_type, max_days, difficulty)**: Filtra por presupuesto/duración
+     Usa para "menos de 100 soles", "tours de un día", "trekking fácil", "lo más barato"
 
 **2. Para CLIMA (USA CUANDO PREGUNTEN POR CLIMA):**
    - **get_current_weather()**: Clima ACTUAL en tiempo real
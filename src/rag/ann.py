@@ -0,0 +1,227 @@
+"""
+Índices aproximados (ANN) con FAISS para corpus grandes
+
+El índice RAG siempre guarda los vectores exactos (vectors.npy). Para
+segmentos grandes se puede construir además una estructura FAISS que evita
+recorrer todas las filas en cada búsqueda:
+
+- "flat": sin estructura adicional, búsqueda exacta con numpy
+- "ivf-flat": listas invertidas sobre centroides k-means (nprobe listas por consulta)
+- "ivf-pq": listas invertidas con vectores comprimidos por product quantization
+- "hnsw": grafo de mundo pequeño navegable (efSearch nodos explorados por consulta)
+
+Los candidatos aproximados se re-puntúan con los vectores exactos, por lo que
+los scores devueltos son siempre similitud coseno real.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass, asdict, fields, replace
+from pathlib import Path
+import logging
+import math
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf-flat", "ivf-pq", "hnsw")
+
+ANN_FILE = "ann.faiss"
+
+# FAISS recomienda al menos ~39 puntos de entrenamiento por centroide
+MIN_POINTS_PER_CENTROID = 39
+
+
+def _import_faiss():
+    try:
+        import faiss
+    except ImportError as e:
+        raise ImportError("Los índices IVF/HNSW requieren: pip install faiss-cpu") from e
+    return faiss
+
+
+@dataclass
+class AnnConfig:
+    """Tipo de índice aproximado y sus parámetros de construcción y búsqueda"""
+    type: str = "flat"
+    min_rows: int = 10000           # Segmentos más chicos se buscan de forma exacta
+    nlist: int = 0                  # Listas IVF (0 = 4 * sqrt(n))
+    train_size: int = 0             # Muestra de entrenamiento (0 = nlist * 64)
+    pq_m: int = 64                  # Subcuantizadores PQ (se ajusta a un divisor de dim)
+    pq_bits: int = 8                # Bits por código PQ
+    hnsw_m: int = 32                # Vecinos por nodo en HNSW
+    ef_construction: int = 80       # Amplitud de búsqueda al construir HNSW
+    nprobe: int = 8                 # Listas IVF visitadas por consulta
+    ef_search: int = 64             # Amplitud de búsqueda HNSW por consulta
+    refine_factor: int = 4          # Candidatos extra a re-puntuar con vectores exactos
+    seed: int = 42
+
+    def __post_init__(self):
+        self.type = self.type.lower()
+        if self.type not in INDEX_TYPES:
+            raise ValueError(f"Tipo de índice no soportado: {self.type}. Opciones: {', '.join(INDEX_TYPES)}")
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "AnnConfig":
+        """Crear desde un diccionario (config YAML o manifest), ignorando claves desconocidas"""
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in (data or {}).items() if key in known})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def with_overrides(self, **overrides) -> "AnnConfig":
+        """Copia con algunos parámetros reemplazados (se ignoran los None)"""
+        return replace(self, **{key: value for key, value in overrides.items() if value is not None})
+
+    def applies_to(self, rows: int) -> bool:
+        """Indicar si un segmento de `rows` filas lleva índice aproximado"""
+        return self.type != "flat" and rows >= self.min_rows
+
+
+def _nlist_for(rows: int, config: AnnConfig) -> int:
+    nlist = config.nlist or int(4 * math.sqrt(rows))
+    return max(1, min(nlist, rows // MIN_POINTS_PER_CENTROID or 1))
+
+
+def _pq_m_for(dim: int, config: AnnConfig) -> int:
+    """Mayor divisor de dim que no supere pq_m"""
+    for m in range(min(config.pq_m, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def sample_training_set(vectors: np.ndarray, size: int, seed: int = 42) -> np.ndarray:
+    """
+    Tomar una muestra aleatoria de filas para entrenar k-means / PQ.
+
+    Args:
+        vectors: Matriz (n, dim), puede ser un memmap
+        size: Filas a muestrear (si es mayor o igual a n se usan todas)
+        seed: Semilla para que la construcción sea reproducible
+
+    Returns:
+        Matriz contigua float32 con la muestra
+    """
+    rows = vectors.shape[0]
+    if size >= rows:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    picked = np.sort(np.random.default_rng(seed).choice(rows, size=size, replace=False))
+    return np.ascontiguousarray(vectors[picked], dtype=np.float32)
+
+
+def build_ann_index(vectors: np.ndarray, config: AnnConfig):
+    """
+    Construir el índice FAISS de un segmento.
+
+    Args:
+        vectors: Matriz (n, dim) normalizada
+        config: Configuración del índice
+
+    Returns:
+        Índice FAISS (producto interno) o None si el segmento se busca de forma exacta
+    """
+    rows, dim = vectors.shape
+    if not config.applies_to(rows):
+        return None
+
+    faiss = _import_faiss()
+    data = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    if config.type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = config.ef_construction
+        index.add(data)
+        return index
+
+    nlist = _nlist_for(rows, config)
+    quantizer = faiss.IndexFlatIP(dim)
+    if config.type == "ivf-flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_m_for(dim, config),
+                                 config.pq_bits, faiss.METRIC_INNER_PRODUCT)
+
+    train_size = config.train_size or nlist * 64
+    if config.type == "ivf-pq":
+        train_size = max(train_size, (1 << config.pq_bits) * MIN_POINTS_PER_CENTROID)
+    index.train(sample_training_set(data, train_size, config.seed))
+    index.add(data)
+    return index
+
+
+def ann_search_batch(
+    index,
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    config: AnnConfig,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Buscar candidatos aproximados para varias consultas en una sola llamada a
+    FAISS y re-puntuarlos con los vectores exactos.
+
+    Args:
+        index: Índice FAISS del segmento
+        vectors: Vectores exactos del segmento (para re-puntuar)
+        queries: Consultas normalizadas (m, dim)
+        k: Candidatos a devolver por consulta
+        config: Configuración del índice
+        nprobe: Listas IVF a visitar (por defecto config.nprobe)
+        ef_search: Amplitud HNSW (por defecto config.ef_search)
+
+    Returns:
+        Por consulta, (filas, scores coseno) ordenados de mayor a menor
+    """
+    faiss = _import_faiss()
+
+    # Parámetros por consulta: no se modifica el índice compartido entre hilos
+    if config.type == "hnsw":
+        params = faiss.SearchParametersHNSW(efSearch=max(ef_search or config.ef_search, k))
+    else:
+        params = faiss.SearchParametersIVF(nprobe=nprobe or config.nprobe)
+
+    fetch = min(k * max(config.refine_factor, 1), index.ntotal)
+    _, ids = index.search(np.ascontiguousarray(queries, dtype=np.float32), fetch, params=params)
+
+    results = []
+    for query, found in zip(queries, ids):
+        rows = np.sort(found[found >= 0])
+        if rows.size == 0:
+            results.append((rows, np.zeros(0, dtype=np.float32)))
+            continue
+        scores = np.asarray(vectors[rows] @ query, dtype=np.float32)
+        order = np.argsort(-scores)[:k]
+        results.append((rows[order], scores[order]))
+    return results
+
+
+def ann_search(
+    index,
+    vectors: np.ndarray,
+    query: np.ndarray,
+    k: int,
+    config: AnnConfig,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Versión de ann_search_batch para una sola consulta (dim,)"""
+    return ann_search_batch(index, vectors, query.reshape(1, -1), k, config,
+                            nprobe=nprobe, ef_search=ef_search)[0]
+
+
+def write_ann_index(index, path: Path):
+    """Guardar el índice FAISS (formato nativo de FAISS, sin pickle)"""
+    _import_faiss().write_index(index, str(path))
+
+
+def read_ann_index(path: Path):
+    """Leer un índice FAISS; devuelve None si FAISS no está instalado"""
+    try:
+        faiss = _import_faiss()
+    except ImportError as e:
+        logger.warning(f"{e}. Se usará búsqueda exacta")
+        return None
+    return faiss.read_index(str(path))
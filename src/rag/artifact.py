@@ -0,0 +1,251 @@
+"""
+Artefacto de datos precompilado para arranques en frío sin red
+
+El contenido de data/rag_cache depende del disco de quien construye la imagen.
+El artefacto se genera en un paso de build (scripts/build_artifact.py), a partir
+de un crawl o de páginas grabadas, y se valida antes de copiarse al contenedor:
+
+    data/artifact/
+        artifact.json      versión, fecha, origen, modelo de embeddings,
+                           conteos y SHA-256 de cada archivo
+        index/             índice RAG (formato de src/rag/index_store.py)
+        tours.json         catálogo de tours (formato de tours_data.json)
+
+En ejecución el índice se mapea en memoria directamente desde el artefacto y
+el catálogo se lee de tours.json: al arrancar no se descarga ni se embebe nada.
+El artefacto no se modifica nunca; las actualizaciones se guardan en
+data/rag_cache.
+"""
+from typing import Any, Dict, List, Optional
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+from src.rag.index_store import ChunkIndex, IndexFormatError
+from src.utils.atomic_io import atomic_write, atomic_writer, fsync_directory
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_SCHEMA_VERSION = 1
+
+DEFAULT_ARTIFACT_DIR = Path("data/artifact")
+ARTIFACT_FILE = "artifact.json"
+ARTIFACT_INDEX_DIR = "index"
+ARTIFACT_CATALOGUE_FILE = "tours.json"
+
+
+class ArtifactError(ValueError):
+    """El artefacto no existe, está incompleto o no supera la validación"""
+
+
+@dataclass
+class ArtifactManifest:
+    """Descripción de un artefacto de datos"""
+    version: str
+    built_at: str
+    source: str
+    embedding_model: str
+    pages: int = 0
+    chunks: int = 0
+    tours: int = 0
+    files: Dict[str, str] = field(default_factory=dict)
+    schema_version: int = ARTIFACT_SCHEMA_VERSION
+
+    @property
+    def built_at_epoch(self) -> float:
+        return datetime.fromisoformat(self.built_at).timestamp()
+
+    @classmethod
+    def read(cls, path: Path) -> "ArtifactManifest":
+        """Leer artifact.json de un directorio de artefacto"""
+        manifest_path = Path(path) / ARTIFACT_FILE
+        if not manifest_path.exists():
+            raise ArtifactError(f"No se encontró artefacto en: {path}")
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            manifest = cls(**{key: value for key, value in data.items() if key in cls.__dataclass_fields__})
+        except (ValueError, TypeError) as e:
+            raise ArtifactError(f"artifact.json ilegible: {str(e)}")
+        if manifest.schema_version != ARTIFACT_SCHEMA_VERSION:
+            raise ArtifactError(
+                f"Versión de artefacto {manifest.schema_version} no soportada (esperada {ARTIFACT_SCHEMA_VERSION})"
+            )
+        return manifest
+
+    def write(self, path: Path):
+        """Escribir artifact.json de forma atómica"""
+        with atomic_writer(Path(path) / ARTIFACT_FILE) as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+
+
+def find_artifact() -> Optional[Path]:
+    """
+    Ubicar el artefacto: RAG_ARTIFACT_DIR o data/artifact.
+
+    Returns:
+        Directorio del artefacto, o None si no hay uno
+    """
+    path = Path(os.getenv("RAG_ARTIFACT_DIR") or DEFAULT_ARTIFACT_DIR)
+    return path if (path / ARTIFACT_FILE).exists() else None
+
+
+def file_checksums(path: Path) -> Dict[str, str]:
+    """SHA-256 de cada archivo del artefacto (ruta relativa -> hash)"""
+    checksums = {}
+    for file in sorted(Path(path).rglob("*")):
+        if file.is_file() and file.name != ARTIFACT_FILE:
+            digest = hashlib.sha256()
+            with open(file, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            checksums[file.relative_to(path).as_posix()] = digest.hexdigest()
+    return checksums
+
+
+def load_tours(path: Path) -> List[Any]:
+    """Leer el catálogo de tours de un artefacto como lista de TourInfo"""
+    from src.rag.price_scraper import TourInfo
+
+    with open(Path(path) / ARTIFACT_CATALOGUE_FILE, "r", encoding="utf-8") as f:
+        return [TourInfo(**tour_data) for tour_data in json.load(f)]
+
+
+def validate_artifact(path: Path, embedding_model: Optional[str] = None) -> ArtifactManifest:
+    """
+    Validar un artefacto completo: checksums, índice, catálogo y una búsqueda.
+
+    Args:
+        path: Directorio del artefacto
+        embedding_model: Modelo esperado por el runtime (None = no comprobar)
+
+    Returns:
+        Manifest del artefacto
+
+    Raises:
+        ArtifactError: Con el primer problema encontrado
+    """
+    from src.rag.catalogue import TourCatalogue
+
+    path = Path(path)
+    manifest = ArtifactManifest.read(path)
+
+    actual = file_checksums(path)
+    for name, digest in manifest.files.items():
+        if name not in actual:
+            raise ArtifactError(f"Falta el archivo {name}")
+        if actual[name] != digest:
+            raise ArtifactError(f"Checksum distinto en {name}")
+    if ARTIFACT_CATALOGUE_FILE not in manifest.files:
+        raise ArtifactError(f"El manifest no incluye {ARTIFACT_CATALOGUE_FILE}")
+
+    try:
+        index = ChunkIndex.load(path / ARTIFACT_INDEX_DIR, embedding_model=embedding_model)
+    except IndexFormatError as e:
+        raise ArtifactError(f"Índice inválido: {str(e)}")
+    if index.manifest.embedding_model != manifest.embedding_model:
+        raise ArtifactError("El modelo de embeddings del índice no coincide con el manifest")
+    if len(index) == 0 or len(index) != manifest.chunks:
+        raise ArtifactError(f"El índice tiene {len(index)} chunks, se esperaban {manifest.chunks}")
+
+    # Cada chunk debe encontrarse a sí mismo: vectores y texto legibles
+    position = next(index.live_positions())
+    top = index.search(index.get_vector(position), k=1)
+    if not top or top[0][0] != position or not index.get_text(position):
+        raise ArtifactError("Búsqueda de prueba sobre el índice sin resultado")
+
+    try:
+        tours = load_tours(path)
+    except (ValueError, TypeError) as e:
+        raise ArtifactError(f"Catálogo ilegible: {str(e)}")
+    if not tours or len(tours) != manifest.tours:
+        raise ArtifactError(f"El catálogo tiene {len(tours)} tours, se esperaban {manifest.tours}")
+    if not TourCatalogue(tours).query(min_price=0, limit=1):
+        raise ArtifactError("Ningún tour del catálogo tiene precio")
+
+    return manifest
+
+
+def build_artifact(
+    output: Path,
+    pages: List[Any],
+    source: str,
+    embedding_backend: Optional[str] = None
+) -> ArtifactManifest:
+    """
+    Construir y validar un artefacto a partir de páginas descargadas.
+
+    Se arma en un directorio temporal junto a `output` y solo reemplaza al
+    artefacto anterior si pasa la validación.
+
+    Args:
+        output: Directorio del artefacto
+        pages: Páginas con atributos url y html (CrawledPage)
+        source: Origen de las páginas ("crawl" o "fixtures:<directorio>")
+        embedding_backend: Backend de embeddings (debe coincidir con el del runtime)
+
+    Returns:
+        Manifest del artefacto nuevo
+    """
+    from src.rag.price_scraper import HuarazPriceScraper
+    from src.rag.web_loader import HuarazWebRAG
+
+    output = Path(output)
+    staging = output.parent / f".{output.name}.build"
+    previous = output.parent / f".{output.name}.old"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    try:
+        rag = HuarazWebRAG(embedding_backend=embedding_backend)
+        documents = [doc for doc in (rag.page_to_document(page.url, page.html) for page in pages) if doc]
+        if not documents:
+            raise ArtifactError("No hay páginas con contenido para indexar")
+        index = rag.create_vector_store(documents)
+        index.save(staging / ARTIFACT_INDEX_DIR)
+
+        tours = HuarazPriceScraper().load_from_pages(pages)
+        if not tours:
+            raise ArtifactError("No se encontraron tours en las páginas")
+        atomic_write(
+            staging / ARTIFACT_CATALOGUE_FILE,
+            json.dumps([asdict(tour) for tour in tours], ensure_ascii=False, indent=2)
+        )
+
+        files = file_checksums(staging)
+        content_hash = hashlib.sha256(json.dumps(files, sort_keys=True).encode("utf-8")).hexdigest()
+        built_at = datetime.now()
+        manifest = ArtifactManifest(
+            version=f"{built_at.strftime('%Y%m%d%H%M%S')}-{content_hash[:12]}",
+            built_at=built_at.isoformat(),
+            source=source,
+            embedding_model=rag.embedding_model,
+            pages=len(documents),
+            chunks=len(index),
+            tours=len(tours),
+            files=files,
+        )
+        manifest.write(staging)
+        validate_artifact(staging, embedding_model=rag.embedding_model)
+
+        # Reemplazar el artefacto anterior (dos renames en el mismo directorio)
+        shutil.rmtree(previous, ignore_errors=True)
+        if output.exists():
+            os.replace(output, previous)
+        os.replace(staging, output)
+        fsync_directory(output.parent)
+        shutil.rmtree(previous, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    logger.info(
+        f"✓ Artefacto {manifest.version}: {manifest.pages} páginas, "
+        f"{manifest.chunks} chunks, {manifest.tours} tours ({manifest.embedding_model})"
+    )
+    return manifest
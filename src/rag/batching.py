@@ -0,0 +1,110 @@
+"""
+Micro-batching de consultas al sistema RAG
+
+Las consultas individuales que llegan casi al mismo tiempo (varias sesiones,
+o varias llamadas a herramientas en un mismo paso del agente) se agrupan en
+un solo lote: un request de embeddings y una búsqueda vectorial sobre la
+matriz de consultas en lugar de una por consulta.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import Future
+import json
+import logging
+import queue
+import threading
+import time
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBatcher:
+    """Agrupa consultas concurrentes y las resuelve con HuarazWebRAG.search_batch"""
+
+    def __init__(self, rag, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """
+        Args:
+            rag: Instancia de HuarazWebRAG
+            max_batch_size: Máximo de consultas por lote
+            max_wait_ms: Espera máxima desde la primera consulta del lote
+        """
+        self.rag = rag
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[str, Optional[int], Dict[str, Any], Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="rag-query-batcher", daemon=True)
+                self._worker.start()
+
+    def search(self, query: str, k: Optional[int] = None, timeout: float = 30.0, **options) -> List[Document]:
+        """
+        Encolar una consulta y esperar su resultado.
+
+        Args:
+            query: Consulta de búsqueda
+            k: Número máximo de resultados
+            timeout: Segundos máximos de espera
+            **options: Opciones de HuarazWebRAG.search (mode, filters, mmr, ...)
+
+        Returns:
+            Lista de documentos relevantes
+        """
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((query, k, options, future))
+        return future.result(timeout=timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._execute(batch)
+
+    def _execute(self, batch: List[Tuple[str, Optional[int], Dict[str, Any], Future]]):
+        """Resolver un lote agrupando las consultas con las mismas opciones"""
+        groups: Dict[str, List[Tuple[str, Future]]] = {}
+        group_options: Dict[str, Tuple[Optional[int], Dict[str, Any]]] = {}
+        for query, k, options, future in batch:
+            key = json.dumps([k, options], sort_keys=True, default=str)
+            groups.setdefault(key, []).append((query, future))
+            group_options[key] = (k, options)
+
+        for key, items in groups.items():
+            k, options = group_options[key]
+            try:
+                results = self.rag.search_batch([query for query, _ in items], k=k, **options)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(items, results):
+                future.set_result(result)
+
+        self.batches += 1
+        self.queries += len(batch)
+        if len(batch) > 1:
+            logger.debug(f"Lote RAG de {len(batch)} consultas ({len(groups)} grupos)")
+
+    def stats(self) -> Dict[str, float]:
+        """Lotes ejecutados, consultas resueltas y tamaño medio de lote"""
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+        }
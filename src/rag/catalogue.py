@@ -0,0 +1,331 @@
+"""
+Catálogo tipado de tours para consultas por rango
+
+TourInfo guarda el precio y la duración como texto para mostrar ("S/ 60",
+"4D/3N", "3 a 4 horas."). Aquí se convierten a números (monto + moneda,
+días/noches/horas, nivel de dificultad) y se guardan en columnas numpy con
+índices ordenados por precio y por días, de modo que preguntas como "tours de
+menos de 100 soles de un día" se resuelven con searchsorted y máscaras en
+lugar de pasarle la lista completa al LLM.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass
+import logging
+import re
+import threading
+
+import numpy as np
+
+from src.rag.lexical import fold_accents
+
+logger = logging.getLogger(__name__)
+
+CURRENCIES = ("PEN", "USD")
+
+TOUR_TYPES = ("package", "tour", "trekking")
+
+# Niveles de dificultad (los textos del sitio combinan niveles: "Moderado a difícil")
+DIFFICULTY_LEVELS = {"facil": 1, "moderado": 2, "moderada": 2, "dificil": 3, "exigente": 3}
+
+DIFFICULTY_NAMES = {1: "facil", 2: "moderado", 3: "dificil"}
+
+SORT_KEYS = ("price", "days")
+
+PRICE_PATTERN = re.compile(
+    r"(?P<symbol>S/\.?|US\$|USD|\$|PEN|soles)?\s*(?P<amount>\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d{1,2})?)"
+    r"\s*(?P<suffix>soles|USD|d[oó]lares)?",
+    re.IGNORECASE
+)
+
+# "4D/3N", "4 días 3 noches", "2 dias 1 noche", "4d-3n" (slugs de URL)
+DAYS_NIGHTS_PATTERN = re.compile(
+    r"(\d+)\s*(?:d|d[ií]as?)\b\s*[/\-,y]?\s*(\d+)\s*(?:n|noches?)\b", re.IGNORECASE
+)
+DAYS_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?|\d+/\d+)\s*(?:d|d[ií]as?)\b", re.IGNORECASE)
+HOURS_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?)(?:\s*a\s*(\d+(?:[.,]\d+)?))?\s*(?:h|hrs?|horas?)\b", re.IGNORECASE)
+FULL_DAY_PATTERN = re.compile(r"\bfull\s*day\b", re.IGNORECASE)
+HALF_DAY_PATTERN = re.compile(r"\b(half\s*day|medio\s*d[ií]a)\b", re.IGNORECASE)
+
+
+def _to_number(text: str) -> float:
+    """Convertir "1,200.50" / "1.200" / "60,5" a float"""
+    if re.fullmatch(r"\d{1,3}(?:[.,]\d{3})+", text):
+        return float(re.sub(r"[.,]", "", text))
+    if re.fullmatch(r"\d{1,3}(?:,\d{3})+\.\d{1,2}", text):
+        return float(text.replace(",", ""))
+    if re.fullmatch(r"\d{1,3}(?:\.\d{3})+,\d{1,2}", text):
+        return float(text.replace(".", "").replace(",", "."))
+    return float(text.replace(",", "."))
+
+
+def parse_price(text: Optional[str]) -> Tuple[Optional[float], Optional[str]]:
+    """
+    Extraer monto y moneda de un precio de texto.
+
+    Args:
+        text: Precio como se muestra ("S/ 60", "S/. 1,200", "US$ 45", "120 soles")
+
+    Returns:
+        (monto, "PEN" | "USD"); (None, None) si no hay monto
+    """
+    if not text:
+        return None, None
+    match = PRICE_PATTERN.search(text)
+    if not match:
+        return None, None
+
+    marker = fold_accents((match.group("symbol") or match.group("suffix") or "").lower())
+    currency = "USD" if marker in ("us$", "usd", "$", "dolares") else "PEN"
+    return _to_number(match.group("amount")), currency
+
+
+@dataclass
+class Duration:
+    """Duración normalizada de un tour"""
+    days: Optional[float] = None
+    nights: Optional[int] = None
+    hours: Optional[float] = None
+
+    @property
+    def span_days(self) -> Optional[float]:
+        """Duración en días (las excursiones por horas cuentan como fracción de día)"""
+        if self.days is not None:
+            return self.days
+        if self.hours is not None:
+            return round(self.hours / 24, 2)
+        return None
+
+    def label(self) -> Optional[str]:
+        """Texto corto y uniforme: "4D/3N", "1D", "8h" """
+        if self.days is not None and self.nights:
+            return f"{self.days:g}D/{self.nights}N"
+        if self.days is not None:
+            return f"{self.days:g}D"
+        if self.hours is not None:
+            return f"{self.hours:g}h"
+        return None
+
+
+def parse_duration(text: Optional[str]) -> Duration:
+    """
+    Extraer días/noches u horas de una duración de texto.
+
+    Args:
+        text: Duración como se muestra ("4D/3N", "1 día.", "3 a 4 horas.", "1/2 D", "Full Day")
+
+    Returns:
+        Duration (campos en None si no se reconocen); en rangos de horas se usa el máximo
+    """
+    if not text:
+        return Duration()
+
+    match = DAYS_NIGHTS_PATTERN.search(text)
+    if match:
+        return Duration(days=float(match.group(1)), nights=int(match.group(2)))
+
+    match = HOURS_PATTERN.search(text)
+    if match:
+        return Duration(hours=_to_number(match.group(2) or match.group(1)))
+
+    if HALF_DAY_PATTERN.search(text):
+        return Duration(days=0.5)
+    if FULL_DAY_PATTERN.search(text):
+        return Duration(days=1.0)
+
+    match = DAYS_PATTERN.search(text)
+    if match:
+        value = match.group(1)
+        if "/" in value:
+            numerator, denominator = value.split("/")
+            days = int(numerator) / int(denominator) if int(denominator) else None
+        else:
+            days = _to_number(value)
+        return Duration(days=days)
+
+    return Duration()
+
+
+def parse_difficulty(text: Optional[str]) -> Tuple[int, int]:
+    """
+    Convertir la dificultad a un rango de niveles (1 fácil, 2 moderado, 3 difícil).
+
+    Returns:
+        (nivel mínimo, nivel máximo); (0, 0) si no se indica
+    """
+    if not text:
+        return 0, 0
+    levels = [level for word, level in DIFFICULTY_LEVELS.items()
+              if re.search(rf"\b{word}\b", fold_accents(text.lower()))]
+    if not levels:
+        return 0, 0
+    return min(levels), max(levels)
+
+
+def tour_duration(tour: Any) -> Duration:
+    """
+    Duración de un TourInfo.
+
+    El slug de la URL ("paquete-huaraz-3d-2n.php") es más confiable que el texto
+    extraído de la página, que a veces toma la duración de otro tour enlazado.
+    """
+    slug = tour.url.rsplit("/", 1)[-1].replace("-", " ") if tour.url else ""
+    match = DAYS_NIGHTS_PATTERN.search(slug)
+    if match:
+        return Duration(days=float(match.group(1)), nights=int(match.group(2)))
+    return parse_duration(tour.duration)
+
+
+class TourCatalogue:
+    """Catálogo columnar de tours con índices ordenados por precio y por días"""
+
+    def __init__(self, tours: Sequence[Any]):
+        """
+        Args:
+            tours: Lista de TourInfo
+        """
+        self.tours = list(tours)
+        n = len(self.tours)
+
+        self.price = np.full(n, np.nan, dtype=np.float64)
+        self.currency = np.zeros(n, dtype=np.int8)            # índice en CURRENCIES, -1 sin precio
+        self.tour_type = np.zeros(n, dtype=np.int8)           # índice en TOUR_TYPES
+        self.days = np.full(n, np.nan, dtype=np.float32)      # span_days
+        self.nights = np.full(n, -1, dtype=np.int16)
+        self.hours = np.full(n, np.nan, dtype=np.float32)
+        self.difficulty = np.zeros((n, 2), dtype=np.int8)     # (mínimo, máximo), 0 sin dato
+        self.durations: List[Duration] = []
+
+        for i, tour in enumerate(self.tours):
+            amount, currency = parse_price(tour.price)
+            if amount is None:
+                self.currency[i] = -1
+            else:
+                self.price[i] = amount
+                self.currency[i] = CURRENCIES.index(currency)
+
+            self.tour_type[i] = TOUR_TYPES.index(tour.tour_type) if tour.tour_type in TOUR_TYPES else 1
+
+            duration = tour_duration(tour)
+            self.durations.append(duration)
+            if duration.span_days is not None:
+                self.days[i] = duration.span_days
+            if duration.nights is not None:
+                self.nights[i] = duration.nights
+            if duration.hours is not None:
+                self.hours[i] = duration.hours
+
+            self.difficulty[i] = parse_difficulty(tour.difficulty)
+
+        # Índices ordenados (los NaN quedan al final)
+        self.by_price = np.argsort(self.price, kind="stable")
+        self.by_days = np.argsort(self.days, kind="stable")
+        self._sorted_prices = self.price[self.by_price]
+
+    def __len__(self) -> int:
+        return len(self.tours)
+
+    def query(
+        self,
+        max_price: Optional[float] = None,
+        min_price: Optional[float] = None,
+        tour_type: Optional[str] = None,
+        max_days: Optional[float] = None,
+        difficulty: Optional[str] = None,
+        currency: str = "PEN",
+        sort_by: str = "price",
+        limit: Optional[int] = None
+    ) -> List[int]:
+        """
+        Filtrar tours por rango de precio, tipo, duración y dificultad.
+
+        Args:
+            max_price: Precio máximo por persona
+            min_price: Precio mínimo por persona
+            tour_type: "package", "tour" o "trekking"
+            max_days: Duración máxima en días (las excursiones por horas cuentan como fracción)
+            difficulty: Nivel ("facil", "moderado", "dificil"); coincide si el rango del tour lo incluye
+            currency: Moneda de los precios indicados
+            sort_by: "price" o "days"
+            limit: Máximo de resultados
+
+        Returns:
+            Posiciones en self.tours, ordenadas
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"Orden no soportado: {sort_by}. Opciones: {', '.join(SORT_KEYS)}")
+
+        if max_price is not None or min_price is not None:
+            # Rango de precio sobre el índice ordenado
+            low = 0 if min_price is None else np.searchsorted(self._sorted_prices, min_price, side="left")
+            high = (np.searchsorted(self._sorted_prices, max_price, side="right")
+                    if max_price is not None else np.count_nonzero(~np.isnan(self.price)))
+            candidates = self.by_price[low:high]
+            candidates = candidates[self.currency[candidates] == CURRENCIES.index(currency.upper())]
+        else:
+            candidates = self.by_price
+
+        if tour_type:
+            if tour_type not in TOUR_TYPES:
+                raise ValueError(f"Tipo de tour no soportado: {tour_type}. Opciones: {', '.join(TOUR_TYPES)}")
+            candidates = candidates[self.tour_type[candidates] == TOUR_TYPES.index(tour_type)]
+
+        if max_days is not None:
+            candidates = candidates[self.days[candidates] <= max_days]
+
+        if difficulty:
+            level, _ = parse_difficulty(difficulty)
+            if not level:
+                raise ValueError(f"Dificultad no reconocida: {difficulty}. Opciones: facil, moderado, dificil")
+            ranges = self.difficulty[candidates]
+            candidates = candidates[(ranges[:, 0] <= level) & (ranges[:, 1] >= level)]
+
+        if sort_by == "days":
+            rank = np.empty(len(self.tours), dtype=np.int64)
+            rank[self.by_days] = np.arange(len(self.tours))
+            candidates = candidates[np.argsort(rank[candidates], kind="stable")]
+
+        positions = candidates.tolist()
+        return positions[:limit] if limit else positions
+
+    def row(self, position: int) -> Dict[str, Any]:
+        """Datos tipados de un tour del catálogo"""
+        tour = self.tours[position]
+        duration = self.durations[position]
+        low, high = self.difficulty[position]
+        price = self.price[position]
+        return {
+            "name": tour.name,
+            "type": TOUR_TYPES[self.tour_type[position]],
+            "price": None if np.isnan(price) else float(price),
+            "currency": CURRENCIES[self.currency[position]] if self.currency[position] >= 0 else None,
+            "duration": duration.label() or tour.duration,
+            "days": duration.span_days,
+            "difficulty": "-".join(dict.fromkeys(DIFFICULTY_NAMES[level] for level in (low, high) if level)) or None,
+            "url": tour.url,
+        }
+
+
+# Instancia global (se reconstruye cuando cambia la lista de tours del scraper)
+_catalogue: Optional[TourCatalogue] = None
+_catalogue_source: Optional[Tuple[Sequence[Any], int]] = None
+_catalogue_lock = threading.Lock()
+
+
+def get_catalogue(tours: Sequence[Any]) -> TourCatalogue:
+    """
+    Obtener el catálogo de una lista de tours, reutilizándolo mientras la lista no cambie.
+
+    Args:
+        tours: Lista de TourInfo (normalmente get_scraper().tours)
+
+    Returns:
+        TourCatalogue
+    """
+    global _catalogue, _catalogue_source
+
+    with _catalogue_lock:
+        if _catalogue is None or _catalogue_source[0] is not tours or _catalogue_source[1] != len(tours):
+            _catalogue = TourCatalogue(tours)
+            _catalogue_source = (tours, len(tours))
+            logger.info(f"✓ Catálogo tipado: {len(_catalogue)} tours")
+        return _catalogue
@@ -0,0 +1,295 @@
+"""
+Chunking por estructura para páginas de tours
+
+En lugar de cortar el texto cada N caracteres con solapamiento, cada página se
+divide por sus secciones (títulos, "Día 1", "Incluye", "Precio", ...):
+
+1. extract_structured_content conserva los títulos del HTML como líneas
+   "## Título" y las filas de tablas como "celda | celda"
+2. StructuredSplitter agrupa las líneas por sección, clasifica la sección
+   (itinerary, includes, price, general) y arma chunks sin solapamiento,
+   antecediendo "Página › Sección" para dar contexto a cada chunk
+3. Las líneas repetidas en muchas páginas (menús, pies, avisos) se detectan por
+   shingles de palabras y se descartan antes de armar los chunks
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+from collections import Counter
+from dataclasses import dataclass, field
+import math
+import re
+import zlib
+
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+
+from src.rag.fetcher import DEFAULT_CONTENT_SELECTORS, select_main_content
+from src.rag.lexical import fold_accents
+
+HEADING_PREFIX = "## "
+
+HEADING_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6"]
+
+# Líneas que abren una sección aunque no sean un <hN>
+DAY_PATTERN = re.compile(r"^(d[ií]a|day)\s*\d+\b", re.IGNORECASE)
+LABEL_PATTERN = re.compile(r"^[^.!?]{2,40}:$")
+
+# Tipo de sección según su título (el primero que coincide)
+SECTION_TYPES = [
+    ("itinerary", re.compile(r"\b(d[ií]a\s*\d+|day\s*\d+|itinerario|programa|recorrido|ruta)\b", re.IGNORECASE)),
+    ("includes", re.compile(r"\b(incluye|no incluye|qu[eé] llevar|recomendaciones|equipo)\b", re.IGNORECASE)),
+    ("price", re.compile(r"\b(precio|precios|tarifa|tarifas|costo|s/)", re.IGNORECASE)),
+]
+
+# Palabras por shingle para detectar texto repetido entre páginas
+SHINGLE_SIZE = 5
+
+
+def extract_structured_content(html: str, selectors: Sequence[str] = DEFAULT_CONTENT_SELECTORS) -> Dict[str, str]:
+    """
+    Extraer título y texto del contenido principal conservando la estructura.
+
+    Los títulos quedan como líneas "## Título" y cada fila de tabla como una
+    línea con sus celdas separadas por " | ".
+
+    Args:
+        html: HTML de la página
+        selectors: Selectores CSS del contenido principal
+
+    Returns:
+        Diccionario con "title" y "text"
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    node = select_main_content(soup, selectors)
+
+    for row in node.find_all("tr"):
+        cells = [cell.get_text(" ", strip=True) for cell in row.find_all(["td", "th"])]
+        row.replace_with(soup.new_string("\n" + " | ".join(cell for cell in cells if cell) + "\n"))
+    for heading in node.find_all(HEADING_TAGS):
+        text = heading.get_text(" ", strip=True)
+        heading.replace_with(soup.new_string(f"\n{HEADING_PREFIX}{text}\n" if text else "\n"))
+
+    lines = [" ".join(line.split()) for line in node.get_text("\n").splitlines()]
+    return {"title": title, "text": "\n".join(line for line in lines if line)}
+
+
+def classify_section(heading: str, body: str = "") -> str:
+    """Tipo de sección: itinerary, includes, price o general"""
+    for section_type, pattern in SECTION_TYPES:
+        if pattern.search(heading):
+            return section_type
+    # Secciones sin título que son sobre todo precios ("Adulto | S/ 60")
+    if body and len(re.findall(r"s/\.?\s*\d", body, re.IGNORECASE)) >= 2:
+        return "price"
+    return "general"
+
+
+def _shingles(line: str) -> Set[int]:
+    """Shingles de SHINGLE_SIZE palabras (vacío para líneas más cortas)"""
+    words = fold_accents(line.lower()).split()
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8"))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+@dataclass
+class Section:
+    """Sección de una página: título, tipo y líneas de contenido"""
+    heading: str
+    lines: List[str] = field(default_factory=list)
+    section_type: str = "general"
+    parent: str = ""
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+class StructuredSplitter:
+    """Divide páginas por secciones y descarta el texto repetido entre páginas"""
+
+    def __init__(
+        self,
+        max_chars: int = 1000,
+        min_chars: int = 200,
+        boilerplate_ratio: float = 0.4,
+        boilerplate_min_pages: int = 3
+    ):
+        """
+        Args:
+            max_chars: Largo máximo de un chunk
+            min_chars: Secciones contiguas del mismo tipo más cortas se unen
+            boilerplate_ratio: Fracción de páginas a partir de la cual un shingle es repetido
+            boilerplate_min_pages: Páginas mínimas para considerar un shingle repetido
+        """
+        self.max_chars = max_chars
+        self.min_chars = min_chars
+        self.boilerplate_ratio = boilerplate_ratio
+        self.boilerplate_min_pages = boilerplate_min_pages
+
+    # ---- Texto repetido ----
+
+    def boilerplate_shingles(self, documents: Iterable[Document]) -> Set[int]:
+        """Shingles presentes en muchas páginas del corpus"""
+        counts: Counter = Counter()
+        pages = 0
+        for doc in documents:
+            pages += 1
+            page_shingles: Set[int] = set()
+            for line in doc.page_content.splitlines():
+                if not line.startswith(HEADING_PREFIX):
+                    page_shingles |= _shingles(line)
+            counts.update(page_shingles)
+
+        min_pages = max(self.boilerplate_min_pages, math.ceil(pages * self.boilerplate_ratio))
+        if pages < self.boilerplate_min_pages:
+            return set()
+        return {shingle for shingle, count in counts.items() if count >= min_pages}
+
+    @staticmethod
+    def is_boilerplate(line: str, frequent: Set[int], threshold: float = 0.8) -> bool:
+        """
+        Una línea es repetida si casi todos sus shingles son frecuentes.
+
+        Los títulos y las líneas cortas ("Incluye", "Guía bilingüe") nunca se
+        descartan: se repiten entre páginas de tours pero son contenido.
+        """
+        if not frequent or line.startswith(HEADING_PREFIX):
+            return False
+        shingles = _shingles(line)
+        if not shingles:
+            return False
+        return sum(shingle in frequent for shingle in shingles) >= threshold * len(shingles)
+
+    # ---- Secciones ----
+
+    def sections(self, text: str, frequent: Optional[Set[int]] = None) -> List[Section]:
+        """Agrupar las líneas de una página en secciones"""
+        sections = [Section(heading="")]
+        parent = ""
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or (frequent and self.is_boilerplate(line, frequent)):
+                continue
+            if line.startswith(HEADING_PREFIX):
+                parent = line[len(HEADING_PREFIX):]
+                sections.append(Section(heading=parent))
+            elif DAY_PATTERN.match(line) or LABEL_PATTERN.match(line):
+                # "Día 1: Huaraz - Cashapampa ..." abre sección y conserva el texto
+                day = DAY_PATTERN.match(line)
+                if day and ":" not in line[:day.end() + 2]:
+                    heading, rest = day.group(0), line[day.end():]
+                else:
+                    heading, _, rest = line.partition(":")
+                rest = rest.strip(" -–:")
+                sections.append(Section(heading=heading.strip(), lines=[rest] if rest else [], parent=parent))
+            else:
+                sections[-1].lines.append(line)
+
+        sections = [section for section in sections if section.lines]
+        for section in sections:
+            section.section_type = classify_section(f"{section.parent} {section.heading}", section.text)
+        return sections
+
+    def _merge_small(self, sections: List[Section]) -> List[Section]:
+        """
+        Unir secciones contiguas del mismo tipo mientras quepan en un chunk
+        (ej. los días de un itinerario); las secciones generales muy cortas se
+        unen a la anterior.
+        """
+        merged: List[Section] = []
+        budget = self.max_chars - 100  # Espacio para el prefijo "Página › Sección"
+        for section in sections:
+            previous = merged[-1] if merged else None
+            if previous:
+                fits = len(previous.text) + len(section.text) + len(section.heading) + 2 <= budget
+                tiny = section.section_type == "general" and len(section.text) < self.min_chars
+                if fits and (previous.section_type == section.section_type or tiny):
+                    # Varias secciones en un chunk: usar el título que las agrupa
+                    if previous.parent and section.parent == previous.parent and previous.heading != previous.parent:
+                        previous.lines.insert(0, f"{previous.heading}:")
+                        previous.heading = previous.parent
+                    if section.heading:
+                        previous.lines.append(f"{section.heading}:")
+                    previous.lines.extend(section.lines)
+                    continue
+            merged.append(Section(section.heading, list(section.lines), section.section_type, section.parent))
+        return merged
+
+    def _pack(self, lines: List[str], budget: int) -> List[str]:
+        """Armar bloques de hasta `budget` caracteres cortando entre líneas"""
+        blocks: List[str] = []
+        current: List[str] = []
+        size = 0
+        for line in lines:
+            while len(line) > budget:
+                # Línea más larga que un chunk: cortar en el último espacio
+                cut = line.rfind(" ", 0, budget)
+                cut = cut if cut > budget // 2 else budget
+                head, line = line[:cut], line[cut:].strip()
+                if current:
+                    blocks.append("\n".join(current))
+                    current, size = [], 0
+                blocks.append(head)
+            if current and size + len(line) + 1 > budget:
+                blocks.append("\n".join(current))
+                current, size = [], 0
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            blocks.append("\n".join(current))
+        return blocks
+
+    def split_document(self, document: Document, frequent: Optional[Set[int]] = None) -> List[Document]:
+        """Dividir una página en chunks por sección"""
+        title = document.metadata.get("title") or ""
+        page = title.split("|")[0].strip()
+        chunks: List[Document] = []
+
+        for section in self._merge_small(self.sections(document.page_content, frequent)):
+            heading = section.heading if section.heading.lower() != page.lower() else ""
+            context = " › ".join(part for part in (page, heading) if part)
+            prefix = f"{context}\n" if context else ""
+            for block in self._pack(section.lines, max(self.max_chars - len(prefix), 100)):
+                metadata = dict(document.metadata)
+                metadata.update({
+                    "section": section.heading,
+                    "section_type": section.section_type,
+                    "chunk_index": len(chunks),
+                })
+                chunks.append(Document(page_content=prefix + block, metadata=metadata))
+        return chunks
+
+    def split_documents(
+        self,
+        documents: List[Document],
+        corpus: Optional[List[Document]] = None
+    ) -> List[Document]:
+        """
+        Dividir páginas en chunks.
+
+        Args:
+            documents: Páginas a dividir
+            corpus: Todas las páginas del sitio, para detectar texto repetido
+                    (por defecto las mismas páginas a dividir)
+
+        Returns:
+            Chunks con metadata de sección
+        """
+        frequent = self.boilerplate_shingles(corpus or documents)
+        return [chunk for doc in documents for chunk in self.split_document(doc, frequent)]
+
+
+def chunk_stats(chunks: List[Document]) -> Dict[str, Any]:
+    """Métricas de un conjunto de chunks (cantidad, tamaños, tipos de sección)"""
+    sizes = [len(chunk.page_content) for chunk in chunks]
+    if not sizes:
+        return {"chunks": 0, "total_chars": 0, "avg_chars": 0, "max_chars": 0, "section_types": {}}
+    return {
+        "chunks": len(sizes),
+        "total_chars": sum(sizes),
+        "avg_chars": round(sum(sizes) / len(sizes)),
+        "max_chars": max(sizes),
+        "section_types": dict(Counter(chunk.metadata.get("section_type", "general") for chunk in chunks)),
+    }
@@ -0,0 +1,341 @@
+"""
+Crawler acotado para huarazturismo.com
+
+Descubre páginas desde el sitemap (o la portada) en lugar de listas fijas de
+URLs, respeta robots.txt y el dominio del sitio, deduplica por URL canónica y
+por hash de contenido, y guarda la frontera en disco para poder reanudar un
+crawl interrumpido. Cada página se descarga una sola vez por ciclo y el mismo
+resultado alimenta al índice RAG y al catálogo de precios.
+"""
+from typing import Dict, List, Optional, Set
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
+from urllib.robotparser import RobotFileParser
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import shutil
+import threading
+import time
+
+from bs4 import BeautifulSoup
+
+from src.rag.fetcher import BOT_NAME, extract_main_content, fetch_url, get_http_session
+from src.utils.atomic_io import FileLock, atomic_write, atomic_writer
+from src.utils.config import load_knowledge_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://www.huarazturismo.com"
+
+DEFAULT_STATE_DIR = Path("data/rag_cache/crawl")
+
+# Un ciclo terminado hace menos de esto se reutiliza en lugar de descargar de nuevo
+DEFAULT_CYCLE_MAX_AGE_HOURS = 1.0
+
+# Recursos que no son páginas HTML
+SKIP_EXTENSIONS = re.compile(
+    r"\.(jpg|jpeg|png|gif|webp|svg|ico|pdf|zip|rar|mp4|mp3|css|js|xml|json|doc|docx|xls|xlsx)$",
+    re.IGNORECASE
+)
+
+# Parámetros de tracking que no cambian el contenido
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalizar una URL para deduplicar.
+
+    Minúsculas en esquema y host, sin fragmento, sin parámetros de tracking,
+    parámetros ordenados, sin "index.php"/"index.html" y sin "/" final.
+    """
+    parsed = urlparse(url.strip())
+    scheme = (parsed.scheme or "https").lower()
+    netloc = parsed.netloc.lower()
+    path = re.sub(r"/index\.(php|html?)$", "/", parsed.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parsed.query)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunparse((scheme, netloc, path or "/", "", query, ""))
+
+
+@dataclass
+class CrawledPage:
+    """Página descargada en un ciclo de crawl"""
+    url: str
+    html: str
+    content_hash: str
+    fetched_at: str
+
+
+@dataclass
+class CrawlState:
+    """Estado persistente del crawl (permite reanudar)"""
+    cycle_started_at: str = ""
+    frontier: List[str] = field(default_factory=list)
+    visited: List[str] = field(default_factory=list)
+    pages: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def finished(self) -> bool:
+        return bool(self.cycle_started_at) and not self.frontier
+
+    @classmethod
+    def load(cls, path: Path) -> "CrawlState":
+        if not path.exists():
+            return cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(**{key: value for key, value in data.items() if key in cls.__dataclass_fields__})
+        except Exception as e:
+            logger.warning(f"Estado de crawl ilegible, se inicia un ciclo nuevo: {str(e)}")
+            return cls()
+
+    def save(self, path: Path):
+        with atomic_writer(path) as f:
+            json.dump(asdict(self), f, ensure_ascii=False)
+
+
+class SiteCrawler:
+    """Crawler de un solo dominio con concurrencia asíncrona acotada"""
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        max_pages: int = 300,
+        concurrency: int = 8,
+        timeout: float = 15.0,
+        state_dir: Optional[Path] = None
+    ):
+        """
+        Args:
+            base_url: Raíz del sitio (define el dominio permitido)
+            max_pages: Máximo de páginas a descargar por ciclo
+            concurrency: Descargas simultáneas
+            timeout: Segundos máximos por página
+            state_dir: Directorio del estado y de las páginas descargadas
+        """
+        self.base_url = base_url.rstrip("/")
+        self.domain = urlparse(self.base_url).netloc.lower()
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.state_dir = state_dir or DEFAULT_STATE_DIR
+        self.state_path = self.state_dir / "state.json"
+        self.pages_dir = self.state_dir / "pages"
+        self.state = CrawlState.load(self.state_path)
+        self.robots: Optional[RobotFileParser] = None
+
+    # ---- Reglas ----
+
+    def _same_domain(self, url: str) -> bool:
+        netloc = urlparse(url).netloc.lower()
+        return netloc == self.domain or netloc.removeprefix("www.") == self.domain.removeprefix("www.")
+
+    def is_allowed(self, url: str) -> bool:
+        """Verificar dominio, tipo de recurso y robots.txt"""
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not self._same_domain(url):
+            return False
+        if SKIP_EXTENSIONS.search(parsed.path):
+            return False
+        return self.robots is None or self.robots.can_fetch(BOT_NAME, url)
+
+    # ---- Semillas ----
+
+    def _load_robots(self) -> List[str]:
+        """Leer robots.txt y devolver los sitemaps declarados"""
+        result = fetch_url(f"{self.base_url}/robots.txt", self.timeout)
+        robots = RobotFileParser()
+        robots.parse(result.html.splitlines() if result.ok else [])
+        self.robots = robots
+        return list(robots.site_maps() or [])
+
+    def _read_sitemap(self, url: str, depth: int = 0) -> List[str]:
+        """Extraer URLs de un sitemap (incluye índices de sitemaps)"""
+        result = fetch_url(url, self.timeout)
+        if not result.ok:
+            return []
+        locations = [loc.strip() for loc in re.findall(r"<loc>(.*?)</loc>", result.html, re.DOTALL)]
+        urls = []
+        for location in locations:
+            if location.endswith(".xml") and depth < 2:
+                urls.extend(self._read_sitemap(location, depth + 1))
+            else:
+                urls.append(location)
+        return urls
+
+    def seed_urls(self) -> List[str]:
+        """Obtener semillas: sitemap(s) declarados, /sitemap.xml o la portada"""
+        sitemaps = self._load_robots() or [f"{self.base_url}/sitemap.xml"]
+        seeds = []
+        for sitemap in sitemaps:
+            seeds.extend(self._read_sitemap(sitemap))
+        seeds.append(self.base_url + "/")
+        return list(dict.fromkeys(canonicalize_url(url) for url in seeds if self.is_allowed(url)))
+
+    # ---- Almacenamiento de páginas ----
+
+    def _page_file(self, url: str) -> Path:
+        return self.pages_dir / (hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html")
+
+    def _store_page(self, url: str, html: str, content_hash: str):
+        self.pages_dir.mkdir(parents=True, exist_ok=True)
+        atomic_write(self._page_file(url), html)
+        self.state.pages[url] = {"hash": content_hash, "fetched_at": datetime.now().isoformat()}
+
+    def pages(self) -> List[CrawledPage]:
+        """Páginas descargadas en el ciclo actual"""
+        crawled = []
+        for url, info in self.state.pages.items():
+            path = self._page_file(url)
+            if path.exists():
+                crawled.append(CrawledPage(url, path.read_text(encoding="utf-8"),
+                                           info["hash"], info["fetched_at"]))
+        return crawled
+
+    # ---- Crawl ----
+
+    def _start_cycle(self):
+        """Iniciar un ciclo nuevo desde las semillas"""
+        self.state = CrawlState(cycle_started_at=datetime.now().isoformat())
+        shutil.rmtree(self.pages_dir, ignore_errors=True)
+        self.state.frontier = self.seed_urls()
+        logger.info(f"Nuevo ciclo de crawl con {len(self.state.frontier)} semillas")
+
+    def _process(self, url: str, html: str, queued: Set[str], hashes: Set[str]) -> List[str]:
+        """Registrar una página descargada y devolver los enlaces nuevos"""
+        soup = BeautifulSoup(html, "html.parser")
+
+        # La URL canónica declarada evita indexar duplicados con otra ruta
+        canonical_tag = soup.find("link", rel="canonical")
+        if canonical_tag and canonical_tag.get("href"):
+            canonical = canonicalize_url(urljoin(url, canonical_tag["href"]))
+            if canonical != url and self._same_domain(canonical):
+                if canonical in self.state.pages or canonical in queued:
+                    return []
+                url = canonical
+
+        links = []
+        for anchor in soup.find_all("a", href=True):
+            link = canonicalize_url(urljoin(url, anchor["href"]))
+            if link not in queued and self.is_allowed(link):
+                links.append(link)
+
+        content_hash = hashlib.sha256(extract_main_content(html)["text"].encode("utf-8")).hexdigest()
+        if content_hash in hashes:
+            logger.debug(f"Contenido duplicado, se omite: {url}")
+        else:
+            hashes.add(content_hash)
+            self._store_page(url, html, content_hash)
+        return links
+
+    async def crawl(self, resume: bool = True) -> List[CrawledPage]:
+        """
+        Ejecutar (o reanudar) un ciclo de crawl.
+
+        Args:
+            resume: Continuar la frontera guardada si el ciclo anterior quedó incompleto
+
+        Returns:
+            Páginas descargadas en el ciclo
+        """
+        if not (resume and self.state.cycle_started_at and not self.state.finished):
+            await asyncio.to_thread(self._start_cycle)
+        else:
+            await asyncio.to_thread(self._load_robots)
+            logger.info(f"Reanudando crawl: {len(self.state.frontier)} URLs pendientes")
+
+        session = get_http_session(pool_size=self.concurrency)
+        visited: Set[str] = set(self.state.visited)
+        hashes: Set[str] = {info["hash"] for info in self.state.pages.values()}
+        queued: Set[str] = visited | set(self.state.frontier)
+        queue: asyncio.Queue = asyncio.Queue()
+        for url in self.state.frontier:
+            queue.put_nowait(url)
+
+        async def worker():
+            while True:
+                url = await queue.get()
+                try:
+                    if url in visited or len(visited) >= self.max_pages:
+                        continue
+                    visited.add(url)
+                    result = await asyncio.to_thread(fetch_url, url, self.timeout, session)
+                    if not result.ok:
+                        self.state.errors[url] = result.error
+                        continue
+                    for link in self._process(url, result.html, queued, hashes):
+                        if link not in queued and len(queued) < self.max_pages * 4:
+                            queued.add(link)
+                            queue.put_nowait(link)
+                finally:
+                    self.state.visited = list(visited)
+                    self.state.frontier = [u for u in queued if u not in visited] \
+                        if len(visited) < self.max_pages else []
+                    if len(visited) % 10 == 0:
+                        self.state.save(self.state_path)
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        await queue.join()
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        self.state.frontier = []
+        self.state.save(self.state_path)
+        logger.info(f"✓ Crawl completado: {len(self.state.pages)} páginas, {len(self.state.errors)} errores")
+        return self.pages()
+
+    def run(self, resume: bool = True) -> List[CrawledPage]:
+        """Versión síncrona de crawl()"""
+        return asyncio.run(self.crawl(resume=resume))
+
+
+# Un solo ciclo a la vez por proceso (además del lock de archivo entre procesos)
+_cycle_lock = threading.Lock()
+
+
+def crawl_cycle(force: bool = False, state_dir: Optional[Path] = None) -> List[CrawledPage]:
+    """
+    Páginas del ciclo de crawl vigente, descargándolo si hace falta.
+
+    El catálogo de precios y el índice RAG consumen el mismo ciclo: el primero
+    que lo pide lo descarga (o reanuda uno interrumpido) y los demás esperan y
+    reutilizan sus páginas mientras no tenga más de knowledge.crawl.max_age_hours.
+
+    Args:
+        force: Descargar un ciclo nuevo aunque el vigente sea reciente
+        state_dir: Directorio del estado del crawl (por defecto data/rag_cache/crawl)
+
+    Returns:
+        Páginas del ciclo (vacío si no se pudo descargar ninguna)
+    """
+    settings = load_knowledge_config().get("crawl") or {}
+    max_age_hours = float(settings.get("max_age_hours", DEFAULT_CYCLE_MAX_AGE_HOURS))
+    state_dir = state_dir or DEFAULT_STATE_DIR
+
+    with _cycle_lock, FileLock(state_dir.with_name(state_dir.name + ".lock")):
+        crawler = SiteCrawler(
+            max_pages=int(settings.get("max_pages", 300)),
+            concurrency=int(settings.get("concurrency", 8)),
+            state_dir=state_dir
+        )
+        if not force and crawler.state.finished and crawler.state_path.exists():
+            age = time.time() - crawler.state_path.stat().st_mtime
+            if age < max_age_hours * 3600:
+                pages = crawler.pages()
+                logger.info(f"✓ Ciclo de crawl reutilizado ({len(pages)} páginas, {age / 60:.0f} min)")
+                return pages
+        return crawler.run(resume=not force)
@@ -0,0 +1,181 @@
+"""
+Caché persistente de embeddings indexado por (modelo, hash del texto)
+"""
+from typing import Dict, Iterable, List, Optional
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import logging
+import sqlite3
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.rag.embeddings import embed_queries
+
+logger = logging.getLogger(__name__)
+
+# Máximo de parámetros por consulta SQL (límite conservador de SQLite)
+SQL_BATCH_SIZE = 500
+
+
+def text_hash(text: str) -> str:
+    """Hash SHA-256 del texto a embeber"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Caché de vectores en SQLite con un nivel LRU en memoria"""
+
+    def __init__(self, path: Path, memory_size: int = 4096):
+        """
+        Abrir (o crear) el caché.
+
+        Args:
+            path: Archivo SQLite
+            memory_size: Número de vectores a mantener en memoria
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, hash))"
+        )
+        self._conn.commit()
+
+    def _remember(self, key: tuple, vector: np.ndarray):
+        """Insertar en el nivel de memoria respetando el tamaño máximo"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Buscar varios vectores en una sola pasada.
+
+        Args:
+            model: Identificador del modelo de embeddings
+            hashes: Hashes de los textos
+
+        Returns:
+            Diccionario hash -> vector solo con los encontrados
+        """
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+
+        with self._lock:
+            for h in dict.fromkeys(hashes):
+                vector = self._memory.get((model, h))
+                if vector is not None:
+                    self._memory.move_to_end((model, h))
+                    found[h] = vector
+                else:
+                    missing.append(h)
+
+            for start in range(0, len(missing), SQL_BATCH_SIZE):
+                batch = missing[start:start + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for h, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[h] = vector
+                    self._remember((model, h), vector)
+
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, Iterable[float]]):
+        """
+        Guardar varios vectores en una sola transacción.
+
+        Args:
+            model: Identificador del modelo de embeddings
+            vectors: Diccionario hash -> vector
+        """
+        if not vectors:
+            return
+
+        rows = []
+        with self._lock:
+            for h, vector in vectors.items():
+                array = np.asarray(vector, dtype=np.float32)
+                rows.append((model, h, array.tobytes()))
+                self._remember((model, h), array)
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def close(self):
+        """Cerrar la conexión SQLite"""
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Envoltorio de Embeddings que solo calcula los textos no vistos antes"""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model: Optional[str] = None):
+        """
+        Args:
+            embeddings: Backend real de embeddings
+            cache: Caché persistente
+            model: Identificador del modelo (por defecto el del backend)
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model or getattr(embeddings, "model", None) or type(embeddings).__name__
+
+    def _embed_with_cache(self, namespace: str, texts: List[str], compute) -> List[List[float]]:
+        """Resolver textos desde el caché y calcular solo los faltantes"""
+        hashes = [text_hash(text) for text in texts]
+        found = self.cache.get_many(namespace, hashes)
+
+        # Textos faltantes sin duplicados, en orden de aparición
+        pending: Dict[str, str] = {}
+        for h, text in zip(hashes, texts):
+            if h not in found and h not in pending:
+                pending[h] = text
+
+        if pending:
+            logger.info(f"Embeddings: {len(texts) - len(pending)} en caché, {len(pending)} nuevos")
+            computed = compute(list(pending.values()))
+            new_vectors = dict(zip(pending.keys(), computed))
+            self.cache.put_many(namespace, new_vectors)
+            found.update({h: np.asarray(v, dtype=np.float32) for h, v in new_vectors.items()})
+
+        return [found[h].tolist() for h in hashes]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeber chunks de documentos usando el caché"""
+        return self._embed_with_cache(self.model, texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeber una consulta usando el caché (espacio separado de los documentos)"""
+        return self._embed_with_cache(
+            f"{self.model}#query",
+            [text],
+            lambda pending: [self.embeddings.embed_query(t) for t in pending]
+        )[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embeber varias consultas usando el caché; las faltantes en una sola llamada"""
+        return self._embed_with_cache(
+            f"{self.model}#query",
+            texts,
+            lambda pending: embed_queries(self.embeddings, pending)
+        )
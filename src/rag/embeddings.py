@@ -0,0 +1,167 @@
+"""
+Backends de embeddings intercambiables para el sistema RAG
+
+- "openai": OpenAIEmbeddings (requiere OPENAI_API_KEY y red)
+- "local": HashingEmbeddings, TF con hashing en numpy, sin dependencias externas
+- "sentence-transformers": modelo local en CPU (requiere sentence-transformers)
+"""
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import os
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.rag.lexical import fold_accents, tokenize
+
+EMBEDDING_BACKENDS = ("openai", "local", "sentence-transformers")
+
+DEFAULT_BACKEND = "openai"
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embeddings locales por hashing de términos (feature hashing).
+
+    Cada texto se representa con sus tokens, bigramas de tokens y trigramas de
+    caracteres, con peso sublineal log(1 + tf) y signo por hash para reducir
+    colisiones. Es determinista, no usa red y embebe una consulta en menos de
+    un milisegundo.
+    """
+
+    def __init__(self, dim: int = 768, batch_size: int = 64, max_workers: int = 4):
+        """
+        Args:
+            dim: Dimensión del vector
+            batch_size: Textos por lote en embed_documents
+            max_workers: Hilos para procesar lotes en paralelo
+        """
+        self.dim = dim
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.model = f"local-hashing-v1-{dim}"
+
+    @staticmethod
+    def _features(text: str) -> List[tuple]:
+        """Extraer (feature, peso) de un texto"""
+        tokens = tokenize(text)
+        features = [(token, 1.0) for token in tokens]
+        features += [(f"{a} {b}", 0.5) for a, b in zip(tokens, tokens[1:])]
+
+        # Trigramas de caracteres: toleran variantes ("Willcahuain" / "Wilcahuain")
+        folded = fold_accents(text.lower())
+        for word in set(folded.split()):
+            padded = f"#{word}#"
+            features += [(padded[i:i + 3], 0.3) for i in range(len(padded) - 2)]
+        return features
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += weight if h & 0x80000000 else -weight
+
+        # Peso sublineal: log(1 + |tf|) conservando el signo
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_one(text).tolist() for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeber textos en lotes usando un pool de hilos"""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return self._embed_batch(texts)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(self._embed_batch, batches)
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeber una consulta"""
+        return self._embed_one(text).tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embeber varias consultas (mismo espacio que embed_query)"""
+        return self.embed_documents(texts)
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """Embeddings con un modelo sentence-transformers ejecutado en CPU"""
+
+    DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+    def __init__(self, model_name: Optional[str] = None, batch_size: int = 32):
+        """
+        Args:
+            model_name: Modelo de Hugging Face (multilingüe por defecto)
+            batch_size: Textos por lote
+        """
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "El backend 'sentence-transformers' requiere: pip install sentence-transformers"
+            ) from e
+
+        self.model = model_name or self.DEFAULT_MODEL
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(self.model, device="cpu")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeber textos en lotes"""
+        vectors = self._model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeber una consulta"""
+        return self.embed_documents([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embeber varias consultas en un solo lote"""
+        return self.embed_documents(texts)
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Embeber varias consultas con una sola llamada al backend.
+
+    Los backends soportados embeben consultas y documentos en el mismo espacio
+    (OpenAIEmbeddings.embed_query llama a embed_documents), así que sin un
+    método embed_queries propio se usa embed_documents.
+    """
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    return embeddings.embed_documents(texts)
+
+
+def resolve_backend_name(backend: Optional[str] = None) -> str:
+    """Nombre del backend a usar: el indicado, RAG_EMBEDDING_BACKEND o el de por defecto"""
+    return (backend or os.getenv("RAG_EMBEDDING_BACKEND") or DEFAULT_BACKEND).lower()
+
+
+def get_embedding_backend(backend: Optional[str] = None, openai_api_key: Optional[str] = None) -> Embeddings:
+    """
+    Crear el backend de embeddings configurado.
+
+    Args:
+        backend: Nombre del backend (por defecto RAG_EMBEDDING_BACKEND o "openai")
+        openai_api_key: API key para el backend "openai"
+
+    Returns:
+        Instancia de Embeddings (con atributo `model` para el manifest del índice)
+    """
+    backend = resolve_backend_name(backend)
+
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(openai_api_key=openai_api_key or os.getenv("OPENAI_API_KEY"))
+    if backend == "local":
+        return HashingEmbeddings(dim=int(os.getenv("RAG_LOCAL_EMBEDDING_DIM", "768")))
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbeddings(os.getenv("RAG_SENTENCE_TRANSFORMER_MODEL"))
+
+    raise ValueError(f"Backend de embeddings desconocido: {backend}. Opciones: {', '.join(EMBEDDING_BACKENDS)}")
@@ -0,0 +1,181 @@
+"""
+Descarga concurrente de páginas web con pool de conexiones compartido
+"""
+from typing import Dict, List, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, UnicodeDammit
+
+logger = logging.getLogger(__name__)
+
+# Identificación honesta del bot: la misma cadena se envía en cada descarga y
+# se usa para las reglas de robots.txt (el producto "HuarazTurismoBot")
+BOT_NAME = "HuarazTurismoBot"
+BOT_CONTACT = "https://github.com/AlexanderAndreChavezCabana"
+USER_AGENT = f"{BOT_NAME}/1.0 (+{BOT_CONTACT})"
+
+# Selectores del contenido principal, en orden de preferencia
+DEFAULT_CONTENT_SELECTORS = ["main", "article", "#content", ".content", ".container"]
+
+# Elementos que nunca aportan contenido útil al índice
+BOILERPLATE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe"]
+
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_http_session(pool_size: int = 16) -> requests.Session:
+    """
+    Obtener la sesión HTTP compartida (reutiliza conexiones keep-alive).
+
+    Args:
+        pool_size: Conexiones máximas por host
+
+    Returns:
+        requests.Session compartida por todo el proceso
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"User-Agent": USER_AGENT})
+            _session = session
+    return _session
+
+
+@dataclass
+class FetchResult:
+    """Resultado de descargar una URL"""
+    url: str
+    html: Optional[str] = None
+    status: Optional[int] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.html is not None and self.error is None
+
+
+@dataclass
+class LoadReport:
+    """Resumen agregado de una carga de páginas"""
+    loaded: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        text = f"{len(self.loaded)} páginas cargadas, {len(self.failed)} con error en {self.elapsed:.1f}s"
+        for url, error in self.failed.items():
+            text += f"\n  ✗ {url}: {error}"
+        return text
+
+
+def fetch_url(url: str, timeout: float = 10.0, session: Optional[requests.Session] = None) -> FetchResult:
+    """
+    Descargar una URL con un tiempo máximo total (conexión + lectura completa).
+
+    Args:
+        url: URL a descargar
+        timeout: Segundos máximos para toda la descarga
+        session: Sesión HTTP (por defecto la compartida)
+
+    Returns:
+        FetchResult con el HTML o el error
+    """
+    session = session or get_http_session()
+    start = time.monotonic()
+    deadline = start + timeout
+
+    try:
+        with session.get(url, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                body.extend(chunk)
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"tiempo máximo de {timeout}s excedido")
+                if len(body) > MAX_PAGE_BYTES:
+                    raise ValueError("página demasiado grande")
+            # Sin charset en la cabecera, detectar desde <meta> o el contenido
+            if "charset" in response.headers.get("Content-Type", "").lower():
+                html = bytes(body).decode(response.encoding, errors="replace")
+            else:
+                html = UnicodeDammit(bytes(body), is_html=True).unicode_markup
+            return FetchResult(url, html=html, status=response.status_code,
+                               elapsed=time.monotonic() - start)
+    except Exception as e:
+        return FetchResult(url, error=str(e) or type(e).__name__, elapsed=time.monotonic() - start)
+
+
+def fetch_many(urls: Sequence[str], max_workers: int = 8, timeout: float = 10.0) -> List[FetchResult]:
+    """
+    Descargar varias URLs en paralelo con concurrencia acotada.
+
+    Args:
+        urls: URLs a descargar
+        max_workers: Descargas simultáneas
+        timeout: Segundos máximos por URL
+
+    Returns:
+        Resultados en el mismo orden que las URLs
+    """
+    if not urls:
+        return []
+
+    session = get_http_session(pool_size=max(max_workers, 1))
+    with ThreadPoolExecutor(max_workers=max(min(max_workers, len(urls)), 1)) as executor:
+        return list(executor.map(lambda url: fetch_url(url, timeout, session), urls))
+
+
+def select_main_content(soup: BeautifulSoup, selectors: Sequence[str] = DEFAULT_CONTENT_SELECTORS):
+    """
+    Quitar elementos de navegación y devolver el nodo con el contenido principal.
+
+    Args:
+        soup: Documento parseado (se modifica)
+        selectors: Selectores CSS a probar en orden
+
+    Returns:
+        Nodo del contenido principal (o body / documento completo)
+    """
+    for tag in soup.find_all(BOILERPLATE_TAGS):
+        tag.decompose()
+
+    for selector in selectors:
+        node = soup.select_one(selector)
+        if node and len(node.get_text(strip=True)) > 200:
+            return node
+    return soup.body or soup
+
+
+def extract_main_content(html: str, selectors: Sequence[str] = DEFAULT_CONTENT_SELECTORS) -> Dict[str, str]:
+    """
+    Extraer título y texto del contenido principal de una página.
+
+    Args:
+        html: HTML de la página
+        selectors: Selectores CSS del contenido principal
+
+    Returns:
+        Diccionario con "title" y "text"
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    node = select_main_content(soup, selectors)
+
+    lines = [line.strip() for line in node.get_text("\n").splitlines()]
+    text = "\n".join(line for line in lines if line)
+    return {"title": title, "text": text}
@@ -0,0 +1,609 @@
+"""
+Formato en disco versionado para el índice RAG
+
+Estructura de un directorio de índice:
+
+    manifest.json              versión de esquema, modelo de embeddings, hashes de
+                               páginas, segmentos vigentes y chunks eliminados
+    segments/<nombre>/
+        segment.json           cantidad, dimensión y hashes de los chunks
+        vectors.npy            matriz float32 (n, dim) normalizada, se abre con mmap
+        chunks.bin             texto de los chunks en UTF-8, concatenado
+        offsets.npy            int64 (n + 1), límites de cada chunk dentro de chunks.bin
+        metadata.jsonl         metadata de cada chunk, una línea por chunk
+        ann.faiss              (opcional) índice aproximado IVF/HNSW, ver src/rag/ann.py
+
+Nada se deserializa con pickle: los vectores y el texto se mapean en memoria,
+de modo que varios workers comparten las mismas páginas del sistema operativo.
+
+Las actualizaciones incrementales agregan un segmento nuevo (delta) y marcan
+como eliminados los chunks reemplazados; los segmentos existentes no se
+reescriben hasta que se compacta el índice.
+"""
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from pathlib import Path
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.rag.ann import ANN_FILE, AnnConfig, ann_search_batch, build_ann_index, read_ann_index, write_ann_index
+from src.utils.atomic_io import atomic_writer, fsync_directory
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+
+MANIFEST_FILE = "manifest.json"
+SEGMENTS_DIR = "segments"
+SEGMENT_FILE = "segment.json"
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "offsets.npy"
+METADATA_FILE = "metadata.jsonl"
+
+# Umbrales de compactación
+MAX_SEGMENTS = 8
+MAX_DELETED_RATIO = 0.3
+
+# Los segmentos que dejan de usarse se marcan y se borran en un guardado
+# posterior, pasado este plazo: otro worker puede estar abriendo el índice
+# con el manifest anterior
+RETIRED_MARKER = ".retired"
+RETIRED_SEGMENT_GRACE_SECONDS = 600
+
+
+class IndexFormatError(ValueError):
+    """El índice en disco no existe, está incompleto o no es compatible"""
+
+
+def chunk_hash(text: str) -> str:
+    """Hash estable del contenido de un chunk"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Normalizar filas a norma 1 (producto interno == similitud coseno)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def new_segment_name() -> str:
+    """Nombre único y ordenable para un segmento"""
+    return "seg-" + datetime.now().strftime("%Y%m%d%H%M%S%f")
+
+
+@dataclass
+class IndexManifest:
+    """Descripción del contenido de un directorio de índice"""
+    embedding_model: str
+    dim: int
+    count: int = 0
+    pages: Dict[str, str] = field(default_factory=dict)
+    segments: List[str] = field(default_factory=list)
+    deleted: Dict[str, List[int]] = field(default_factory=dict)
+    ann: Dict[str, Any] = field(default_factory=dict)
+    schema_version: int = SCHEMA_VERSION
+    created_at: str = ""
+    updated_at: str = ""
+
+    @classmethod
+    def read(cls, path: Path) -> "IndexManifest":
+        """Leer manifest.json de un directorio de índice"""
+        manifest_path = path / MANIFEST_FILE
+        if not manifest_path.exists():
+            raise IndexFormatError(f"No se encontró manifest en: {path}")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        known = {key: value for key, value in data.items() if key in cls.__dataclass_fields__}
+        return cls(**known)
+
+    def write(self, path: Path):
+        """Escribir manifest.json de forma atómica (temporal + fsync + rename)"""
+        with atomic_writer(path / MANIFEST_FILE) as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+
+
+class ChunkSegment:
+    """Bloque inmutable de chunks: vectores, texto compacto y metadata"""
+
+    def __init__(
+        self,
+        name: str,
+        vectors: np.ndarray,
+        texts: Any,
+        offsets: np.ndarray,
+        metadatas: List[Dict[str, Any]],
+        hashes: List[str],
+        persisted: bool = False,
+        ann: Any = None
+    ):
+        """
+        Args:
+            name: Nombre del segmento (directorio dentro de segments/)
+            vectors: Matriz (n, dim) normalizada (puede ser un memmap)
+            texts: Buffer de bytes con el texto concatenado (bytes o mmap)
+            offsets: Límites de cada chunk en el buffer (n + 1)
+            metadatas: Metadata de cada chunk
+            hashes: Hash del texto de cada chunk
+            persisted: True si el segmento ya existe en disco
+            ann: Índice FAISS aproximado del segmento (None = búsqueda exacta)
+        """
+        self.name = name
+        self.vectors = vectors
+        self._texts = texts
+        self.offsets = offsets
+        self.metadatas = metadatas
+        self.hashes = hashes
+        self.persisted = persisted
+        self.ann = ann
+        self.ann_dirty = False
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    @classmethod
+    def from_documents(
+        cls,
+        documents: List[Document],
+        vectors: Iterable[Iterable[float]],
+        name: Optional[str] = None
+    ) -> "ChunkSegment":
+        """Construir un segmento en memoria desde chunks y sus embeddings"""
+        matrix = normalize_rows(np.array(list(vectors), dtype=np.float32))
+        if matrix.ndim != 2 or matrix.shape[0] != len(documents):
+            raise ValueError("La cantidad de vectores no coincide con la de documentos")
+
+        encoded = [doc.page_content.encode("utf-8") for doc in documents]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(chunk) for chunk in encoded])
+
+        return cls(
+            name or new_segment_name(),
+            matrix,
+            b"".join(encoded),
+            offsets,
+            [dict(doc.metadata) for doc in documents],
+            [chunk_hash(doc.page_content) for doc in documents]
+        )
+
+    def build_ann(self, config: AnnConfig):
+        """(Re)construir el índice aproximado según la configuración"""
+        self.ann = build_ann_index(self.vectors, config)
+        self.ann_dirty = True
+
+    def save_ann(self, path: Path):
+        """Escribir (o quitar) ann.faiss sin reescribir el resto del segmento"""
+        ann_path = path / ANN_FILE
+        if self.ann is not None:
+            # FAISS escribe por ruta: temporal en el mismo directorio y rename
+            tmp_path = path / f".{ANN_FILE}.tmp"
+            write_ann_index(self.ann, tmp_path)
+            with open(tmp_path, "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, ann_path)
+        elif ann_path.exists():
+            ann_path.unlink()
+        self.ann_dirty = False
+
+    def save(self, path: Path):
+        """
+        Escribir el segmento en su directorio.
+
+        Los archivos se escriben en un directorio temporal que se renombra al
+        final: el segmento aparece completo o no aparece.
+        """
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        np.save(tmp_path / VECTORS_FILE, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        np.save(tmp_path / OFFSETS_FILE, np.asarray(self.offsets, dtype=np.int64))
+        with open(tmp_path / CHUNKS_FILE, "wb") as f:
+            f.write(bytes(self._texts[:]))
+        self.save_ann(tmp_path)
+        with open(tmp_path / METADATA_FILE, "w", encoding="utf-8") as f:
+            for metadata in self.metadatas:
+                f.write(json.dumps(metadata, ensure_ascii=False) + "\n")
+        with open(tmp_path / SEGMENT_FILE, "w", encoding="utf-8") as f:
+            json.dump({
+                "count": len(self),
+                "dim": int(self.vectors.shape[1]),
+                "chunk_hashes": self.hashes
+            }, f, indent=2)
+
+        for file_path in tmp_path.iterdir():
+            with open(file_path, "rb") as f:
+                os.fsync(f.fileno())
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+        fsync_directory(path.parent)
+
+        self.persisted = True
+
+    @classmethod
+    def load(cls, path: Path) -> "ChunkSegment":
+        """Abrir un segmento mapeando vectores y texto en memoria"""
+        for filename in (SEGMENT_FILE, VECTORS_FILE, OFFSETS_FILE, CHUNKS_FILE, METADATA_FILE):
+            if not (path / filename).exists():
+                raise IndexFormatError(f"Falta {filename} en: {path}")
+
+        with open(path / SEGMENT_FILE, "r", encoding="utf-8") as f:
+            info = json.load(f)
+
+        vectors = np.load(path / VECTORS_FILE, mmap_mode="r")
+        offsets = np.load(path / OFFSETS_FILE, mmap_mode="r")
+        if vectors.shape != (info["count"], info["dim"]) or offsets.shape[0] != info["count"] + 1:
+            raise IndexFormatError(f"Dimensiones inconsistentes en: {path}")
+
+        texts: Any = b""
+        if (path / CHUNKS_FILE).stat().st_size > 0:
+            with open(path / CHUNKS_FILE, "rb") as f:
+                texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        with open(path / METADATA_FILE, "r", encoding="utf-8") as f:
+            metadatas = [json.loads(line) for line in f if line.strip()]
+
+        ann = read_ann_index(path / ANN_FILE) if (path / ANN_FILE).exists() else None
+
+        return cls(path.name, vectors, texts, offsets, metadatas,
+                   info.get("chunk_hashes", []), persisted=True, ann=ann)
+
+    def get_text(self, row: int) -> str:
+        """Obtener el texto de una fila"""
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self._texts[start:end].decode("utf-8")
+
+
+class ChunkIndex:
+    """Índice de chunks formado por segmentos, con eliminaciones lógicas"""
+
+    def __init__(self, segments: List[ChunkSegment], manifest: IndexManifest,
+                 deleted: Optional[Dict[str, Set[int]]] = None):
+        """
+        Args:
+            segments: Segmentos en orden (base primero, deltas después)
+            manifest: Manifest del índice
+            deleted: Filas eliminadas por segmento
+        """
+        self.segments = segments
+        self.manifest = manifest
+        self.deleted: Dict[str, Set[int]] = deleted or {}
+        self.ann_config = AnnConfig.from_dict(manifest.ann)
+        self._reindex_positions()
+
+    def _reindex_positions(self):
+        """Recalcular el desplazamiento global de cada segmento"""
+        self._starts = np.cumsum([0] + [len(segment) for segment in self.segments])
+
+    def __len__(self) -> int:
+        """Cantidad de chunks vigentes (sin los eliminados)"""
+        total = int(self._starts[-1])
+        return total - sum(len(rows) for rows in self.deleted.values())
+
+    @property
+    def embedding_model(self) -> str:
+        return self.manifest.embedding_model
+
+    @property
+    def size(self) -> int:
+        """Cantidad total de filas, incluidas las eliminadas"""
+        return int(self._starts[-1])
+
+    @classmethod
+    def from_documents(
+        cls,
+        documents: List[Document],
+        vectors: Iterable[Iterable[float]],
+        embedding_model: str,
+        pages: Optional[Dict[str, str]] = None,
+        ann_config: Optional[AnnConfig] = None
+    ) -> "ChunkIndex":
+        """
+        Construir índice en memoria desde chunks y sus embeddings.
+
+        Args:
+            documents: Chunks (Document) en el mismo orden que los vectores
+            vectors: Embeddings de cada chunk
+            embedding_model: Identificador del modelo de embeddings
+            pages: Hash del contenido de cada página indexada (url -> hash)
+            ann_config: Tipo de índice aproximado (por defecto búsqueda exacta)
+
+        Returns:
+            ChunkIndex listo para buscar o guardar
+        """
+        ann_config = ann_config or AnnConfig()
+        segment = ChunkSegment.from_documents(documents, vectors)
+        segment.build_ann(ann_config)
+        now = datetime.now().isoformat()
+        manifest = IndexManifest(
+            embedding_model=embedding_model,
+            dim=int(segment.vectors.shape[1]),
+            pages=dict(pages or {}),
+            ann=ann_config.to_dict(),
+            created_at=now,
+            updated_at=now
+        )
+        return cls([segment], manifest)
+
+    def _locate(self, position: int) -> Tuple[ChunkSegment, int]:
+        """Convertir una posición global en (segmento, fila)"""
+        index = int(np.searchsorted(self._starts, position, side="right")) - 1
+        return self.segments[index], position - int(self._starts[index])
+
+    def is_deleted(self, position: int) -> bool:
+        segment, row = self._locate(position)
+        return row in self.deleted.get(segment.name, ())
+
+    def live_positions(self) -> Iterator[int]:
+        """Iterar posiciones globales de los chunks vigentes"""
+        for segment, start in zip(self.segments, self._starts):
+            deleted = self.deleted.get(segment.name, ())
+            for row in range(len(segment)):
+                if row not in deleted:
+                    yield int(start) + row
+
+    def get_text(self, position: int) -> str:
+        """Obtener el texto del chunk en una posición global"""
+        segment, row = self._locate(position)
+        return segment.get_text(row)
+
+    def get_metadata(self, position: int) -> Dict[str, Any]:
+        """Obtener la metadata del chunk en una posición global"""
+        segment, row = self._locate(position)
+        return segment.metadatas[row]
+
+    def get_hash(self, position: int) -> str:
+        """Obtener el hash del chunk en una posición global"""
+        segment, row = self._locate(position)
+        return segment.hashes[row]
+
+    def get_vector(self, position: int) -> np.ndarray:
+        """Obtener el embedding normalizado del chunk en una posición global"""
+        segment, row = self._locate(position)
+        return np.asarray(segment.vectors[row], dtype=np.float32)
+
+    def get_document(self, position: int) -> Document:
+        """Obtener el chunk en una posición global como Document"""
+        segment, row = self._locate(position)
+        return Document(page_content=segment.get_text(row), metadata=dict(segment.metadatas[row]))
+
+    def add_documents(self, documents: List[Document], vectors: Iterable[Iterable[float]]) -> int:
+        """
+        Agregar chunks como un segmento delta (se persiste en el próximo save).
+
+        Returns:
+            Cantidad de chunks agregados
+        """
+        if not documents:
+            return 0
+        segment = ChunkSegment.from_documents(documents, vectors)
+        if segment.vectors.shape[1] != self.manifest.dim:
+            raise ValueError("La dimensión de los vectores no coincide con la del índice")
+        segment.build_ann(self.ann_config)
+        self.segments.append(segment)
+        self._reindex_positions()
+        return len(segment)
+
+    def delete_where(self, predicate: Callable[[Dict[str, Any]], bool]) -> int:
+        """
+        Marcar como eliminados los chunks cuya metadata cumple el predicado.
+
+        Returns:
+            Cantidad de chunks eliminados
+        """
+        removed = 0
+        for segment in self.segments:
+            deleted = self.deleted.setdefault(segment.name, set())
+            for row, metadata in enumerate(segment.metadatas):
+                if row not in deleted and predicate(metadata):
+                    deleted.add(row)
+                    removed += 1
+        return removed
+
+    def needs_compaction(self) -> bool:
+        """Indicar si conviene reescribir el índice en un solo segmento"""
+        if len(self.segments) > MAX_SEGMENTS:
+            return True
+        return self.size > 0 and (self.size - len(self)) / self.size > MAX_DELETED_RATIO
+
+    def compact(self):
+        """Reescribir los chunks vigentes en un único segmento (sin recalcular embeddings)"""
+        positions = list(self.live_positions())
+        documents = [self.get_document(p) for p in positions]
+        vectors = np.zeros((len(positions), self.manifest.dim), dtype=np.float32)
+        for i, position in enumerate(positions):
+            segment, row = self._locate(position)
+            vectors[i] = segment.vectors[row]
+
+        logger.info(f"Compactando índice: {len(self.segments)} segmentos -> 1 ({len(positions)} chunks)")
+        segment = ChunkSegment.from_documents(documents, vectors)
+        segment.build_ann(self.ann_config)
+        self.segments = [segment]
+        self.deleted = {}
+        self._reindex_positions()
+
+    def set_ann_config(self, config: AnnConfig):
+        """
+        Cambiar el tipo de índice aproximado reconstruyéndolo sobre los vectores
+        guardados (no recalcula embeddings). Se persiste en el próximo save.
+        """
+        logger.info(f"Reconstruyendo índice aproximado: {self.ann_config.type} -> {config.type}")
+        self.ann_config = config
+        self.manifest.ann = config.to_dict()
+        for segment in self.segments:
+            segment.build_ann(config)
+
+    def save(self, path: Path):
+        """
+        Guardar índice en un directorio.
+
+        Solo se escriben los segmentos nuevos; el manifest se reemplaza de forma
+        atómica al final, por lo que un guardado interrumpido deja vigente el
+        índice anterior. Los segmentos que quedan fuera se borran recién en un
+        guardado posterior (ver RETIRED_SEGMENT_GRACE_SECONDS), para que un
+        worker que leyó el manifest anterior pueda abrirlos. Quien llama debe
+        serializar los guardados entre procesos (ver HuarazWebRAG.save_vector_store).
+
+        Args:
+            path: Directorio destino (se crea si no existe)
+        """
+        segments_path = path / SEGMENTS_DIR
+        segments_path.mkdir(parents=True, exist_ok=True)
+
+        for segment in self.segments:
+            if not segment.persisted or not (segments_path / segment.name).exists():
+                segment.save(segments_path / segment.name)
+            elif segment.ann_dirty:
+                segment.save_ann(segments_path / segment.name)
+
+        self.manifest.segments = [segment.name for segment in self.segments]
+        self.manifest.deleted = {name: sorted(rows) for name, rows in self.deleted.items() if rows}
+        self.manifest.count = len(self)
+        self.manifest.updated_at = datetime.now().isoformat()
+        self.manifest.write(path)
+
+        self._retire_segments(segments_path)
+
+    def _retire_segments(self, segments_path: Path):
+        """
+        Marcar los segmentos que ya no forman parte del índice y borrar los
+        marcados hace más de RETIRED_SEGMENT_GRACE_SECONDS.
+        """
+        now = time.time()
+        for segment_dir in segments_path.iterdir():
+            if not segment_dir.is_dir():
+                continue
+            marker = segment_dir / RETIRED_MARKER
+            if segment_dir.name in self.manifest.segments:
+                if marker.exists():
+                    marker.unlink()
+            elif not marker.exists():
+                marker.touch()
+            elif now - marker.stat().st_mtime > RETIRED_SEGMENT_GRACE_SECONDS:
+                shutil.rmtree(segment_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: Path, embedding_model: Optional[str] = None) -> "ChunkIndex":
+        """
+        Abrir un índice guardado mapeando vectores y texto en memoria.
+
+        Args:
+            path: Directorio del índice
+            embedding_model: Modelo esperado; si no coincide se rechaza el índice
+
+        Returns:
+            ChunkIndex
+
+        Raises:
+            IndexFormatError: Si falta algún archivo o el índice no es compatible
+        """
+        manifest = IndexManifest.read(path)
+
+        if manifest.schema_version != SCHEMA_VERSION:
+            raise IndexFormatError(
+                f"Versión de esquema {manifest.schema_version} no soportada (esperada {SCHEMA_VERSION})"
+            )
+        if embedding_model and manifest.embedding_model != embedding_model:
+            raise IndexFormatError(
+                f"Índice creado con '{manifest.embedding_model}', se esperaba '{embedding_model}'"
+            )
+
+        segments = [ChunkSegment.load(path / SEGMENTS_DIR / name) for name in manifest.segments]
+        for segment in segments:
+            if segment.vectors.shape[1] != manifest.dim:
+                raise IndexFormatError(f"Segmento {segment.name} con dimensión distinta al manifest")
+
+        deleted = {name: set(rows) for name, rows in manifest.deleted.items()}
+        return cls(segments, manifest, deleted)
+
+    def search(
+        self,
+        query_vector: Iterable[float],
+        k: int = 4,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Buscar los k chunks vigentes más similares (similitud coseno).
+
+        Args:
+            query_vector: Embedding de la consulta
+            k: Número de resultados
+            nprobe: Listas IVF a visitar por segmento (por defecto la del índice)
+            ef_search: Amplitud de búsqueda HNSW (por defecto la del índice)
+
+        Returns:
+            Lista de tuplas (posición global del chunk, score) de mayor a menor score
+        """
+        query = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+        return self.search_batch(query, k=k, nprobe=nprobe, ef_search=ef_search)[0]
+
+    def search_batch(
+        self,
+        query_vectors: Iterable[Iterable[float]],
+        k: int = 4,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Buscar varias consultas a la vez con una multiplicación de matrices por
+        segmento (o una sola llamada a FAISS en segmentos con índice aproximado).
+
+        Los segmentos sin índice aproximado se buscan de forma exacta; también
+        cuando se piden casi todas sus filas.
+
+        Args:
+            query_vectors: Embeddings de las consultas (m, dim)
+            k: Número de resultados por consulta
+            nprobe: Listas IVF a visitar por segmento (por defecto la del índice)
+            ef_search: Amplitud de búsqueda HNSW (por defecto la del índice)
+
+        Returns:
+            Por consulta, lista de tuplas (posición global del chunk, score) de mayor a menor
+        """
+        queries = normalize_rows(np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.manifest.dim))
+        candidates: List[List[Tuple[int, float]]] = [[] for _ in range(queries.shape[0])]
+        if len(self) == 0:
+            return candidates
+
+        for segment, start in zip(self.segments, self._starts):
+            if len(segment) == 0:
+                continue
+            deleted = self.deleted.get(segment.name)
+            wanted = k + len(deleted or ())
+
+            if segment.ann is not None and wanted * 2 < len(segment):
+                found = ann_search_batch(segment.ann, segment.vectors, queries, wanted,
+                                         self.ann_config, nprobe=nprobe, ef_search=ef_search)
+                for results, (rows, scores) in zip(candidates, found):
+                    results.extend((int(start) + int(row), float(score))
+                                   for row, score in zip(rows, scores)
+                                   if not deleted or int(row) not in deleted)
+                continue
+
+            scores = np.asarray(queries @ np.asarray(segment.vectors).T, dtype=np.float32)
+            if deleted:
+                scores[:, list(deleted)] = -np.inf
+            top_k = min(k, scores.shape[1])
+            top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+            for results, row_scores, row_top in zip(candidates, scores, top):
+                results.extend((int(start) + int(i), float(row_scores[i]))
+                               for i in row_top if np.isfinite(row_scores[i]))
+
+        for results in candidates:
+            results.sort(key=lambda item: -item[1])
+            del results[k:]
+        return candidates
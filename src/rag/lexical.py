@@ -0,0 +1,129 @@
+"""
+Índice léxico BM25 para español y fusión de rankings (RRF)
+"""
+from typing import Dict, Iterable, List, Sequence, Tuple
+from collections import Counter
+import math
+import re
+import unicodedata
+
+# Stopwords frecuentes en español (sin tildes, se aplican después de normalizar)
+SPANISH_STOPWORDS = frozenset("""
+a al algo algunas algunos ante antes como con contra cual cuales cuando de del desde
+donde dos el ella ellas ellos en entre era es esa esas ese eso esos esta estas este
+esto estos fue ha hay la las le les lo los mas me mi mis muy no nos o os otra otro
+para pero poco por porque que quien se sea ser si sin sobre su sus tambien te tiene
+todo todos tu tus un una unas uno unos y ya
+""".split())
+
+# "s/" (soles), números con sufijo ("3d", "2n", "4000m") y palabras
+TOKEN_PATTERN = re.compile(r"s/|\d+[a-z]*|[a-z]+")
+
+
+def fold_accents(text: str) -> str:
+    """Quitar tildes y diacríticos ("Chavín" -> "Chavin", "ñ" -> "n")"""
+    normalized = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in normalized if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokenizar texto en español para búsqueda léxica.
+
+    Args:
+        text: Texto a tokenizar
+
+    Returns:
+        Tokens en minúsculas, sin tildes y sin stopwords
+    """
+    folded = fold_accents(text.lower())
+    return [token for token in TOKEN_PATTERN.findall(folded) if token not in SPANISH_STOPWORDS]
+
+
+class BM25Index:
+    """Índice invertido con ranking BM25 (Okapi)"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.avg_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, documents: Iterable[Tuple[int, str]], **kwargs) -> "BM25Index":
+        """
+        Construir índice desde pares (id, texto).
+
+        Args:
+            documents: Iterable de (id del documento, texto)
+
+        Returns:
+            BM25Index
+        """
+        index = cls(**kwargs)
+        for doc_id, text in documents:
+            tokens = tokenize(text)
+            index.doc_lengths[doc_id] = len(tokens)
+            for token, freq in Counter(tokens).items():
+                index.postings.setdefault(token, []).append((doc_id, freq))
+        if index.doc_lengths:
+            index.avg_length = sum(index.doc_lengths.values()) / len(index.doc_lengths)
+        return index
+
+    def idf(self, token: str) -> float:
+        """IDF BM25 de un token ya normalizado (0 si no aparece en el índice)"""
+        postings = self.postings.get(token)
+        if not postings:
+            return 0.0
+        n_docs = len(self.doc_lengths)
+        return math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """
+        Buscar documentos por coincidencia léxica.
+
+        Args:
+            query: Consulta
+            k: Número de resultados
+
+        Returns:
+            Lista de (id del documento, score BM25) de mayor a menor
+        """
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return []
+
+        scores: Dict[int, float] = {}
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = self.idf(token)
+            for doc_id, freq in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_length or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        return ranked[:k]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Fusionar rankings con Reciprocal Rank Fusion: score = sum(1 / (k + rank)).
+
+    Args:
+        rankings: Listas de ids ordenadas de mejor a peor
+        k: Constante de suavizado (60 es el valor estándar)
+
+    Returns:
+        Lista de (id, score RRF) de mayor a menor
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
@@ -0,0 +1,224 @@
+"""
+Historial de precios de tours entre scrapes
+
+tours_data.json solo guarda la última foto del catálogo. Cada scrape se
+registra además en SQLite como observaciones (tour, precio, fecha, url, hash):
+
+- observations: una fila por tour y scrape (append-only); `changed` marca las
+  filas cuyo precio o contenido difiere de la observación anterior del tour
+- latest: última observación por tour, para leer la foto actual sin recorrer
+  el historial
+
+La compactación elimina las observaciones antiguas sin cambios: los cambios
+de precio se conservan siempre y `latest` recuerda la última vez que se vio
+cada tour.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+from dataclasses import asdict
+from pathlib import Path
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from src.rag.catalogue import parse_price
+
+logger = logging.getLogger(__name__)
+
+
+def tour_key(tour: Any) -> str:
+    """Identificador estable de un tour (URL, o nombre si no tiene)"""
+    return tour.url or tour.name
+
+
+def tour_hash(tour: Any) -> str:
+    """Hash SHA-256 del contenido completo de un TourInfo"""
+    data = json.dumps(asdict(tour), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class PriceHistory:
+    """Serie temporal de precios en SQLite"""
+
+    def __init__(self, path: Path):
+        """
+        Abrir (o crear) el historial.
+
+        Args:
+            path: Archivo SQLite
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS observations ("
+            " id INTEGER PRIMARY KEY,"
+            " tour TEXT NOT NULL,"
+            " scraped_at REAL NOT NULL,"
+            " price TEXT,"
+            " amount REAL,"
+            " currency TEXT,"
+            " url TEXT,"
+            " hash TEXT NOT NULL,"
+            " changed INTEGER NOT NULL,"
+            " previous_price TEXT);"
+            "CREATE INDEX IF NOT EXISTS observations_tour ON observations (tour, scraped_at);"
+            "CREATE INDEX IF NOT EXISTS observations_changes ON observations (changed, scraped_at);"
+            "CREATE TABLE IF NOT EXISTS latest ("
+            " tour TEXT PRIMARY KEY,"
+            " name TEXT NOT NULL,"
+            " price TEXT,"
+            " amount REAL,"
+            " currency TEXT,"
+            " url TEXT,"
+            " hash TEXT NOT NULL,"
+            " first_seen REAL NOT NULL,"
+            " last_seen REAL NOT NULL,"
+            " last_changed REAL NOT NULL);"
+        )
+        self._conn.commit()
+
+    def record(self, tours: Iterable[Any], scraped_at: Optional[float] = None) -> int:
+        """
+        Registrar un scrape completo en una sola transacción.
+
+        Args:
+            tours: Lista de TourInfo
+            scraped_at: Fecha del scrape (epoch; por defecto ahora)
+
+        Returns:
+            Número de tours nuevos o con cambios
+        """
+        scraped_at = time.time() if scraped_at is None else scraped_at
+        changes = 0
+
+        with self._lock:
+            previous = {
+                tour: (digest, price)
+                for tour, digest, price in self._conn.execute("SELECT tour, hash, price FROM latest")
+            }
+            observations = []
+            for tour in tours:
+                key = tour_key(tour)
+                digest = tour_hash(tour)
+                amount, currency = parse_price(tour.price)
+                old = previous.get(key)
+                changed = old is None or old[0] != digest
+                changes += changed
+                observations.append((key, scraped_at, tour.price, amount, currency, tour.url,
+                                     digest, int(changed), old[1] if old else None))
+
+                self._conn.execute(
+                    "INSERT INTO latest (tour, name, price, amount, currency, url, hash,"
+                    " first_seen, last_seen, last_changed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(tour) DO UPDATE SET name = excluded.name, price = excluded.price,"
+                    " amount = excluded.amount, currency = excluded.currency, url = excluded.url,"
+                    " hash = excluded.hash, last_seen = excluded.last_seen,"
+                    " last_changed = CASE WHEN latest.hash = excluded.hash"
+                    " THEN latest.last_changed ELSE excluded.last_changed END",
+                    (key, tour.name, tour.price, amount, currency, tour.url, digest,
+                     scraped_at, scraped_at, scraped_at)
+                )
+
+            self._conn.executemany(
+                "INSERT INTO observations (tour, scraped_at, price, amount, currency, url, hash,"
+                " changed, previous_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                observations
+            )
+            self._conn.commit()
+
+        logger.info(f"✓ Historial de precios: {len(observations)} tours, {changes} con cambios")
+        return changes
+
+    def latest(self) -> List[Dict[str, Any]]:
+        """Último precio conocido por tour"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT tour, name, price, amount, currency, url, first_seen, last_seen, last_changed"
+                " FROM latest ORDER BY name"
+            )
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def latest_hashes(self) -> Dict[str, str]:
+        """Hash de la última observación por tour (para saber si un scrape trae cambios)"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT tour, hash FROM latest").fetchall())
+
+    def changes_since(self, since: float, price_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Tours nuevos o modificados desde una fecha.
+
+        Args:
+            since: Fecha (epoch) desde la que buscar
+            price_only: Solo cambios de precio (ignorar cambios de descripción, duración, ...)
+
+        Returns:
+            Cambios en orden cronológico con precio anterior y nuevo
+        """
+        query = (
+            "SELECT tour, scraped_at, previous_price, price, amount, currency, url"
+            " FROM observations WHERE changed = 1 AND scraped_at >= ?"
+        )
+        if price_only:
+            query += " AND previous_price IS NOT price"
+        with self._lock:
+            cursor = self._conn.execute(query + " ORDER BY scraped_at, id", (since,))
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def history(self, tour: str) -> List[Dict[str, Any]]:
+        """Serie de precios de un tour (solo las observaciones con cambios)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT scraped_at, price, amount, currency FROM observations"
+                " WHERE tour = ? AND changed = 1 ORDER BY scraped_at, id",
+                (tour,)
+            )
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def compact(self, older_than: float = 0.0) -> int:
+        """
+        Eliminar observaciones sin cambios anteriores a una fecha y recuperar espacio.
+
+        Args:
+            older_than: Fecha (epoch) límite; 0 compacta todo el historial
+
+        Returns:
+            Filas eliminadas
+        """
+        cutoff = older_than or time.time()
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM observations WHERE changed = 0 AND scraped_at < ?", (cutoff,)
+            ).rowcount
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+        logger.info(f"✓ Historial compactado: {removed} observaciones sin cambios eliminadas")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamaño del historial"""
+        with self._lock:
+            observations, changes, first, last = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(changed), 0), MIN(scraped_at), MAX(scraped_at) FROM observations"
+            ).fetchone()
+            tours = self._conn.execute("SELECT COUNT(*) FROM latest").fetchone()[0]
+        return {
+            "tours": tours,
+            "observations": observations,
+            "changes": changes,
+            "first_scrape": first,
+            "last_scrape": last,
+            "bytes": self.path.stat().st_size if self.path.exists() else 0,
+        }
+
+    def close(self):
+        """Cerrar la conexión SQLite"""
+        with self._lock:
+            self._conn.close()
@@ -2,16 +2,36 @@
 Scraper especializado para extraer precios y tours de huarazturismo.com
 """
 import re
-import requests
 from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Optional
 import logging
 from dataclasses import dataclass, asdict
+import hashlib
 import json
+import os
+import threading
+import time
 from pathlib import Path
+from urllib.parse import urlparse
+from src.rag.artifact import ARTIFACT_CATALOGUE_FILE, ArtifactError, ArtifactManifest, find_artifact
+from src.rag.crawler import crawl_cycle
+from src.rag.fetcher import get_http_session
+from src.rag.price_history import PriceHistory, tour_key
+from src.utils.atomic_io import FileLock, SingleFlight, atomic_write
+from src.utils.config import load_knowledge_config
 
 logger = logging.getLogger(__name__)
 
+# Foto del catálogo incluida en el repositorio: permite responder precios desde
+# el arranque aunque el caché (data/rag_cache) esté vacío
+BUNDLED_SNAPSHOT = Path("data/knowledge/tours_snapshot.json")
+
+# Antigüedad máxima del caché antes de actualizarlo en segundo plano
+DEFAULT_MAX_AGE_HOURS = 24.0
+
+# Rutas del sitio que corresponden a tours, paquetes o trekking
+TOUR_PATH_PATTERN = re.compile(r'^/(paquete|tour|trek|trekking|laguna|huaraz-de-aventura|honda)[\w-]*\.php$')
+
 
 @dataclass
 class TourInfo:
@@ -82,6 +102,18 @@ class HuarazPriceScraper:
         self.tours: List[TourInfo] = []
         self.cache_file = Path("data/rag_cache/tours_data.json")
         self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        self.snapshot_file = BUNDLED_SNAPSHOT
+        self.history_file = Path("data/rag_cache/price_history.sqlite")
+        # Origen de self.tours: "cache", "artifact", "snapshot", "crawl" o "scrape"; updated_at en epoch
+        self.source: Optional[str] = None
+        self.updated_at: Optional[float] = None
+        self._history: Optional[PriceHistory] = None
+        self._snapshot_hash: Optional[str] = None
+        # Un solo worker hace scraping a la vez; el lock de escritura protege el caché
+        self._refresh_flight = SingleFlight(self.cache_file.with_suffix(".refresh.lock"))
+        self.write_lock_file = self.cache_file.with_suffix(".lock")
+        # Funciones a llamar con los cambios de precio de cada scrape
+        self._price_listeners: List[Callable[[List[Dict[str, Any]]], Any]] = []
     
     def extract_price(self, soup: BeautifulSoup) -> Optional[str]:
         """Extraer precio de la página"""
@@ -162,20 +194,25 @@ class HuarazPriceScraper:
         
         return includes
     
-    def scrape_tour_page(self, url_path: str) -> Optional[TourInfo]:
-        """Scrape una página de tour específica"""
-        full_url = self.BASE_URL + url_path
+    def is_tour_url(self, url: str) -> bool:
+        """Indicar si una URL del sitio corresponde a un tour, paquete o trekking"""
+        return tour_type_for_url(url) is not None
+    
+    def parse_tour_page(self, url: str, html: str) -> Optional[TourInfo]:
+        """
+        Extraer la información de un tour desde el HTML ya descargado.
+        
+        Args:
+            url: URL completa de la página
+            html: HTML de la página
+        
+        Returns:
+            TourInfo o None si la página no se pudo interpretar
+        """
+        url_path = urlparse(url).path
         
         try:
-            logger.info(f"Scraping: {full_url}")
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(full_url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = BeautifulSoup(html, 'html.parser')
             
             # Extraer título
             title = soup.find('title')
@@ -184,13 +221,6 @@ class HuarazPriceScraper:
             # Limpiar nombre
             name = re.sub(r'\d{4}', '', name).strip()  # Remover años
             
-            # Determinar tipo de tour
-            tour_type = "tour"
-            if "/paquete" in url_path or "/huaraz-" in url_path:
-                tour_type = "package"
-            elif "/trekking" in url_path or "/trek" in url_path:
-                tour_type = "trekking"
-            
             # Extraer información
             tour_info = TourInfo(
                 name=name,
@@ -198,8 +228,8 @@ class HuarazPriceScraper:
                 duration=self.extract_duration(soup),
                 difficulty=self.extract_difficulty(soup),
                 includes=self.extract_includes(soup),
-                url=full_url,
-                tour_type=tour_type
+                url=url,
+                tour_type=tour_type_for_url(url) or "tour"
             )
             
             # Extraer descripción (primeros párrafos)
@@ -207,52 +237,244 @@ class HuarazPriceScraper:
             description = ' '.join([p.get_text().strip() for p in paragraphs])
             tour_info.description = description[:300] if description else None
             
-            logger.info(f"✓ Extraído: {name} ({tour_type}) - {tour_info.price or 'Sin precio'}")
+            logger.info(f"✓ Extraído: {name} ({tour_info.tour_type}) - {tour_info.price or 'Sin precio'}")
             return tour_info
             
+        except Exception as e:
+            logger.error(f"Error procesando {url}: {str(e)}")
+            return None
+    
+    def scrape_tour_page(self, url_path: str) -> Optional[TourInfo]:
+        """Scrape una página de tour específica"""
+        full_url = self.BASE_URL + url_path
+        
+        try:
+            logger.info(f"Scraping: {full_url}")
+            
+            # Sesión compartida: reutiliza conexiones keep-alive con el sitio
+            response = get_http_session().get(full_url, timeout=10)
+            response.raise_for_status()
+            
+            return self.parse_tour_page(full_url, response.text)
+            
         except Exception as e:
             logger.error(f"Error scraping {full_url}: {str(e)}")
             return None
     
+    def load_from_pages(self, pages: List[Any]) -> List[TourInfo]:
+        """
+        Construir el catálogo desde páginas ya descargadas por el crawler.
+        
+        Sin tours entre las páginas se conserva el catálogo anterior.
+        
+        Args:
+            pages: Páginas con atributos url y html (CrawledPage)
+        
+        Returns:
+            Lista de tours extraídos
+        """
+        tours = []
+        for page in pages:
+            if self.is_tour_url(page.url):
+                tour = self.parse_tour_page(page.url, page.html)
+                if tour:
+                    tours.append(tour)
+        
+        if tours:
+            self.tours = tours
+            self.source = "crawl"
+            self.updated_at = time.time()
+        logger.info(f"✓ Catálogo desde crawl: {len(tours)} tours")
+        return tours
+    
+    def crawl_tours(self, force: bool = False) -> List[TourInfo]:
+        """
+        Catálogo desde el ciclo de crawl compartido con el índice RAG (ver
+        crawl_cycle); si no trae tours se recorren las TOUR_PAGES fijas.
+        
+        Args:
+            force: Descargar un ciclo nuevo aunque el vigente sea reciente
+        
+        Returns:
+            Lista de tours extraídos
+        """
+        try:
+            tours = self.load_from_pages(crawl_cycle(force=force))
+        except Exception as e:
+            logger.error(f"Error en el ciclo de crawl: {str(e)}")
+            tours = []
+        if tours:
+            return tours
+        logger.warning("El crawl no trajo tours, se usan las páginas fijas")
+        return self.scrape_all_tours()
+    
     def scrape_all_tours(self) -> List[TourInfo]:
-        """Scrape todas las páginas de tours"""
+        """Scrape todas las páginas de tours (TOUR_PAGES)"""
         logger.info("Iniciando scraping de tours...")
         
-        self.tours = []
+        # Se arma en una lista nueva: los lectores siguen viendo el catálogo anterior
+        tours = []
         for url_path in self.TOUR_PAGES:
             tour = self.scrape_tour_page(url_path)
             if tour:
-                self.tours.append(tour)
+                tours.append(tour)
         
-        logger.info(f"✓ Scraping completado: {len(self.tours)} tours encontrados")
-        return self.tours
+        if tours:
+            self.tours = tours
+            self.source = "scrape"
+            self.updated_at = time.time()
+        else:
+            logger.warning("Scraping sin resultados, se conserva el catálogo anterior")
+        logger.info(f"✓ Scraping completado: {len(tours)} tours encontrados")
+        return tours
+    
+    def refresh(self, wait: bool = False) -> bool:
+        """
+        Actualizar el catálogo desde el crawl (ver crawl_tours) y guardar el
+        caché, con un solo worker a la vez.
+        
+        Si otro hilo o proceso ya está actualizando, se conserva el catálogo
+        vigente; con wait=True se espera a que termine y se recarga su caché.
+        
+        Args:
+            wait: Esperar a una actualización en curso en lugar de omitirla
+        
+        Returns:
+            True si hay tours disponibles tras la llamada
+        """
+        def scrape_and_save():
+            if self.crawl_tours():
+                self.save_to_cache()
+        
+        if not self._refresh_flight.run(scrape_and_save, wait=wait) and wait:
+            self.load_from_cache()
+        return bool(self.tours)
+    
+    @property
+    def history(self) -> PriceHistory:
+        """Historial de precios (se abre al primer uso)"""
+        if self._history is None:
+            self._history = PriceHistory(self.history_file)
+        return self._history
+    
+    def add_price_listener(self, callback: Callable[[List[Dict[str, Any]]], Any]):
+        """
+        Registrar una función que recibe los cambios de precio de cada scrape.
+        
+        Args:
+            callback: Recibe la lista de cambios de PriceHistory.changes_since
+                      (tour, name, previous_price, price, url, ...)
+        """
+        if callback not in self._price_listeners:
+            self._price_listeners.append(callback)
+    
+    def _notify_price_changes(self, scraped_at: float):
+        # Solo tours que ya tenían precio: los nuevos no son un cambio
+        changes = [
+            change for change in self.history.changes_since(scraped_at, price_only=True)
+            if change["previous_price"] is not None
+        ]
+        if not changes:
+            return
+        names = {tour_key(tour): tour.name for tour in self.tours}
+        for change in changes:
+            change["name"] = names.get(change["tour"], change["tour"])
+        for callback in self._price_listeners:
+            try:
+                callback(changes)
+            except Exception as e:
+                logger.error(f"Error notificando cambios de precio: {str(e)}")
     
     def save_to_cache(self):
-        """Guardar datos en caché"""
+        """
+        Registrar el scrape en el historial de precios y guardar la foto actual.
+        
+        tours_data.json solo se reescribe si el catálogo cambió.
+        """
+        tours = self.tours
+        scraped_at = time.time()
+        try:
+            if self.history.record(tours, scraped_at) and self._price_listeners:
+                self._notify_price_changes(scraped_at)
+        except Exception as e:
+            logger.error(f"Error registrando historial de precios: {str(e)}")
+        
         try:
-            data = [asdict(tour) for tour in self.tours]
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            data = json.dumps([asdict(tour) for tour in tours], ensure_ascii=False, indent=2)
+            snapshot_hash = hashlib.sha256(data.encode('utf-8')).hexdigest()
+            if snapshot_hash == self._snapshot_hash and self.cache_file.exists():
+                # Sin cambios: solo se marca el caché como verificado ahora
+                os.utime(self.cache_file)
+                logger.info("✓ Catálogo sin cambios, caché vigente")
+                return
+            # Temporal + fsync + rename: un corte nunca deja el JSON truncado
+            with FileLock(self.write_lock_file):
+                atomic_write(self.cache_file, data)
+            self._snapshot_hash = snapshot_hash
             logger.info(f"✓ Datos guardados en: {self.cache_file}")
         except Exception as e:
             logger.error(f"Error guardando caché: {str(e)}")
     
     def load_from_cache(self) -> bool:
         """Cargar datos desde caché"""
+        return self._load_file(self.cache_file, "cache")
+    
+    def load_snapshot(self) -> bool:
+        """
+        Cargar el catálogo sin hacer scraping: el caché local, el artefacto
+        precompilado (data/artifact) o la foto incluida en el repositorio.
+        
+        Returns:
+            True si hay tours disponibles
+        """
+        if self.load_from_cache() or self.load_artifact():
+            return True
+        return self._load_file(self.snapshot_file, "snapshot")
+    
+    def load_artifact(self) -> bool:
+        """Cargar el catálogo del artefacto; su antigüedad es la del build"""
+        path = find_artifact()
+        if path is None:
+            return False
+        
         try:
-            if not self.cache_file.exists():
+            manifest = ArtifactManifest.read(path)
+        except ArtifactError as e:
+            logger.warning(f"Artefacto ignorado: {str(e)}")
+            return False
+        
+        if not self._load_file(path / ARTIFACT_CATALOGUE_FILE, "artifact"):
+            return False
+        self.updated_at = manifest.built_at_epoch
+        return True
+    
+    def _load_file(self, path: Path, source: str) -> bool:
+        """Cargar tours desde un JSON con el formato de save_to_cache"""
+        try:
+            if not path.exists():
                 return False
             
-            with open(self.cache_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(path, 'r', encoding='utf-8') as f:
+                raw = f.read()
+            data = json.loads(raw)
             
             self.tours = [TourInfo(**tour_data) for tour_data in data]
-            logger.info(f"✓ Cargados {len(self.tours)} tours desde caché")
+            self.source = source
+            self.updated_at = path.stat().st_mtime
+            if source == "cache":
+                self._snapshot_hash = hashlib.sha256(raw.encode('utf-8')).hexdigest()
+            logger.info(f"✓ Cargados {len(self.tours)} tours desde {path}")
             return True
         except Exception as e:
-            logger.error(f"Error cargando caché: {str(e)}")
+            logger.error(f"Error cargando {path}: {str(e)}")
             return False
     
+    def is_stale(self, max_age_hours: float = DEFAULT_MAX_AGE_HOURS) -> bool:
+        """Indicar si el catálogo debería actualizarse (la foto incluida siempre lo está)"""
+        if not self.tours or self.source == "snapshot" or self.updated_at is None:
+            return True
+        return time.time() - self.updated_at > max_age_hours * 3600
+    
     def search_tours(self, query: str) -> List[TourInfo]:
         """Buscar tours por nombre o descripción"""
         query_lower = query.lower()
@@ -371,19 +593,97 @@ class HuarazPriceScraper:
         return summary
 
 
+def tour_type_for_url(url: str) -> Optional[str]:
+    """
+    Clasificar una URL del sitio según el tipo de tour.
+    
+    Returns:
+        "package", "trekking" o "tour"; None si la página no es de un tour
+    """
+    path = urlparse(url).path
+    if path in HuarazPriceScraper.PACKAGE_PAGES:
+        return "package"
+    if path in HuarazPriceScraper.TREKKING_PAGES:
+        return "trekking"
+    if path in HuarazPriceScraper.DAILY_TOUR_PAGES:
+        return "tour"
+    if not TOUR_PATH_PATTERN.search(path):
+        return None
+    if path.startswith(("/paquete", "/huaraz-")):
+        return "package"
+    if path.startswith("/trek"):
+        return "trekking"
+    return "tour"
+
+
 # Instancia global
 _scraper_instance: Optional[HuarazPriceScraper] = None
+_scraper_lock = threading.Lock()
+
+# Actualización del catálogo en segundo plano
+_warmup_thread: Optional[threading.Thread] = None
 
 
 def get_scraper() -> HuarazPriceScraper:
-    """Obtener instancia del scraper"""
+    """
+    Obtener instancia del scraper.
+    
+    Nunca hace scraping: se carga el caché o la foto incluida; la
+    actualización corre en segundo plano (ver warm_catalogue).
+    """
     global _scraper_instance
     
     if _scraper_instance is None:
-        _scraper_instance = HuarazPriceScraper()
-        
-        # Intentar cargar desde caché
-        if not _scraper_instance.load_from_cache():
-            logger.info("No hay caché, scraping necesario")
+        with _scraper_lock:
+            if _scraper_instance is None:
+                scraper = HuarazPriceScraper()
+                if not scraper.load_snapshot():
+                    logger.warning("No hay caché ni foto del catálogo de tours")
+                _scraper_instance = scraper
     
     return _scraper_instance
+
+
+def warm_catalogue(max_age_hours: Optional[float] = None) -> Optional[threading.Thread]:
+    """
+    Actualizar el catálogo en segundo plano si viene de la foto incluida o el
+    caché es más antiguo que max_age_hours. Mientras tanto las herramientas
+    responden con la foto vigente.
+    
+    Args:
+        max_age_hours: Antigüedad máxima (por defecto knowledge.catalogue.max_age_hours)
+    
+    Returns:
+        Hilo de la actualización, o None si el catálogo está al día
+    """
+    global _warmup_thread
+    
+    if max_age_hours is None:
+        settings = load_knowledge_config().get("catalogue") or {}
+        max_age_hours = float(settings.get("max_age_hours", DEFAULT_MAX_AGE_HOURS))
+    
+    scraper = get_scraper()
+    if not scraper.is_stale(max_age_hours):
+        logger.info(f"✓ Catálogo de tours al día ({scraper.source})")
+        return None
+    
+    with _scraper_lock:
+        if _warmup_thread is not None and _warmup_thread.is_alive():
+            return _warmup_thread
+        _warmup_thread = threading.Thread(target=scraper.refresh, name="tour-catalogue-warmup", daemon=True)
+        _warmup_thread.start()
+    
+    logger.info(f"Actualizando catálogo de tours en segundo plano (actual: {scraper.source})")
+    return _warmup_thread
+
+
+def catalogue_status() -> Dict[str, Any]:
+    """Disponibilidad del catálogo para /health y /ready"""
+    scraper = get_scraper()
+    return {
+        "ready": bool(scraper.tours),
+        "tours": len(scraper.tours),
+        "source": scraper.source,
+        "age_seconds": round(time.time() - scraper.updated_at) if scraper.updated_at else None,
+        "refreshing": _warmup_thread is not None and _warmup_thread.is_alive(),
+    }
@@ -0,0 +1,227 @@
+"""
+Re-ranking de resultados RAG
+
+Los candidatos de la búsqueda (vectorial, léxica o híbrida) se vuelven a
+puntuar comparando la consulta con el texto completo de cada chunk:
+
+- "lexical": cobertura de los términos de la consulta ponderada por IDF,
+  bigramas en orden y coincidencias aproximadas por trigramas (sin dependencias)
+- "cross-encoder": modelo cross-encoder pequeño en CPU (requiere sentence-transformers)
+
+El re-ranking tiene un presupuesto de latencia: los candidatos que no se
+alcanzan a puntuar conservan su orden original detrás de los puntuados.
+"""
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+import logging
+import os
+import threading
+import time
+
+from src.rag.lexical import fold_accents, tokenize
+
+logger = logging.getLogger(__name__)
+
+RERANK_SCORERS = ("lexical", "cross-encoder")
+
+
+def _trigrams(token: str) -> set:
+    padded = f"#{token}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LexicalOverlapScorer:
+    """Puntúa (consulta, chunk) por cobertura de términos ponderada por IDF"""
+
+    name = "lexical"
+
+    def __init__(self, idf: Optional[Callable[[str], float]] = None, fuzzy_threshold: float = 0.5):
+        """
+        Args:
+            idf: Función token -> IDF (por ejemplo BM25Index.idf); sin ella todos pesan 1
+            fuzzy_threshold: Similitud de trigramas mínima para una coincidencia aproximada
+        """
+        self.idf = idf
+        self.fuzzy_threshold = fuzzy_threshold
+
+    def _weight(self, token: str) -> float:
+        return (self.idf(token) if self.idf else 0.0) or 1.0
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        """
+        Args:
+            query: Consulta
+            texts: Textos de los chunks
+
+        Returns:
+            Score en [0, 1] por chunk
+        """
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return [0.0] * len(texts)
+
+        weights = {token: self._weight(token) for token in query_tokens}
+        total = sum(weights.values())
+        query_bigrams = set(zip(query_tokens, query_tokens[1:]))
+        query_trigrams = {token: _trigrams(token) for token in query_tokens}
+
+        scores = []
+        for text in texts:
+            tokens = tokenize(text)
+            vocabulary = set(tokens)
+
+            covered = 0.0
+            for token in query_tokens:
+                if token in vocabulary:
+                    covered += weights[token]
+                    continue
+                # Variantes de escritura ("Wilcahuain" / "Willcahuain")
+                grams = query_trigrams[token]
+                best = max((len(grams & _trigrams(word)) / len(grams | _trigrams(word))
+                            for word in vocabulary if abs(len(word) - len(token)) <= 3), default=0.0)
+                if best >= self.fuzzy_threshold:
+                    covered += weights[token] * best
+
+            bigram_score = 0.0
+            if query_bigrams:
+                bigram_score = len(query_bigrams & set(zip(tokens, tokens[1:]))) / len(query_bigrams)
+
+            scores.append(0.75 * covered / total + 0.25 * bigram_score)
+        return scores
+
+
+class CrossEncoderScorer:
+    """Puntúa (consulta, chunk) con un cross-encoder ejecutado en CPU"""
+
+    name = "cross-encoder"
+
+    DEFAULT_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+    def __init__(self, model_name: Optional[str] = None, max_length: int = 256):
+        """
+        Args:
+            model_name: Modelo de Hugging Face (multilingüe por defecto)
+            max_length: Tokens máximos por par consulta/chunk
+        """
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError(
+                "El re-ranking 'cross-encoder' requiere: pip install sentence-transformers"
+            ) from e
+
+        self.model = model_name or self.DEFAULT_MODEL
+        self.name = f"cross-encoder:{self.model}"
+        self._model = CrossEncoder(self.model, max_length=max_length, device="cpu")
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        return [float(score) for score in self._model.predict([(query, text) for text in texts])]
+
+
+class Reranker:
+    """Re-ranking con presupuesto de latencia y caché de scores (consulta, chunk)"""
+
+    def __init__(self, scorer, budget_ms: float = 150.0, batch_size: int = 8, cache_size: int = 10000):
+        """
+        Args:
+            scorer: Objeto con `name` y `score(query, texts) -> List[float]`
+            budget_ms: Tiempo máximo de puntuación por consulta
+            batch_size: Chunks por llamada al scorer (se revisa el presupuesto entre lotes)
+            cache_size: Pares (consulta, chunk) a recordar
+        """
+        self.scorer = scorer
+        self.budget = budget_ms / 1000
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.budget_exceeded = 0
+
+    def clear(self):
+        """Vaciar el caché (por ejemplo, tras reindexar)"""
+        with self._lock:
+            self._cache.clear()
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        return " ".join(fold_accents(query.lower()).split())
+
+    def score(self, query: str, candidates: Sequence[Tuple[str, str]]) -> List[Optional[float]]:
+        """
+        Puntuar candidatos en orden hasta agotar el presupuesto.
+
+        Args:
+            query: Consulta
+            candidates: Pares (hash del chunk, texto) en el orden original
+
+        Returns:
+            Score por candidato; None para los que no se alcanzaron a puntuar
+        """
+        normalized = self._normalize_query(query)
+        keys = [(self.scorer.name, normalized, chunk_hash) for chunk_hash, _ in candidates]
+
+        scores: List[Optional[float]] = [None] * len(candidates)
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+
+        pending = [i for i, score in enumerate(scores) if score is None]
+        deadline = time.monotonic() + self.budget
+        computed: Dict[Tuple[str, str, str], float] = {}
+        for start in range(0, len(pending), self.batch_size):
+            if time.monotonic() > deadline:
+                self.budget_exceeded += 1
+                logger.debug(f"Re-ranking: presupuesto agotado, {len(pending) - start} candidatos sin puntuar")
+                break
+            batch = pending[start:start + self.batch_size]
+            for i, score in zip(batch, self.scorer.score(query, [candidates[i][1] for i in batch])):
+                scores[i] = score
+                computed[keys[i]] = score
+
+        if computed:
+            with self._lock:
+                self._cache.update(computed)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, candidates: Sequence[Tuple[str, str]]) -> List[Tuple[int, Optional[float]]]:
+        """
+        Reordenar candidatos por score.
+
+        Returns:
+            Pares (índice original, score) de mejor a peor; los no puntuados al
+            final y en su orden original
+        """
+        scores = self.score(query, candidates)
+        order = sorted(range(len(candidates)),
+                       key=lambda i: (scores[i] is None, -(scores[i] or 0.0), i))
+        return [(i, scores[i]) for i in order]
+
+
+def create_reranker(
+    scorer: str = "lexical",
+    idf: Optional[Callable[[str], float]] = None,
+    budget_ms: float = 150.0,
+    model_name: Optional[str] = None
+) -> Reranker:
+    """
+    Crear el reranker configurado.
+
+    Args:
+        scorer: "lexical" o "cross-encoder"
+        idf: IDF para el scorer léxico
+        budget_ms: Presupuesto de latencia por consulta
+        model_name: Modelo del cross-encoder (por defecto RAG_RERANK_MODEL o el multilingüe)
+
+    Returns:
+        Reranker
+    """
+    if scorer == "lexical":
+        return Reranker(LexicalOverlapScorer(idf), budget_ms=budget_ms)
+    if scorer == "cross-encoder":
+        return Reranker(CrossEncoderScorer(model_name or os.getenv("RAG_RERANK_MODEL")), budget_ms=budget_ms)
+
+    raise ValueError(f"Scorer de re-ranking desconocido: {scorer}. Opciones: {', '.join(RERANK_SCORERS)}")
@@ -3,23 +3,58 @@ Sistema RAG con WebBaseLoader para búsqueda híbrida
 Carga contenido de páginas web y permite búsqueda semántica
 """
 from typing import List, Dict, Any, Optional
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from src.rag.ann import AnnConfig
+from src.rag.artifact import ARTIFACT_INDEX_DIR, ArtifactError, ArtifactManifest, find_artifact
+from src.rag.crawler import crawl_cycle
+from src.rag.chunking import StructuredSplitter, chunk_stats, extract_structured_content
+from src.rag.embedding_cache import CachedEmbeddings, EmbeddingCache
+from src.rag.embeddings import HashingEmbeddings, embed_queries, get_embedding_backend, resolve_backend_name
+from src.rag.fetcher import DEFAULT_CONTENT_SELECTORS, LoadReport, extract_main_content, fetch_many
+from src.rag.index_store import ChunkIndex, IndexFormatError, chunk_hash, normalize_rows
+from src.rag.lexical import BM25Index, reciprocal_rank_fusion
+from src.rag.price_scraper import tour_type_for_url
+from src.rag.rerank import Reranker, create_reranker
+from src.utils.atomic_io import FileLock, SingleFlight
+from src.utils.config import load_knowledge_config
+import numpy as np
 import os
 from pathlib import Path
-import pickle
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Modos de búsqueda soportados por HuarazWebRAG.search
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+# Candidatos por resultado final (fusión híbrida, MMR y deduplicación)
+CANDIDATE_FACTOR = 4
+
+# Peso de la relevancia frente a la diversidad en MMR (1.0 = sin diversificar)
+MMR_LAMBDA = 0.7
+
+# Candidatos por resultado final que se re-puntúan (ver src/rag/rerank.py)
+RERANK_CANDIDATE_FACTOR = 3
+
+# Peso del score de re-ranking frente al de la búsqueda (1.0 = solo re-ranking)
+RERANK_WEIGHT = 0.3
+
+# Chunks con similitud coseno mayor a este valor se consideran duplicados
+DUPLICATE_SIMILARITY = 0.95
+
+
+def _min_max(scores: np.ndarray) -> np.ndarray:
+    """Escalar scores a [0, 1] (todos iguales -> 0)"""
+    low = float(scores.min()) if scores.size else 0.0
+    return (scores - low) / ((float(scores.max()) - low) if scores.size and scores.max() > low else 1.0)
+
 
 class HuarazWebRAG:
     """Sistema RAG para contenido web de turismo en Huaraz"""
     
-    # URLs de referencia para turismo en Huaraz
+    # URLs de referencia si el crawl no trae páginas (ver _rebuild)
     TOURISM_URLS = [
         "https://www.huarazturismo.com/",
         "https://www.huarazturismo.com/tours",
@@ -27,36 +62,98 @@ class HuarazWebRAG:
         "https://www.huarazturismo.com/hoteles",
     ]
     
-    def __init__(self, openai_api_key: Optional[str] = None):
+    def __init__(
+        self,
+        openai_api_key: Optional[str] = None,
+        embedding_backend: Optional[str] = None,
+        content_selectors: Optional[List[str]] = None,
+        similarity_threshold: Optional[float] = None,
+        top_k: Optional[int] = None
+    ):
         """
         Inicializar el sistema RAG.
         
         Args:
             openai_api_key: API key de OpenAI para embeddings
+            embedding_backend: "openai", "local" o "sentence-transformers"
+                               (por defecto la variable RAG_EMBEDDING_BACKEND)
+            content_selectors: Selectores CSS del contenido principal de cada página
+            similarity_threshold: Similitud coseno mínima de un resultado
+                                  (por defecto la de config/agent_config.yaml)
+            top_k: Resultados por búsqueda (por defecto knowledge.top_k_results)
         """
         self.api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
-        self.embeddings = OpenAIEmbeddings(openai_api_key=self.api_key)
-        self.vector_store: Optional[FAISS] = None
+        self.vector_store: Optional[ChunkIndex] = None
+        self.lexical_index: Optional[BM25Index] = None
         self.documents: List[Document] = []
+        self.content_selectors = content_selectors or DEFAULT_CONTENT_SELECTORS
+        self.last_load_report: Optional[LoadReport] = None
+        # Versión del artefacto precompilado si el índice viene de data/artifact
+        self.artifact_version: Optional[str] = None
         self.cache_dir = Path("data/rag_cache")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        self.cache_file = self.cache_dir / "vector_store.pkl"
-        
-        # Configurar text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+        self.index_dir = self.cache_dir / "index"
+        # Entre procesos: un solo worker reconstruye el índice y los guardados no se intercalan
+        self.refresh_lock_file = self.cache_dir / "index.refresh.lock"
+        self.write_lock_file = self.cache_dir / "index.lock"
+        self._refresh_flight = SingleFlight(self.refresh_lock_file)
+        
+        # Embeddings con caché persistente: solo se calculan textos nuevos.
+        # El backend local por hashing es más rápido que el propio caché.
+        backend_name = resolve_backend_name(embedding_backend)
+        backend = get_embedding_backend(backend_name, openai_api_key=self.api_key)
+        if isinstance(backend, HashingEmbeddings):
+            self.embedding_cache = None
+            self.embeddings = backend
+        else:
+            self.embedding_cache = EmbeddingCache(self.cache_dir / "embeddings.sqlite")
+            self.embeddings = CachedEmbeddings(backend, self.embedding_cache)
+        
+        # Parámetros de recuperación
+        knowledge = load_knowledge_config()
+        thresholds = knowledge.get("similarity_thresholds") or {}
+        if similarity_threshold is None:
+            similarity_threshold = thresholds.get(backend_name, knowledge.get("similarity_threshold", 0.0))
+        self.similarity_threshold = float(similarity_threshold)
+        self.top_k = int(top_k or knowledge.get("top_k_results", 4))
+        self.ann_config = AnnConfig.from_dict(knowledge.get("index"))
+        self.rerank_config = knowledge.get("rerank") or {}
+        self._reranker: Optional[Reranker] = None
+        
+        # Configurar text splitter: por secciones (sin solapamiento) o genérico
+        chunking = knowledge.get("chunking") or {}
+        self.chunking_strategy = chunking.get("strategy", "structured")
+        if self.chunking_strategy == "structured":
+            self.text_splitter = StructuredSplitter(
+                max_chars=int(chunking.get("max_chars", 1000)),
+                min_chars=int(chunking.get("min_chars", 200))
+            )
+        else:
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,
+                chunk_overlap=200,
+                length_function=len,
+                separators=["\n\n", "\n", ". ", " ", ""]
+            )
     
-    def load_web_content(self, urls: Optional[List[str]] = None, force_reload: bool = False) -> List[Document]:
+    def load_web_content(
+        self,
+        urls: Optional[List[str]] = None,
+        force_reload: bool = False,
+        max_workers: int = 8,
+        timeout: float = 15.0
+    ) -> List[Document]:
         """
-        Cargar contenido de páginas web.
+        Cargar contenido de páginas web en paralelo.
+        
+        Solo se conserva el contenido principal de cada página (sin menú,
+        cabecera ni pie); los errores se agregan en self.last_load_report.
         
         Args:
             urls: Lista de URLs a cargar (por defecto usa TOURISM_URLS)
             force_reload: Forzar recarga ignorando caché
+            max_workers: Descargas simultáneas
+            timeout: Segundos máximos por URL
         
         Returns:
             Lista de documentos cargados
@@ -64,44 +161,113 @@ class HuarazWebRAG:
         urls = urls or self.TOURISM_URLS
         
         logger.info(f"Cargando contenido de {len(urls)} URLs...")
+        report = LoadReport()
+        started = time.monotonic()
         documents = []
         
-        for url in urls:
-            try:
-                logger.info(f"Procesando: {url}")
-                loader = WebBaseLoader(
-                    web_paths=[url],
-                    bs_kwargs={
-                        "parse_only": None,  # Parsear todo el contenido
-                    }
-                )
-                docs = loader.load()
-                
-                # Añadir metadata
-                for doc in docs:
-                    doc.metadata['source'] = url
-                    doc.metadata['type'] = 'web'
-                
-                documents.extend(docs)
-                logger.info(f"✓ Cargado: {url} ({len(docs)} documentos)")
-                
-            except Exception as e:
-                logger.error(f"✗ Error cargando {url}: {str(e)}")
+        for result in fetch_many(urls, max_workers=max_workers, timeout=timeout):
+            if not result.ok:
+                report.failed[result.url] = result.error
+                logger.error(f"✗ Error cargando {result.url}: {result.error}")
+                continue
+            
+            document = self.page_to_document(result.url, result.html)
+            if not document:
+                report.failed[result.url] = "sin contenido principal"
                 continue
+            
+            documents.append(document)
+            report.loaded.append(result.url)
+            logger.info(f"✓ Cargado: {result.url} ({len(document.page_content)} caracteres, {result.elapsed:.2f}s)")
         
+        report.elapsed = time.monotonic() - started
+        self.last_load_report = report
         self.documents = documents
-        logger.info(f"Total documentos cargados: {len(documents)}")
+        logger.info(f"Total documentos cargados: {len(documents)} ({report.summary()})")
         return documents
     
-    def create_vector_store(self, documents: Optional[List[Document]] = None) -> FAISS:
+    def page_to_document(self, url: str, html: str) -> Optional[Document]:
+        """Convertir el HTML de una página en un Document con su contenido principal"""
+        if self.chunking_strategy == "structured":
+            content = extract_structured_content(html, self.content_selectors)
+        else:
+            content = extract_main_content(html, self.content_selectors)
+        if not content["text"]:
+            return None
+        metadata = {'source': url, 'type': 'web', 'title': content["title"]}
+        tour_type = tour_type_for_url(url)
+        if tour_type:
+            metadata['tour_type'] = tour_type
+        return Document(page_content=content["text"], metadata=metadata)
+    
+    def index_pages(self, pages: List[Any]) -> bool:
+        """
+        Indexar páginas ya descargadas (por ejemplo, por SiteCrawler).
+        
+        Si existe un índice se actualiza de forma incremental: las páginas que
+        ya no aparecen en el crawl se eliminan del índice.
+        
+        Args:
+            pages: Páginas con atributos url y html
+        
+        Returns:
+            True si el índice quedó actualizado y guardado
+        """
+        documents = [doc for doc in (self.page_to_document(page.url, page.html) for page in pages) if doc]
+        if not documents:
+            logger.warning("No hay páginas con contenido para indexar")
+            return False
+        
+        self.documents = documents
+        with FileLock(self.refresh_lock_file):
+            # Partir del índice en disco: otro worker pudo actualizarlo
+            if self.load_vector_store() or self.vector_store:
+                self.update_vector_store(documents, urls=[page.url for page in pages])
+                if self.vector_store.needs_compaction():
+                    self.vector_store.compact()
+                    self.build_lexical_index()
+            else:
+                self.create_vector_store(documents)
+            
+            self.save_vector_store()
+        return True
+    
+    @property
+    def reranker(self) -> Reranker:
+        """Reranker configurado en knowledge.rerank (se crea al primer uso)"""
+        if self._reranker is None:
+            scorer = self.rerank_config.get("scorer", "lexical")
+            budget_ms = float(self.rerank_config.get("budget_ms", 150))
+            idf = lambda token: self.lexical_index.idf(token) if self.lexical_index else 0.0
+            try:
+                self._reranker = create_reranker(scorer, idf=idf, budget_ms=budget_ms,
+                                                 model_name=self.rerank_config.get("model"))
+            except ImportError as e:
+                logger.warning(f"{e}. Se usará el re-ranking léxico")
+                self._reranker = create_reranker("lexical", idf=idf, budget_ms=budget_ms)
+        return self._reranker
+    
+    @property
+    def embedding_model(self) -> str:
+        """Identificador del modelo de embeddings (se registra en el manifest)"""
+        return getattr(self.embeddings, "model", None) or type(self.embeddings).__name__
+    
+    def create_vector_store(
+        self,
+        documents: Optional[List[Document]] = None,
+        index_type: Optional[str] = None,
+        **index_params
+    ) -> ChunkIndex:
         """
         Crear vector store con embeddings.
         
         Args:
             documents: Documentos a procesar (usa self.documents si no se provee)
+            index_type: "flat", "ivf-flat", "ivf-pq" o "hnsw" (por defecto knowledge.index.type)
+            **index_params: Otros parámetros de AnnConfig (nlist, nprobe, ef_search, ...)
         
         Returns:
-            Vector store FAISS
+            Índice de chunks (ChunkIndex)
         """
         documents = documents or self.documents
         
@@ -109,79 +275,214 @@ class HuarazWebRAG:
             raise ValueError("No hay documentos para crear el vector store")
         
         logger.info("Dividiendo documentos en chunks...")
-        splits = self.text_splitter.split_documents(documents)
-        logger.info(f"Total chunks creados: {len(splits)}")
+        splits = self.split_documents(documents)
         
         logger.info("Creando embeddings y vector store...")
-        self.vector_store = FAISS.from_documents(
-            documents=splits,
-            embedding=self.embeddings
+        vectors = self.embeddings.embed_documents([doc.page_content for doc in splits])
+        ann_config = self.ann_config.with_overrides(type=index_type, **index_params)
+        self.vector_store = ChunkIndex.from_documents(
+            splits, vectors, self.embedding_model, pages=self.page_hashes(documents), ann_config=ann_config
         )
+        self.build_lexical_index()
         logger.info("✓ Vector store creado exitosamente")
         
         return self.vector_store
     
+    def split_documents(self, documents: List[Document], corpus: Optional[List[Document]] = None) -> List[Document]:
+        """
+        Dividir páginas en chunks con el splitter configurado.
+        
+        Args:
+            documents: Páginas a dividir
+            corpus: Todas las páginas cargadas (para detectar texto repetido entre páginas)
+        
+        Returns:
+            Chunks
+        """
+        if isinstance(self.text_splitter, StructuredSplitter):
+            splits = self.text_splitter.split_documents(documents, corpus=corpus)
+        else:
+            splits = self.text_splitter.split_documents(documents)
+        logger.info(f"Chunks creados ({self.chunking_strategy}): {chunk_stats(splits)}")
+        return splits
+    
+    @staticmethod
+    def page_hashes(documents: List[Document]) -> Dict[str, str]:
+        """Calcular el hash de contenido de cada página (url -> hash)"""
+        contents: Dict[str, List[str]] = {}
+        for doc in documents:
+            contents.setdefault(doc.metadata.get('source', ''), []).append(doc.page_content)
+        return {url: chunk_hash("\n".join(parts)) for url, parts in contents.items()}
+    
+    def update_vector_store(self, documents: List[Document], urls: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Actualizar el vector store de forma incremental.
+        
+        Compara cada página con el hash guardado en el manifest: elimina los
+        chunks de páginas cambiadas o retiradas de la lista de URLs y agrega
+        solo los chunks de páginas nuevas o cambiadas. Las páginas que no se
+        pudieron descargar conservan su contenido anterior.
+        
+        Args:
+            documents: Páginas recién cargadas
+            urls: URLs que forman parte del índice (por defecto TOURISM_URLS)
+        
+        Returns:
+            Estadísticas: páginas cambiadas/eliminadas/sin cambios y chunks agregados/eliminados
+        """
+        if not self.vector_store:
+            raise ValueError("Vector store no inicializado. Ejecuta create_vector_store() primero.")
+        
+        urls = urls or self.TOURISM_URLS
+        stored = self.vector_store.manifest.pages
+        fetched = self.page_hashes(documents)
+        
+        changed = {url for url, page_hash in fetched.items() if stored.get(url) != page_hash}
+        removed = {url for url in stored if url not in urls and url not in fetched}
+        
+        chunks_removed = self.vector_store.delete_where(
+            lambda metadata: metadata.get('source') in changed | removed
+        )
+        
+        splits = self.split_documents(
+            [doc for doc in documents if doc.metadata.get('source') in changed],
+            corpus=documents
+        )
+        vectors = self.embeddings.embed_documents([doc.page_content for doc in splits])
+        chunks_added = self.vector_store.add_documents(splits, vectors)
+        self.build_lexical_index()
+        
+        for url in removed:
+            stored.pop(url, None)
+        for url in changed:
+            stored[url] = fetched[url]
+        
+        stats = {
+            "pages_changed": len(changed),
+            "pages_removed": len(removed),
+            "pages_unchanged": len(fetched) - len(changed),
+            "chunks_added": chunks_added,
+            "chunks_removed": chunks_removed,
+        }
+        logger.info(f"✓ Actualización incremental: {stats}")
+        return stats
+    
     def save_vector_store(self, path: Optional[Path] = None):
-        """Guardar vector store en disco"""
+        """Guardar vector store en disco (manifest + vectores + texto de chunks)"""
         if not self.vector_store:
             raise ValueError("No hay vector store para guardar")
         
-        path = path or self.cache_file
+        path = path or self.index_dir
         logger.info(f"Guardando vector store en: {path}")
         
-        self.vector_store.save_local(str(path.parent / "faiss_index"))
-        
-        # Guardar metadata de documentos
-        with open(path, 'wb') as f:
-            pickle.dump({
-                'documents': self.documents,
-                'timestamp': pd.Timestamp.now() if 'pd' in dir() else None
-            }, f)
+        with FileLock(self.write_lock_file):
+            self.vector_store.save(path)
         
         logger.info("✓ Vector store guardado")
     
-    def load_vector_store(self, path: Optional[Path] = None) -> bool:
+    def load_vector_store(self, path: Optional[Path] = None, read_only: bool = False) -> bool:
         """
-        Cargar vector store desde disco.
+        Cargar vector store desde disco (mapeado en memoria).
+        
+        Args:
+            path: Directorio del índice (por defecto data/rag_cache/index)
+            read_only: No reescribir el índice en disco (artefacto precompilado)
         
         Returns:
             True si se cargó exitosamente, False en caso contrario
         """
-        path = path or self.cache_file
-        index_path = path.parent / "faiss_index"
+        path = path or self.index_dir
         
-        if not index_path.exists():
-            logger.warning(f"No se encontró vector store en: {index_path}")
+        if not path.exists():
+            logger.warning(f"No se encontró vector store en: {path}")
             return False
         
         try:
-            logger.info(f"Cargando vector store desde: {index_path}")
-            self.vector_store = FAISS.load_local(
-                str(index_path),
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
+            logger.info(f"Cargando vector store desde: {path}")
+            self.vector_store = ChunkIndex.load(path, embedding_model=self.embedding_model)
             
-            # Cargar metadata
-            if path.exists():
-                with open(path, 'rb') as f:
-                    data = pickle.load(f)
-                    self.documents = data.get('documents', [])
+            # Cambió el tipo de índice en la configuración: se reconstruye sin re-embeber
+            if self.vector_store.ann_config.type != self.ann_config.type:
+                self.vector_store.set_ann_config(self.ann_config)
+                if not read_only:
+                    self.save_vector_store(path)
             
-            logger.info("✓ Vector store cargado exitosamente")
+            self.build_lexical_index()
+            logger.info(f"✓ Vector store cargado exitosamente ({len(self.vector_store)} chunks)")
             return True
             
+        except IndexFormatError as e:
+            logger.warning(f"Vector store incompatible, se reconstruirá: {str(e)}")
+            return False
         except Exception as e:
             logger.error(f"Error cargando vector store: {str(e)}")
             return False
     
-    def search(self, query: str, k: int = 4) -> List[Document]:
+    def load_artifact(self) -> bool:
+        """
+        Cargar el índice del artefacto precompilado (ver src/rag/artifact.py).
+        
+        Se mapea en memoria sin copiarlo ni modificarlo: no hay descargas ni
+        llamadas de embeddings al arrancar.
+        
+        Returns:
+            True si se cargó el índice del artefacto
+        """
+        path = find_artifact()
+        if path is None:
+            return False
+        
+        try:
+            manifest = ArtifactManifest.read(path)
+        except ArtifactError as e:
+            logger.warning(f"Artefacto ignorado: {str(e)}")
+            return False
+        
+        if not self.load_vector_store(path / ARTIFACT_INDEX_DIR, read_only=True):
+            return False
+        self.artifact_version = manifest.version
+        logger.info(f"✓ Índice RAG desde artefacto {manifest.version} ({manifest.source})")
+        return True
+    
+    def build_lexical_index(self) -> BM25Index:
+        """Construir el índice BM25 sobre los chunks vigentes del vector store"""
+        if not self.vector_store:
+            raise ValueError("Vector store no inicializado")
+        
+        self.lexical_index = BM25Index.build(
+            (position, self.vector_store.get_text(position))
+            for position in self.vector_store.live_positions()
+        )
+        if self._reranker:
+            self._reranker.clear()
+        logger.info(f"✓ Índice léxico construido ({len(self.lexical_index)} chunks)")
+        return self.lexical_index
+    
+    def search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        mode: str = "vector",
+        score_threshold: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        mmr: bool = False,
+        dedupe: bool = True,
+        rerank: Optional[bool] = None
+    ) -> List[Document]:
         """
         Buscar documentos relevantes.
         
         Args:
             query: Consulta de búsqueda
-            k: Número de resultados a retornar
+            k: Número máximo de resultados (por defecto self.top_k)
+            mode: "vector" (embeddings), "lexical" (BM25, sin llamar a la API
+                  de embeddings) o "hybrid" (fusión RRF de ambos)
+            score_threshold: Similitud coseno mínima (por defecto self.similarity_threshold)
+            filters: Metadata requerida, ej. {"tour_type": "trekking"} o
+                     {"source": [url1, url2]}
+            mmr: Diversificar resultados con Maximal Marginal Relevance
+            dedupe: Descartar chunks repetidos o casi idénticos
+            rerank: Re-puntuar los candidatos (por defecto knowledge.rerank.enabled)
         
         Returns:
             Lista de documentos relevantes
@@ -189,65 +490,341 @@ class HuarazWebRAG:
         if not self.vector_store:
             raise ValueError("Vector store no inicializado. Ejecuta create_vector_store() primero.")
         
-        logger.info(f"Buscando: '{query}'")
-        results = self.vector_store.similarity_search(query, k=k)
+        logger.info(f"Buscando ({mode}): '{query}'")
+        results = [doc for doc, _ in self.search_with_score(
+            query, k=k, mode=mode, score_threshold=score_threshold,
+            filters=filters, mmr=mmr, dedupe=dedupe, rerank=rerank
+        )]
         logger.info(f"✓ Encontrados {len(results)} resultados")
         
         return results
     
-    def search_with_score(self, query: str, k: int = 4) -> List[tuple]:
+    def search_with_score(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        mode: str = "vector",
+        score_threshold: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        mmr: bool = False,
+        dedupe: bool = True,
+        rerank: Optional[bool] = None
+    ) -> List[tuple]:
         """
-        Buscar con scores de similitud.
+        Buscar con scores.
+        
+        El umbral de similitud se aplica a la similitud coseno con la consulta;
+        en modo "hybrid" los chunks con coincidencia léxica lo superan siempre y
+        en modo "lexical" no se aplica.
         
         Args:
             query: Consulta de búsqueda
-            k: Número de resultados
+            k: Número máximo de resultados (por defecto self.top_k)
+            mode: "vector", "lexical" o "hybrid"
+            score_threshold: Similitud coseno mínima (por defecto self.similarity_threshold)
+            filters: Metadata requerida (valor único o lista de valores aceptados)
+            mmr: Diversificar resultados con Maximal Marginal Relevance
+            dedupe: Descartar chunks repetidos o casi idénticos
+            rerank: Re-puntuar los candidatos (por defecto knowledge.rerank.enabled)
+        
+        Returns:
+            Lista de tuplas (Document, score). El score es similitud coseno en
+            modo "vector", BM25 en "lexical" y RRF en "hybrid" (mayor es mejor);
+            el re-ranking cambia el orden pero no el score
+        """
+        return self.search_batch_with_score(
+            [query], k=k, mode=mode, score_threshold=score_threshold,
+            filters=filters, mmr=mmr, dedupe=dedupe, rerank=rerank
+        )[0]
+    
+    def search_batch(self, queries: List[str], k: Optional[int] = None, **options) -> List[List[Document]]:
+        """
+        Buscar varias consultas a la vez (ver search_batch_with_score).
         
         Returns:
-            Lista de tuplas (Document, score)
+            Por consulta, lista de documentos relevantes
+        """
+        return [
+            [doc for doc, _ in results]
+            for results in self.search_batch_with_score(queries, k=k, **options)
+        ]
+    
+    def search_batch_with_score(
+        self,
+        queries: List[str],
+        k: Optional[int] = None,
+        mode: str = "vector",
+        score_threshold: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        mmr: bool = False,
+        dedupe: bool = True,
+        rerank: Optional[bool] = None
+    ) -> List[List[tuple]]:
+        """
+        Buscar varias consultas con un solo lote de embeddings y una búsqueda
+        vectorial sobre la matriz de consultas.
+        
+        Args:
+            queries: Consultas de búsqueda
+            k, mode, score_threshold, filters, mmr, dedupe, rerank: Igual que search_with_score
+        
+        Returns:
+            Por consulta (en el mismo orden), lista de tuplas (Document, score)
         """
         if not self.vector_store:
             raise ValueError("Vector store no inicializado")
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Modo de búsqueda no soportado: {mode}")
+        if not queries:
+            return []
         
-        results = self.vector_store.similarity_search_with_score(query, k=k)
-        return results
+        if mode != "vector" and self.lexical_index is None:
+            self.build_lexical_index()
+        
+        k = k or self.top_k
+        threshold = self.similarity_threshold if score_threshold is None else score_threshold
+        reranker = self.reranker if (self.rerank_config.get("enabled", False) if rerank is None else rerank) else None
+        
+        # Con filtros se ordena todo el índice para no quedarse sin candidatos
+        if filters:
+            depth = self.vector_store.size
+        elif mode == "hybrid" or mmr or dedupe or reranker:
+            depth = k * CANDIDATE_FACTOR
+        else:
+            depth = k
+        
+        query_vectors = [None] * len(queries)
+        vector_rankings = [None] * len(queries)
+        if mode != "lexical":
+            query_vectors = normalize_rows(np.asarray(embed_queries(self.embeddings, list(queries)), dtype=np.float32))
+            vector_rankings = self.vector_store.search_batch(query_vectors, k=depth)
+        
+        return [
+            self._rank_results(query, query_vector, vector_ranked, mode, k, depth,
+                               threshold, filters, mmr, dedupe, reranker)
+            for query, query_vector, vector_ranked in zip(queries, query_vectors, vector_rankings)
+        ]
     
-    def initialize(self, force_reload: bool = False) -> bool:
+    def _rank_results(
+        self,
+        query: str,
+        query_vector: Optional[np.ndarray],
+        vector_ranked: Optional[List[tuple]],
+        mode: str,
+        k: int,
+        depth: int,
+        threshold: float,
+        filters: Optional[Dict[str, Any]],
+        mmr: bool,
+        dedupe: bool,
+        reranker: Optional[Reranker] = None
+    ) -> List[tuple]:
+        """Fusionar, filtrar, re-puntuar y seleccionar los resultados de una consulta"""
+        lexical_matches = set()
+        if mode == "lexical":
+            ranked = self.lexical_index.search(query, k=depth)
+        elif mode == "vector":
+            ranked = vector_ranked
+        else:
+            lexical_ranked = self.lexical_index.search(query, k=depth)
+            lexical_matches = {position for position, _ in lexical_ranked}
+            ranked = reciprocal_rank_fusion([
+                [position for position, _ in vector_ranked],
+                [position for position, _ in lexical_ranked],
+            ])
+        
+        if filters:
+            ranked = [(position, score) for position, score in ranked
+                      if self._matches_filters(self.vector_store.get_metadata(position), filters)]
+        if not ranked:
+            return []
+        
+        vectors = np.stack([self.vector_store.get_vector(position) for position, _ in ranked])
+        if query_vector is not None:
+            relevance = vectors @ query_vector
+            keep = [i for i, (position, _) in enumerate(ranked)
+                    if relevance[i] >= threshold or position in lexical_matches]
+            ranked = [ranked[i] for i in keep]
+            vectors, relevance = vectors[keep], relevance[keep]
+        else:
+            scores = np.array([score for _, score in ranked], dtype=np.float32)
+            relevance = scores / (scores.max() or 1.0)
+        
+        if reranker and ranked:
+            pool = min(len(ranked), k * int(self.rerank_config.get("candidates", RERANK_CANDIDATE_FACTOR)))
+            order = reranker.rerank(query, [
+                (self.vector_store.get_hash(position), self.vector_store.get_text(position))
+                for position, _ in ranked[:pool]
+            ])
+            # Mezclar con el score de la búsqueda (fusión o similitud), ambos
+            # normalizados a [0, 1]: el re-ranking ajusta el orden sin descartarlo
+            base = _min_max(np.array([score for _, score in ranked[:pool]], dtype=np.float32))
+            rerank_scores = np.full(pool, np.nan, dtype=np.float32)
+            for i, score in order:
+                if score is not None:
+                    rerank_scores[i] = score
+            scored = ~np.isnan(rerank_scores)
+            if scored.any():
+                rerank_scores[scored] = _min_max(rerank_scores[scored])
+            weight = float(self.rerank_config.get("weight", RERANK_WEIGHT))
+            # Los no puntuados (presupuesto agotado) conservan su score original
+            combined = np.where(scored, (1 - weight) * base + weight * rerank_scores, base)
+            indices = np.argsort(-combined, kind="stable")
+            ranked = [ranked[i] for i in indices]
+            vectors = vectors[indices]
+            relevance = combined[indices]
+        
+        selected = self._select_results(ranked, vectors, relevance, k, mmr=mmr, dedupe=dedupe)
+        return [(self.vector_store.get_document(ranked[i][0]), ranked[i][1]) for i in selected]
+    
+    @staticmethod
+    def _matches_filters(metadata: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+        """Verificar que la metadata de un chunk cumpla todos los filtros"""
+        for key, expected in filters.items():
+            value = metadata.get(key)
+            if key == "tour_type" and value is None:
+                value = tour_type_for_url(metadata.get("source", ""))
+            accepted = expected if isinstance(expected, (list, tuple, set)) else (expected,)
+            if value not in accepted:
+                return False
+        return True
+    
+    def _select_results(
+        self,
+        ranked: List[tuple],
+        vectors: np.ndarray,
+        relevance: np.ndarray,
+        k: int,
+        mmr: bool = False,
+        dedupe: bool = True
+    ) -> List[int]:
+        """
+        Elegir hasta k candidatos en orden (MMR opcional) descartando duplicados.
+        
+        Args:
+            ranked: Candidatos (posición, score) ordenados por el modo de búsqueda
+            vectors: Embeddings normalizados de los candidatos
+            relevance: Relevancia de cada candidato para MMR
+            k: Número máximo de resultados
+        
+        Returns:
+            Índices en ranked de los candidatos elegidos
+        """
+        similarity = vectors @ vectors.T
+        remaining = list(range(len(ranked)))
+        selected: List[int] = []
+        hashes = set()
+        
+        while remaining and len(selected) < k:
+            if mmr and selected:
+                redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+                scores = MMR_LAMBDA * relevance[remaining] - (1 - MMR_LAMBDA) * redundancy
+                best = remaining.pop(int(np.argmax(scores)))
+            else:
+                best = remaining.pop(0)
+            
+            if dedupe:
+                content_hash = self.vector_store.get_hash(ranked[best][0])
+                if content_hash in hashes or (selected and similarity[best, selected].max() >= DUPLICATE_SIMILARITY):
+                    continue
+                hashes.add(content_hash)
+            selected.append(best)
+        
+        return selected
+    
+    def initialize(self, force_reload: bool = False, incremental: bool = True) -> bool:
         """
         Inicializar el sistema RAG completo.
         
         Args:
             force_reload: Forzar recarga de contenido web
+            incremental: Si existe un índice, actualizar solo las páginas cambiadas
         
         Returns:
             True si se inicializó correctamente
         """
         try:
-            # Intentar cargar desde caché
+            # Intentar cargar desde caché y, si no hay, desde el artefacto precompilado
             if not force_reload and self.load_vector_store():
                 logger.info("✓ Sistema RAG cargado desde caché")
                 return True
+            if not force_reload and self.load_artifact():
+                return True
             
-            # Cargar contenido web
-            logger.info("Cargando contenido web...")
-            documents = self.load_web_content(force_reload=force_reload)
-            
-            if not documents:
-                logger.warning("No se pudo cargar contenido web")
-                return False
-            
-            # Crear vector store
-            self.create_vector_store(documents)
-            
-            # Guardar en caché
-            self.save_vector_store()
-            
-            logger.info("✓ Sistema RAG inicializado exitosamente")
+            # Un solo worker descarga y reindexa; los demás siguen con el índice
+            # vigente o, si aún no tienen uno, esperan y cargan el resultado
+            outcome: Dict[str, bool] = {}
+            ran = self._refresh_flight.run(
+                lambda: outcome.update(ok=self._rebuild(force_reload, incremental)),
+                wait=self.vector_store is None
+            )
+            if ran:
+                return outcome.get("ok", False)
+            if self.vector_store is None:
+                return self.load_vector_store()
+            logger.info("Reindexado en curso en otro worker, se mantiene el índice vigente")
             return True
             
         except Exception as e:
             logger.error(f"Error inicializando sistema RAG: {str(e)}")
             return False
+    
+    def load_crawled_content(self, force_reload: bool = False) -> List[Document]:
+        """
+        Documentos del ciclo de crawl compartido con el catálogo de precios
+        (ver crawl_cycle): el sitio se descarga una sola vez para ambos.
+        
+        Args:
+            force_reload: Descargar un ciclo nuevo aunque el vigente sea reciente
+        
+        Returns:
+            Lista de documentos (vacía si el crawl no trajo páginas)
+        """
+        try:
+            pages = crawl_cycle(force=force_reload)
+        except Exception as e:
+            logger.error(f"Error en el ciclo de crawl: {str(e)}")
+            return []
+        documents = [doc for doc in (self.page_to_document(page.url, page.html) for page in pages) if doc]
+        self.documents = documents
+        logger.info(f"Total documentos del crawl: {len(documents)} de {len(pages)} páginas")
+        return documents
+    
+    def _rebuild(self, force_reload: bool, incremental: bool) -> bool:
+        """
+        Descargar el contenido web y actualizar (o crear) el índice guardado.
+        
+        Las páginas vienen del ciclo de crawl; si no trae ninguna se cargan
+        las TOURISM_URLS fijas.
+        """
+        logger.info("Cargando contenido web...")
+        documents = self.load_crawled_content(force_reload=force_reload)
+        # Con el crawl, las páginas que ya no aparecen se eliminan del índice
+        urls = [doc.metadata['source'] for doc in documents]
+        if not documents:
+            logger.warning("El crawl no trajo páginas, se usan las URLs fijas")
+            documents = self.load_web_content(force_reload=force_reload)
+            urls = None
+        
+        if not documents:
+            logger.warning("No se pudo cargar contenido web")
+            return False
+        
+        # Actualizar el índice existente (el de disco, por si otro worker lo
+        # actualizó) o crearlo desde cero
+        if incremental and (self.load_vector_store() or self.vector_store):
+            self.update_vector_store(documents, urls=urls)
+            if self.vector_store.needs_compaction():
+                self.vector_store.compact()
+                self.build_lexical_index()
+        else:
+            self.create_vector_store(documents)
+        
+        # Guardar en caché (solo se escriben los segmentos nuevos)
+        self.save_vector_store()
+        
+        logger.info("✓ Sistema RAG inicializado exitosamente")
+        return True
 
 
 def format_search_results(results: List[Document]) -> str:
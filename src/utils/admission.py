@@ -0,0 +1,213 @@
+"""
+Control de admisión para las llamadas al agente (LLM)
+
+Antes de invocar al agente se verifican, en O(1), cubetas de tokens por
+sesión, por IP y globales, tanto de llamadas como de tokens del LLM. Así un
+cliente abusivo agota solo su propia cuota y no la cuota de OpenAI de todos.
+
+El agente corre en un pool de hilos acotado (fuera del event loop); si la
+cola de ese pool ya es profunda, las consultas se rechazan de inmediato en
+lugar de esperar minutos y vencer en el cliente.
+
+Los tokens se estiman por longitud de texto (~4 caracteres por token): la
+entrada se cobra al admitir y la respuesta al terminar, con saldo negativo si
+hace falta, de modo que las respuestas largas frenan las consultas siguientes.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import math
+import threading
+import time
+
+from src.utils.config import load_server_config
+from src.utils.helpers import TokenBucket
+
+SCOPES = ("session", "ip", "global")
+SCOPE_LABELS = {"session": "por sesión", "ip": "por IP", "global": "global"}
+
+DEFAULT_LIMITS = {
+    "session": {"calls_per_minute": 10, "burst": 5, "tokens_per_minute": 20000},
+    "ip": {"calls_per_minute": 30, "burst": 10, "tokens_per_minute": 60000},
+    "global": {"calls_per_minute": 300, "burst": 50, "tokens_per_minute": 400000},
+}
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_MAX_KEYS = 10000
+
+# Latencia inicial supuesta del agente para estimar Retry-After al descartar carga
+INITIAL_LATENCY_SECONDS = 5.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens aproximados de un texto (~4 caracteres por token)"""
+    return max(1, len(text or "") // 4)
+
+
+class AdmissionRejected(Exception):
+    """Consulta rechazada por límite de tasa (429) o por sobrecarga (503)"""
+
+    def __init__(self, reason: str, retry_after: float, status_code: int = 429):
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.status_code = status_code
+        super().__init__(f"{reason} (reintentar en {self.retry_after}s)")
+
+
+class _Limits:
+    """Cubetas de llamadas y tokens de un ámbito, una por clave (LRU acotado)"""
+
+    def __init__(self, scope: str, settings: Dict[str, Any], max_keys: int):
+        self.scope = scope
+        calls = float(settings.get("calls_per_minute", 0))
+        tokens = float(settings.get("tokens_per_minute", 0))
+        self.calls = (float(settings.get("burst", calls)), calls / 60) if calls else None
+        self.tokens = (tokens, tokens / 60) if tokens else None
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[Optional[TokenBucket], Optional[TokenBucket]]]" = OrderedDict()
+
+    def buckets(self, key: str) -> Tuple[Optional[TokenBucket], Optional[TokenBucket]]:
+        """(llamadas, tokens) de una clave; requiere el lock del controlador"""
+        pair = self._buckets.get(key)
+        if pair is None:
+            pair = self._buckets[key] = (
+                TokenBucket(*self.calls) if self.calls else None,
+                TokenBucket(*self.tokens) if self.tokens else None,
+            )
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return pair
+
+
+class AdmissionController:
+    """Límites por sesión, IP y globales, y pool acotado de hilos para el agente"""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, Any]]] = None,
+        workers: int = DEFAULT_WORKERS,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        max_keys: int = DEFAULT_MAX_KEYS
+    ):
+        """
+        Args:
+            limits: Por ámbito ("session", "ip", "global"): calls_per_minute,
+                    burst y tokens_per_minute (0 o ausente = sin límite)
+            workers: Consultas al agente en paralelo
+            max_queue: Consultas en espera de un hilo antes de descartar carga
+            max_keys: Sesiones / IPs con cubetas en memoria
+        """
+        limits = limits or DEFAULT_LIMITS
+        self.workers = workers
+        self.max_queue = max_queue
+        self._limits = {scope: _Limits(scope, limits.get(scope) or {}, max_keys) for scope in SCOPES}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent")
+        self._in_flight = 0
+        self._latency = INITIAL_LATENCY_SECONDS
+        self.rejected = {"rate_limited": 0, "shed": 0}
+
+    def _keys(self, session_id: str, client_ip: Optional[str]) -> List[Tuple[_Limits, str]]:
+        return [
+            (self._limits["session"], session_id),
+            (self._limits["ip"], client_ip or "unknown"),
+            (self._limits["global"], "*"),
+        ]
+
+    def admit(self, session_id: str, client_ip: Optional[str], text: str):
+        """
+        Reservar una llamada al agente o rechazarla.
+
+        Las cubetas solo se descuentan si todas tienen saldo: un rechazo por
+        IP no consume la cuota de la sesión.
+
+        Raises:
+            AdmissionRejected: Con el motivo y los segundos a esperar
+        """
+        tokens = estimate_tokens(text)
+        with self._lock:
+            queued = self._in_flight - self.workers
+            if queued >= self.max_queue:
+                self.rejected["shed"] += 1
+                # Tiempo aproximado hasta que se libere un lugar en la cola
+                retry_after = self._latency * (queued - self.max_queue + 1) / self.workers
+                raise AdmissionRejected("Servidor ocupado", retry_after, status_code=503)
+
+            buckets = []
+            for limits, key in self._keys(session_id, client_ip):
+                calls, token_bucket = limits.buckets(key)
+                for bucket, amount, unit in ((calls, 1, "consultas"), (token_bucket, tokens, "tokens")):
+                    if bucket is None:
+                        continue
+                    wait = bucket.retry_after(amount)
+                    if wait > 0:
+                        self.rejected["rate_limited"] += 1
+                        raise AdmissionRejected(f"Límite de {unit} {SCOPE_LABELS[limits.scope]}", wait)
+                    buckets.append((bucket, amount))
+            for bucket, amount in buckets:
+                bucket.consume(amount)
+            self._in_flight += 1
+
+    def charge(self, session_id: str, client_ip: Optional[str], tokens: int):
+        """Cobrar tokens tras la llamada (respuesta del LLM); el saldo puede quedar negativo"""
+        with self._lock:
+            for limits, key in self._keys(session_id, client_ip):
+                token_bucket = limits.buckets(key)[1]
+                if token_bucket is not None:
+                    token_bucket.consume(tokens)
+
+    def _finish(self, seconds: Optional[float]):
+        with self._lock:
+            self._in_flight -= 1
+            if seconds is not None:
+                self._latency = 0.8 * self._latency + 0.2 * seconds
+
+    async def run(self, session_id: str, client_ip: Optional[str], text: str, fn: Callable[..., Any], *args) -> Any:
+        """
+        Admitir la consulta y ejecutar fn(*args) en el pool del agente.
+
+        La respuesta (texto, o dict con "response") se cobra como tokens de salida.
+
+        Raises:
+            AdmissionRejected: Si se supera un límite o la cola está llena
+        """
+        self.admit(session_id, client_ip, text)
+        start = time.perf_counter()
+        seconds = None
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+            seconds = time.perf_counter() - start
+        finally:
+            self._finish(seconds)
+        output = response.get("response", "") if isinstance(response, dict) else response
+        self.charge(session_id, client_ip, estimate_tokens(output if isinstance(output, str) else ""))
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Consultas en curso, en espera y rechazadas"""
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.workers),
+                "rate_limited": self.rejected["rate_limited"],
+                "shed": self.rejected["shed"],
+            }
+
+    def close(self):
+        """Liberar el pool (las consultas en curso terminan)"""
+        self._executor.shutdown(wait=False)
+
+
+def create_admission_controller() -> AdmissionController:
+    """Crear el controlador con server.admission de config/agent_config.yaml"""
+    settings = load_server_config().get("admission") or {}
+    limits = {scope: {**DEFAULT_LIMITS[scope], **(settings.get(scope) or {})} for scope in SCOPES}
+    return AdmissionController(
+        limits,
+        workers=int(settings.get("workers", DEFAULT_WORKERS)),
+        max_queue=int(settings.get("max_queue", DEFAULT_MAX_QUEUE)),
+        max_keys=int(settings.get("max_keys", DEFAULT_MAX_KEYS))
+    )
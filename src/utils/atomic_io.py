@@ -0,0 +1,208 @@
+"""
+Escritura atómica de archivos y coordinación entre procesos
+
+- atomic_write / atomic_writer: escriben en un temporal del mismo directorio,
+  hacen fsync y lo renombran sobre el destino; un lector ve el archivo
+  anterior o el nuevo completo, nunca uno truncado
+- FileLock: lock exclusivo entre procesos (flock) sobre un archivo .lock
+- SingleFlight: solo un worker ejecuta una recarga a la vez; los demás siguen
+  usando los datos vigentes o esperan a que termine
+"""
+from typing import Any, Callable, Iterator, Optional, Union
+from contextlib import contextmanager
+from pathlib import Path
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+def fsync_directory(path: Path):
+    """Persistir la entrada de directorio tras un rename (no disponible en Windows)"""
+    if os.name == "nt":
+        return
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_writer(path: Union[str, Path], mode: str = "w", encoding: Optional[str] = "utf-8") -> Iterator[Any]:
+    """
+    Abrir un archivo temporal que reemplaza a `path` al cerrarse sin errores.
+
+    Args:
+        path: Archivo destino
+        mode: "w" (texto) o "wb" (binario)
+        encoding: Codificación en modo texto
+
+    Yields:
+        Archivo abierto para escritura; si el bloque falla, el destino no cambia
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    fsync_directory(path.parent)
+
+
+def atomic_write(path: Union[str, Path], data: Union[str, bytes], encoding: str = "utf-8"):
+    """
+    Reemplazar el contenido de un archivo de forma atómica.
+
+    Args:
+        path: Archivo destino
+        data: Texto o bytes a escribir
+        encoding: Codificación si `data` es texto
+    """
+    mode = "wb" if isinstance(data, bytes) else "w"
+    with atomic_writer(path, mode, encoding) as f:
+        f.write(data)
+
+
+class FileLock:
+    """Lock exclusivo entre procesos basado en un archivo"""
+
+    def __init__(self, path: Union[str, Path], timeout: Optional[float] = None, poll_interval: float = 0.1):
+        """
+        Args:
+            path: Archivo de lock (se crea si no existe)
+            timeout: Segundos máximos de espera en acquire (None = sin límite)
+            poll_interval: Intervalo entre intentos cuando hay timeout
+        """
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd: Optional[int] = None
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """
+        Tomar el lock.
+
+        Args:
+            blocking: Esperar a que se libere (hasta `timeout`)
+
+        Returns:
+            True si se obtuvo el lock
+        """
+        if self._fd is not None:
+            raise RuntimeError(f"Lock ya tomado: {self.path}")
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self._try_lock(fd):
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                os.close(fd)
+                return False
+            if fcntl and deadline is None:
+                # Sin timeout: esperar en el kernel
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                break
+            time.sleep(self.poll_interval)
+
+        self._fd = fd
+        return True
+
+    def release(self):
+        """Liberar el lock"""
+        if self._fd is None:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "FileLock":
+        if not self.acquire():
+            raise TimeoutError(f"No se pudo tomar el lock: {self.path}")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class SingleFlight:
+    """Ejecuta una recarga en un solo hilo/proceso a la vez"""
+
+    def __init__(self, lock_path: Union[str, Path]):
+        """
+        Args:
+            lock_path: Archivo de lock compartido por todos los workers
+        """
+        self.lock_path = Path(lock_path)
+        self._thread_lock = threading.Lock()
+
+    def run(self, fn: Callable[[], Any], wait: bool = False) -> bool:
+        """
+        Ejecutar `fn` si ningún otro hilo o proceso la está ejecutando.
+
+        Args:
+            fn: Recarga a ejecutar
+            wait: Si hay otra en curso, esperar a que termine (sin repetirla)
+
+        Returns:
+            True si esta llamada ejecutó `fn`; False si la ejecutó otro worker
+            (al volver con wait=True sus resultados ya están en disco)
+        """
+        if not self._thread_lock.acquire(blocking=False):
+            if wait:
+                with self._thread_lock:
+                    return False
+            logger.info(f"Recarga en curso en otro hilo ({self.lock_path.name}), se usan los datos vigentes")
+            return False
+        try:
+            lock = FileLock(self.lock_path)
+            if not lock.acquire(blocking=False):
+                if not wait:
+                    logger.info(f"Recarga en curso en otro proceso ({self.lock_path.name}), se usan los datos vigentes")
+                    return False
+                with lock:
+                    return False
+            try:
+                fn()
+                return True
+            finally:
+                lock.release()
+        finally:
+            self._thread_lock.release()
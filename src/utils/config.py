@@ -31,3 +31,27 @@ class ConfigLoader:
     def load_agent_config(self) -> Dict[str, Any]:
         """Cargar configuración del agente"""
         return self.load_config("agent_config.yaml")
+
+
+def load_knowledge_config() -> Dict[str, Any]:
+    """Leer la sección "knowledge" de config/agent_config.yaml (vacía si no existe)"""
+    try:
+        return ConfigLoader().load_agent_config().get("knowledge") or {}
+    except FileNotFoundError:
+        return {}
+
+
+def load_memory_config() -> Dict[str, Any]:
+    """Leer la sección "memory" de config/agent_config.yaml (vacía si no existe)"""
+    try:
+        return ConfigLoader().load_agent_config().get("memory") or {}
+    except FileNotFoundError:
+        return {}
+
+
+def load_server_config() -> Dict[str, Any]:
+    """Leer la sección "server" de config/agent_config.yaml (vacía si no existe)"""
+    try:
+        return ConfigLoader().load_agent_config().get("server") or {}
+    except FileNotFoundError:
+        return {}
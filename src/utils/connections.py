@@ -0,0 +1,184 @@
+"""
+Registro de conexiones WebSocket y envío a varios clientes
+
+Las conexiones se indexan por session_id (una sesión puede tener varias
+pestañas abiertas) y cada WebSocket tiene su propia cola de envío con una tarea
+que la vacía. Así las respuestas del chat y los avisos del servidor (cambios
+de precio, alertas de clima) se encolan sin esperar a la red: un cliente que
+no lee llena solo su cola y se desconecta, sin frenar a los demás.
+"""
+from typing import Dict, Iterable, Optional, Set
+from fastapi import WebSocket
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 32
+DEFAULT_SEND_TIMEOUT = 5.0
+
+# Código de cierre para clientes lentos: "Try Again Later"
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class _Outbox:
+    """Cola de envío y tarea de escritura de un WebSocket"""
+
+    def __init__(self, websocket: WebSocket, session_id: str, queue_size: int):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: Optional[asyncio.Task] = None
+
+
+class ConnectionManager:
+    """Conexiones WebSocket activas por sesión, con colas de envío por socket"""
+
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE, send_timeout: float = DEFAULT_SEND_TIMEOUT):
+        """
+        Args:
+            queue_size: Mensajes pendientes por socket antes de considerarlo lento
+            send_timeout: Segundos máximos de un envío antes de desconectar el socket
+        """
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self._sessions: Dict[str, Set[WebSocket]] = {}
+        self._outboxes: Dict[WebSocket, _Outbox] = {}
+        self._closing: Set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.dropped = 0
+
+    @property
+    def connection_count(self) -> int:
+        return len(self._outboxes)
+
+    def sessions(self) -> Set[str]:
+        """Sesiones con al menos un WebSocket abierto"""
+        return set(self._sessions)
+
+    async def connect(self, websocket: WebSocket, session_id: str):
+        """Aceptar un WebSocket y registrarlo en su sesión"""
+        await websocket.accept()
+        self._loop = asyncio.get_running_loop()
+        outbox = _Outbox(websocket, session_id, self.queue_size)
+        outbox.task = asyncio.create_task(self._writer(outbox))
+        self._outboxes[websocket] = outbox
+        self._sessions.setdefault(session_id, set()).add(websocket)
+
+    def disconnect(self, websocket: WebSocket) -> bool:
+        """
+        Quitar un WebSocket del registro (se puede llamar varias veces).
+
+        Returns:
+            True si estaba registrado
+        """
+        outbox = self._outboxes.pop(websocket, None)
+        if outbox is None:
+            return False
+        sockets = self._sessions.get(outbox.session_id)
+        if sockets is not None:
+            sockets.discard(websocket)
+            if not sockets:
+                del self._sessions[outbox.session_id]
+        if outbox.task is not None and outbox.task is not asyncio.current_task():
+            outbox.task.cancel()
+        return True
+
+    def _enqueue(self, outbox: _Outbox, message: str) -> bool:
+        try:
+            outbox.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self._drop(outbox, f"{self.queue_size} mensajes sin leer")
+            return False
+
+    def _drop(self, outbox: _Outbox, reason: str):
+        """Desconectar un cliente lento; el cierre se hace en segundo plano"""
+        if not self.disconnect(outbox.websocket):
+            return
+        self.dropped += 1
+        logger.warning(f"WebSocket de {outbox.session_id} desconectado por lento ({reason})")
+        task = asyncio.get_running_loop().create_task(self._close(outbox.websocket, SLOW_CONSUMER_CLOSE_CODE))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, websocket: WebSocket, code: int):
+        try:
+            await asyncio.wait_for(websocket.close(code=code), self.send_timeout)
+        except Exception:
+            pass
+
+    async def _writer(self, outbox: _Outbox):
+        """Enviar en orden los mensajes de la cola de un socket"""
+        while True:
+            message = await outbox.queue.get()
+            try:
+                await asyncio.wait_for(outbox.websocket.send_text(message), self.send_timeout)
+            except asyncio.TimeoutError:
+                self._drop(outbox, f"envío de más de {self.send_timeout:g}s")
+                return
+            except Exception as e:
+                logger.info(f"WebSocket de {outbox.session_id} cerrado al enviar: {str(e)}")
+                self.disconnect(outbox.websocket)
+                return
+
+    async def send_message(self, message: str, websocket: WebSocket) -> bool:
+        """
+        Encolar un mensaje para un WebSocket.
+
+        Returns:
+            False si el socket ya no está registrado o se desconectó por lento
+        """
+        outbox = self._outboxes.get(websocket)
+        return outbox is not None and self._enqueue(outbox, message)
+
+    def send_to_session(self, session_id: str, message: str) -> int:
+        """
+        Encolar un mensaje para todos los WebSockets de una sesión.
+
+        Returns:
+            Sockets a los que se encoló
+        """
+        return self._fan_out(self._sessions.get(session_id, ()), message)
+
+    def broadcast(self, message: str) -> int:
+        """
+        Encolar un mensaje para todos los WebSockets abiertos.
+
+        Returns:
+            Sockets a los que se encoló
+        """
+        return self._fan_out(self._outboxes, message)
+
+    def _fan_out(self, websockets: Iterable[WebSocket], message: str) -> int:
+        # Copia: _enqueue puede desconectar sockets lentos mientras se recorre
+        outboxes = [self._outboxes[websocket] for websocket in list(websockets) if websocket in self._outboxes]
+        return sum(self._enqueue(outbox, message) for outbox in outboxes)
+
+    def broadcast_threadsafe(self, message: str, session_id: Optional[str] = None):
+        """
+        broadcast() / send_to_session() desde otro hilo (p. ej. la
+        actualización del catálogo en segundo plano).
+
+        Args:
+            message: Mensaje (JSON)
+            session_id: Solo los sockets de esta sesión (None = todos)
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        if session_id is None:
+            loop.call_soon_threadsafe(self.broadcast, message)
+        else:
+            loop.call_soon_threadsafe(self.send_to_session, session_id, message)
+
+    async def close_all(self):
+        """Cerrar todos los WebSockets (al apagar el servidor)"""
+        websockets = list(self._outboxes)
+        for websocket in websockets:
+            self.disconnect(websocket)
+        await asyncio.gather(*(self._close(websocket, 1001) for websocket in websockets))
+
+    def stats(self) -> Dict[str, int]:
+        """Conexiones, sesiones conectadas y clientes desconectados por lentos"""
+        return {"connections": len(self._outboxes), "sessions": len(self._sessions), "dropped": self.dropped}
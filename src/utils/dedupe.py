@@ -0,0 +1,109 @@
+"""
+Deduplicación de mensajes reenviados por el cliente
+
+Con redes inestables el navegador reenvía el mismo mensaje (reconexión del
+WebSocket, respaldo por POST /chat). Cada mensaje lleva un message_id; mientras
+la respuesta se calcula, los duplicados esperan ese mismo cálculo, y durante
+ttl segundos después reciben la respuesta guardada sin volver a ejecutar el
+agente. Los errores (excepciones o resultados que `cacheable` rechaza, como
+la disculpa de un agente que falló) no se guardan: un reintento se procesa.
+
+El registro es del proceso: con varios workers solo se deduplican los
+reintentos que llegan al mismo worker.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import time
+
+DEFAULT_TTL_SECONDS = 300.0
+DEFAULT_MAX_ENTRIES = 10000
+
+# Largo máximo aceptado para un message_id (los más largos se ignoran)
+MAX_MESSAGE_ID_LENGTH = 128
+
+
+class RequestDeduplicator:
+    """Respuestas en curso y recientes por (session_id, message_id)"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            ttl: Segundos que se conserva una respuesta terminada
+            max_entries: Mensajes recordados como máximo (se descartan los más antiguos)
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # clave -> [tarea, vencimiento (monotonic) o None mientras está en curso]
+        self._entries: "OrderedDict[Tuple[str, str], list]" = OrderedDict()
+        self._in_flight = 0
+        self.hits = 0
+
+    def _purge(self, now: float):
+        """Descartar desde el frente las respuestas vencidas y el exceso de entradas"""
+        while self._entries:
+            key, (task, expires_at) = next(iter(self._entries.items()))
+            expired = expires_at is not None and expires_at <= now
+            if not expired and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+    def _on_done(self, key: Tuple[str, str], task: asyncio.Task,
+                 cacheable: Optional[Callable[[Any], bool]]):
+        self._in_flight -= 1
+        entry = self._entries.get(key)
+        if entry is None or entry[0] is not task:
+            return
+        failed = task.cancelled() or task.exception() is not None
+        if failed or (cacheable is not None and not cacheable(task.result())):
+            del self._entries[key]
+        else:
+            entry[1] = time.monotonic() + self.ttl
+            # Orden por vencimiento: la purga recorre solo el frente
+            self._entries.move_to_end(key)
+
+    async def run(
+        self,
+        session_id: str,
+        message_id: Optional[str],
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Tuple[Any, bool]:
+        """
+        Calcular la respuesta de un mensaje una sola vez.
+
+        Args:
+            session_id: Sesión del mensaje
+            message_id: Id asignado por el cliente (None = sin deduplicación)
+            compute: Corrutina que calcula la respuesta
+            cacheable: Decide si un resultado se guarda para los reintentos
+                       (None = siempre); los que no, se descartan al terminar
+
+        Returns:
+            (respuesta, True si era un duplicado)
+        """
+        if not message_id or len(message_id) > MAX_MESSAGE_ID_LENGTH:
+            return await compute(), False
+
+        self._purge(time.monotonic())
+        key = (session_id, message_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return await asyncio.shield(entry[0]), True
+
+        # La tarea sigue aunque se corte la conexión que la inició: un
+        # reintento por otra vía recibe su resultado
+        task = asyncio.ensure_future(compute())
+        self._entries[key] = [task, None]
+        self._in_flight += 1
+        task.add_done_callback(lambda done: self._on_done(key, done, cacheable))
+        return await asyncio.shield(task), False
+
+    def stats(self) -> Dict[str, int]:
+        """Mensajes en curso, respuestas guardadas y duplicados atendidos"""
+        return {
+            "in_flight": self._in_flight,
+            "completed": max(0, len(self._entries) - self._in_flight),
+            "duplicates": self.hits,
+        }
@@ -2,6 +2,8 @@
 Módulo de utilidades generales
 """
 import os
+import threading
+import time
 from typing import Dict, Any
 from datetime import datetime
 
@@ -60,32 +62,86 @@ class UserPreferences:
         return self.preferences.copy()
 
 
+class TokenBucket:
+    """
+    Cubeta de tokens: capacity tokens como máximo, repuestos a refill_rate por
+    segundo. Cada verificación es O(1) y segura entre hilos.
+    """
+    
+    def __init__(self, capacity: float, refill_rate: float):
+        """
+        Args:
+            capacity: Tokens máximos (ráfaga permitida)
+            refill_rate: Tokens repuestos por segundo
+        """
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_rate)
+        self._updated = now
+    
+    def retry_after(self, amount: float = 1) -> float:
+        """Segundos hasta que haya `amount` tokens (0 si ya los hay)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            # Un pedido mayor que la capacidad se trata como uno que la llena
+            missing = min(amount, self.capacity) - self._tokens
+        if missing <= 0:
+            return 0.0
+        return missing / self.refill_rate if self.refill_rate > 0 else float("inf")
+    
+    def consume(self, amount: float = 1) -> None:
+        """Descontar tokens sin verificar (el saldo puede quedar negativo)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+    
+    def try_acquire(self, amount: float = 1) -> float:
+        """
+        Tomar `amount` tokens si están disponibles.
+        
+        Returns:
+            0 si se tomaron; si no, segundos a esperar para reintentar
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            missing = min(amount, self.capacity) - self._tokens
+            if missing <= 0:
+                self._tokens -= amount
+                return 0.0
+        return missing / self.refill_rate if self.refill_rate > 0 else float("inf")
+    
+    @property
+    def available(self) -> float:
+        """Tokens disponibles ahora"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
 class APIRateLimiter:
-    """Limitador de tasa para llamadas a API"""
+    """Limitador de tasa para llamadas a API (max_calls por time_window segundos)"""
     
     def __init__(self, max_calls: int = 10, time_window: int = 60):
         self.max_calls = max_calls
         self.time_window = time_window
-        self.calls = []
+        self._bucket = TokenBucket(max_calls, max_calls / time_window)
     
     def is_allowed(self) -> bool:
         """Verificar si una llamada está permitida"""
-        import time
-        current_time = time.time()
-        
-        # Limpiar llamadas antiguas
-        self.calls = [call_time for call_time in self.calls 
-                     if current_time - call_time < self.time_window]
-        
-        if len(self.calls) < self.max_calls:
-            self.calls.append(current_time)
-            return True
-        
-        return False
+        return self._bucket.try_acquire() == 0
+    
+    def retry_after(self) -> float:
+        """Segundos hasta la próxima llamada permitida"""
+        return self._bucket.retry_after()
     
     def get_remaining_calls(self) -> int:
         """Obtener llamadas restantes"""
-        return max(0, self.max_calls - len(self.calls))
+        return max(0, int(self._bucket.available))
 
 
 class EnvironmentConfig:
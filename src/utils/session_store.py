@@ -0,0 +1,621 @@
+"""
+Almacén de sesiones compartido entre workers
+
+El historial de cada conversación (memoria del agente y /history) vive fuera
+del proceso, para poder ejecutar uvicorn con --workers N y varias instancias
+sin sesiones pegajosas:
+
+- InMemorySessionStore: un solo proceso (CLI, desarrollo)
+- SQLiteSessionStore: archivo local compartido por los workers de una máquina
+- RedisSessionStore: compartido entre instancias (Redis, Valkey, Memorystore;
+  requiere el paquete redis)
+
+SQLite y Redis acumulan las escrituras y las envían en lote (una transacción o
+un pipeline) cada flush_interval segundos o al llegar a batch_size mensajes.
+
+Todos los almacenes están acotados: cada sesión conserva solo sus últimos
+max_messages mensajes y las sesiones sin actividad durante idle_ttl se
+descartan. En memoria además hay un máximo de sesiones (se desaloja la usada
+hace más tiempo) y las sesiones desalojadas pueden volcarse a otro almacén.
+stats() lee contadores que se actualizan con cada escritura, sin recorrer
+las sesiones.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+from src.utils.config import load_memory_config
+
+logger = logging.getLogger(__name__)
+
+SESSION_BACKENDS = ("memory", "sqlite", "redis")
+
+DEFAULT_SESSION = "default"
+DEFAULT_MAX_MESSAGES = 20
+DEFAULT_MAX_SESSIONS = 10000
+DEFAULT_SQLITE_PATH = Path("data/sessions/sessions.sqlite")
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+
+# Cada cuánto los almacenes compartidos eliminan las sesiones inactivas
+PURGE_INTERVAL_SECONDS = 60.0
+
+
+def make_message(role: str, content: str, timestamp: Optional[str] = None) -> Dict[str, str]:
+    """Mensaje de historial: role ("user" o "assistant"), content y timestamp ISO"""
+    return {"role": role, "content": content, "timestamp": timestamp or datetime.now().isoformat()}
+
+
+class SessionStore:
+    """Interfaz común de los almacenes de sesiones"""
+
+    def __init__(self, max_messages: int = DEFAULT_MAX_MESSAGES, idle_ttl: Optional[float] = None):
+        """
+        Args:
+            max_messages: Mensajes que conserva cada sesión (los más recientes)
+            idle_ttl: Segundos sin actividad tras los que se descarta una sesión (None = nunca)
+        """
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        """Agregar mensajes al final del historial de una sesión"""
+        raise NotImplementedError
+
+    def get(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Historial de una sesión en orden cronológico.
+
+        Args:
+            session_id: Sesión
+            limit: Solo los últimos `limit` mensajes
+
+        Returns:
+            Mensajes (role, content, timestamp)
+        """
+        raise NotImplementedError
+
+    def clear(self, session_id: str):
+        """Borrar el historial de una sesión"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        """Sesiones y mensajes guardados (contadores, sin recorrer las sesiones)"""
+        raise NotImplementedError
+
+    def purge_idle(self) -> int:
+        """
+        Eliminar las sesiones sin actividad durante idle_ttl.
+
+        Returns:
+            Sesiones eliminadas
+        """
+        return 0
+
+    def flush(self):
+        """Enviar las escrituras pendientes"""
+
+    def close(self):
+        """Enviar lo pendiente y liberar recursos"""
+        self.flush()
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Historial en memoria del proceso (no se comparte entre workers).
+
+    Cada sesión es un buffer circular de max_messages; las sesiones se guardan
+    en orden de última actividad (LRU), de modo que las expiradas y las que
+    exceden max_sessions se desalojan desde el frente sin recorrer el resto.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = DEFAULT_MAX_MESSAGES,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        idle_ttl: Optional[float] = None,
+        spill: Optional[SessionStore] = None
+    ):
+        """
+        Args:
+            max_messages: Mensajes que conserva cada sesión
+            max_sessions: Sesiones en memoria; al superarlo se desaloja la menos reciente
+            idle_ttl: Segundos sin actividad tras los que se desaloja una sesión
+            spill: Almacén donde se vuelcan las sesiones desalojadas (se
+                   recuperan al volver a usarse); sin él se descartan
+        """
+        super().__init__(max_messages, idle_ttl)
+        self.max_sessions = max_sessions
+        self.spill = spill
+        # session_id -> [historial, última actividad (monotonic)]
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._messages = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def _touch(self, session_id: str, create: bool) -> Optional[deque]:
+        """Marcar actividad de una sesión (recuperándola del spill si hace falta); requiere el lock"""
+        now = time.monotonic()
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            entry[1] = now
+            self._sessions.move_to_end(session_id)
+        else:
+            history = deque(maxlen=self.max_messages)
+            if self.spill:
+                history.extend(self.spill.get(session_id))
+                if history:
+                    self.spill.clear(session_id)
+            if not history and not create:
+                self._evict(now)
+                return None
+            entry = self._sessions[session_id] = [history, now]
+            self._messages += len(history)
+        self._evict(now)
+        return entry[0]
+
+    def _evict(self, now: float):
+        """Desalojar desde el frente las sesiones expiradas o que exceden max_sessions"""
+        while self._sessions:
+            session_id, (history, last_active) = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions:
+                self.evicted += 1
+            elif self.idle_ttl and now - last_active > self.idle_ttl:
+                self.expired += 1
+            else:
+                break
+            self._sessions.popitem(last=False)
+            self._messages -= len(history)
+            if self.spill and history:
+                self.spill.append(session_id, list(history))
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        with self._lock:
+            history = self._touch(session_id, create=True)
+            before = len(history)
+            history.extend(messages)
+            self._messages += len(history) - before
+
+    def get(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        with self._lock:
+            history = self._touch(session_id, create=False)
+            history = list(history) if history else []
+        return history[-limit:] if limit else history
+
+    def clear(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry:
+                self._messages -= len(entry[0])
+        if self.spill:
+            self.spill.clear(session_id)
+
+    def purge_idle(self) -> int:
+        with self._lock:
+            before = self.expired
+            self._evict(time.monotonic())
+            return self.expired - before
+
+    def stats(self) -> Dict[str, int]:
+        self.purge_idle()
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "messages": self._messages,
+                "evicted": self.evicted,
+                "expired": self.expired,
+            }
+
+    def flush(self):
+        if self.spill:
+            self.spill.flush()
+
+    def close(self):
+        """Volcar todas las sesiones al spill (si hay) antes de terminar"""
+        if self.spill:
+            with self._lock:
+                for session_id, (history, _) in self._sessions.items():
+                    if history:
+                        self.spill.append(session_id, list(history))
+                self._sessions.clear()
+                self._messages = 0
+            self.spill.close()
+
+
+class BatchedSessionStore(SessionStore):
+    """Base de los almacenes compartidos: cola de escrituras, envío en lote y purga periódica"""
+
+    def __init__(self, max_messages: int = DEFAULT_MAX_MESSAGES, idle_ttl: Optional[float] = None,
+                 flush_interval: float = 0.05, batch_size: int = 64):
+        """
+        Args:
+            max_messages: Mensajes que conserva cada sesión
+            idle_ttl: Segundos sin actividad tras los que se elimina una sesión
+            flush_interval: Segundos que se esperan para juntar escrituras
+            batch_size: Mensajes pendientes que fuerzan el envío inmediato
+        """
+        super().__init__(max_messages, idle_ttl)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: List[Tuple[str, Dict[str, str]]] = []
+        self._condition = threading.Condition()
+        # Un lote está en la cola o ya escrito, nunca en tránsito para un lector
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._flush_loop, name=f"{type(self).__name__}-flush", daemon=True)
+        self._thread.start()
+
+    # ---- Implementación de cada backend ----
+
+    def _write_batch(self, batch: List[Tuple[str, Dict[str, str]]]):
+        raise NotImplementedError
+
+    def _read(self, session_id: str, limit: int) -> List[Dict[str, str]]:
+        raise NotImplementedError
+
+    def _delete(self, session_id: str):
+        raise NotImplementedError
+
+    def _purge(self, cutoff: float) -> int:
+        """Eliminar sesiones cuya última actividad (epoch) es anterior a cutoff"""
+        raise NotImplementedError
+
+    # ---- Cola de escrituras ----
+
+    def _flush_loop(self):
+        next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+        while True:
+            with self._condition:
+                if not self._pending and not self._closed:
+                    timeout = max(next_purge - time.monotonic(), 0.0) if self.idle_ttl else None
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+                # Dar tiempo a que lleguen más escrituras para el mismo lote
+                if self._pending and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+            self.flush()
+            if self.idle_ttl and time.monotonic() >= next_purge:
+                self.purge_idle()
+                next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        with self._condition:
+            self._pending.extend((session_id, message) for message in messages)
+            self._condition.notify()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._condition:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                # Se reintenta en el próximo envío
+                logger.error(f"Error guardando {len(batch)} mensajes de sesión: {str(e)}")
+                with self._condition:
+                    self._pending[:0] = batch
+
+    def get(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        limit = min(limit or self.max_messages, self.max_messages)
+        with self._flush_lock:
+            history = self._read(session_id, limit)
+            with self._condition:
+                history += [message for pending_id, message in self._pending if pending_id == session_id]
+        return history[-limit:]
+
+    def clear(self, session_id: str):
+        with self._flush_lock:
+            with self._condition:
+                self._pending = [entry for entry in self._pending if entry[0] != session_id]
+            self._delete(session_id)
+
+    def purge_idle(self) -> int:
+        if not self.idle_ttl:
+            return 0
+        try:
+            with self._flush_lock:
+                removed = self._purge(time.time() - self.idle_ttl)
+        except Exception as e:
+            logger.error(f"Error eliminando sesiones inactivas: {str(e)}")
+            return 0
+        if removed:
+            logger.info(f"✓ {removed} sesiones inactivas eliminadas")
+        return removed
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+class SQLiteSessionStore(BatchedSessionStore):
+    """Historial en SQLite (WAL): lo comparten los workers de una misma máquina"""
+
+    def __init__(self, path: Path = DEFAULT_SQLITE_PATH, **options):
+        """
+        Args:
+            path: Archivo SQLite
+            **options: max_messages, idle_ttl, flush_interval, batch_size
+        """
+        # sqlite3 se importa al crear el almacén, no al importar app.py
+        import sqlite3
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " session_id TEXT NOT NULL,"
+            " role TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " timestamp TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);"
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " last_active REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions (last_active);"
+            "CREATE TABLE IF NOT EXISTS counters ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0),"
+            " sessions INTEGER NOT NULL,"
+            " messages INTEGER NOT NULL);"
+        )
+        with self._conn:
+            if self._conn.execute("SELECT 1 FROM counters").fetchone() is None:
+                # Base creada antes de los contadores: se calculan una sola vez
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO sessions (session_id, last_active)"
+                    " SELECT DISTINCT session_id, ? FROM messages", (time.time(),)
+                )
+                self._conn.execute(
+                    "INSERT INTO counters (id, sessions, messages)"
+                    " SELECT 0, (SELECT COUNT(*) FROM sessions), (SELECT COUNT(*) FROM messages)"
+                )
+        super().__init__(**options)
+
+    def _update_counters(self, sessions: int, messages: int):
+        self._conn.execute(
+            "UPDATE counters SET sessions = sessions + ?, messages = messages + ? WHERE id = 0",
+            (sessions, messages)
+        )
+
+    def _write_batch(self, batch: List[Tuple[str, Dict[str, str]]]):
+        now = time.time()
+        sessions = [(session_id,) for session_id in {session_id for session_id, _ in batch}]
+        with self._db_lock, self._conn:
+            new_sessions = self._conn.executemany(
+                "INSERT OR IGNORE INTO sessions (session_id, last_active) VALUES (?, ?)",
+                [(session_id, now) for session_id, in sessions]
+            ).rowcount
+            self._conn.executemany("UPDATE sessions SET last_active = ? WHERE session_id = ?",
+                                   [(now, session_id) for session_id, in sessions])
+            self._conn.executemany(
+                "INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                [(session_id, m["role"], m["content"], m["timestamp"]) for session_id, m in batch]
+            )
+            # Recortar cada sesión a sus últimos max_messages
+            trimmed = self._conn.executemany(
+                "DELETE FROM messages WHERE session_id = ? AND id <= ("
+                " SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                [(session_id, session_id, self.max_messages) for session_id, in sessions]
+            ).rowcount
+            self._update_counters(new_sessions, len(batch) - trimmed)
+
+    def _read(self, session_id: str, limit: int) -> List[Dict[str, str]]:
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT role, content, timestamp FROM messages WHERE session_id = ?"
+                " ORDER BY id DESC LIMIT ?",
+                (session_id, limit)
+            ).fetchall()
+        return [make_message(role, content, timestamp) for role, content, timestamp in reversed(rows)]
+
+    def _delete(self, session_id: str):
+        with self._db_lock, self._conn:
+            messages = self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,)).rowcount
+            sessions = self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount
+            self._update_counters(-sessions, -messages)
+
+    def _purge(self, cutoff: float) -> int:
+        with self._db_lock, self._conn:
+            messages = self._conn.execute(
+                "DELETE FROM messages WHERE session_id IN"
+                " (SELECT session_id FROM sessions WHERE last_active < ?)", (cutoff,)
+            ).rowcount
+            sessions = self._conn.execute("DELETE FROM sessions WHERE last_active < ?", (cutoff,)).rowcount
+            self._update_counters(-sessions, -messages)
+        return sessions
+
+    def stats(self) -> Dict[str, int]:
+        self.flush()
+        with self._db_lock:
+            sessions, messages = self._conn.execute(
+                "SELECT sessions, messages FROM counters WHERE id = 0"
+            ).fetchone()
+        return {"sessions": sessions, "messages": messages}
+
+    def close(self):
+        super().close()
+        with self._db_lock:
+            self._conn.close()
+
+
+# Elimina sesiones (historial, registro de actividad y contadores) de forma
+# atómica. KEYS: actividad (zset), contadores (hash). ARGV: prefijo, límite de
+# actividad ("inf" = eliminar siempre), ids de sesión
+REDIS_REMOVE_SCRIPT = """
+local sessions, messages = 0, 0
+for i = 3, #ARGV do
+  local score = redis.call('ZSCORE', KEYS[1], ARGV[i])
+  if ARGV[2] == 'inf' or (score and tonumber(score) < tonumber(ARGV[2])) then
+    local key = ARGV[1] .. ARGV[i]
+    local length = redis.call('LLEN', key)
+    if length > 0 or score then
+      sessions = sessions + 1
+      messages = messages + length
+    end
+    redis.call('DEL', key)
+    redis.call('ZREM', KEYS[1], ARGV[i])
+  end
+end
+redis.call('HINCRBY', KEYS[2], 'sessions', -sessions)
+redis.call('HINCRBY', KEYS[2], 'messages', -messages)
+return sessions
+"""
+
+
+class RedisSessionStore(BatchedSessionStore):
+    """
+    Historial en Redis (una lista por sesión): lo comparten todas las instancias.
+
+    La última actividad de cada sesión se registra en un zset y los contadores
+    de /stats en un hash; la purga de sesiones inactivas ajusta ambos en un
+    script atómico, por lo que varias instancias pueden purgar a la vez.
+    """
+
+    def __init__(self, url: str = DEFAULT_REDIS_URL, prefix: str = "huaraz:session:",
+                 client: Any = None, **options):
+        """
+        Args:
+            url: URL del servidor (redis://, rediss:// o unix://)
+            prefix: Prefijo de las claves
+            client: Cliente ya creado con la API de redis-py (en lugar de url)
+            **options: max_messages, idle_ttl, flush_interval, batch_size
+        """
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError("El almacén de sesiones 'redis' requiere: pip install redis") from e
+            client = redis.Redis.from_url(url, decode_responses=True)
+
+        self._client = client
+        self.prefix = prefix
+        self._activity_key = prefix + "_activity"
+        self._counters_key = prefix + "_counters"
+        self._remove = client.register_script(REDIS_REMOVE_SCRIPT)
+        super().__init__(**options)
+
+    def _key(self, session_id: str) -> str:
+        return self.prefix + session_id
+
+    def _write_batch(self, batch: List[Tuple[str, Dict[str, str]]]):
+        grouped: Dict[str, List[str]] = {}
+        for session_id, message in batch:
+            grouped.setdefault(session_id, []).append(json.dumps(message, ensure_ascii=False))
+
+        now = time.time()
+        pipe = self._client.pipeline(transaction=False)
+        for session_id, messages in grouped.items():
+            key = self._key(session_id)
+            pipe.rpush(key, *messages)
+            pipe.ltrim(key, -self.max_messages, -1)
+        pipe.zadd(self._activity_key, {session_id: now for session_id in grouped})
+        lengths = pipe.execute()[0:2 * len(grouped):2]
+
+        # RPUSH devuelve el largo tras agregar: sesiones nuevas y mensajes recortados
+        new_sessions = messages_added = 0
+        for (session_id, messages), length in zip(grouped.items(), lengths):
+            new_sessions += length == len(messages)
+            messages_added += len(messages) - max(length - self.max_messages, 0)
+        pipe = self._client.pipeline(transaction=False)
+        pipe.hincrby(self._counters_key, "sessions", new_sessions)
+        pipe.hincrby(self._counters_key, "messages", messages_added)
+        pipe.execute()
+
+    def _read(self, session_id: str, limit: int) -> List[Dict[str, str]]:
+        return [json.loads(item) for item in self._client.lrange(self._key(session_id), -limit, -1)]
+
+    def _delete(self, session_id: str):
+        self._remove(keys=[self._activity_key, self._counters_key], args=[self.prefix, "inf", session_id])
+
+    def _purge(self, cutoff: float) -> int:
+        stale = self._client.zrangebyscore(self._activity_key, "-inf", f"({cutoff}")
+        if not stale:
+            return 0
+        return int(self._remove(keys=[self._activity_key, self._counters_key],
+                                args=[self.prefix, cutoff, *stale]))
+
+    def stats(self) -> Dict[str, int]:
+        self.flush()
+        counters = self._client.hgetall(self._counters_key)
+        return {"sessions": int(counters.get("sessions", 0)), "messages": int(counters.get("messages", 0))}
+
+
+def create_session_store(backend: Optional[str] = None) -> SessionStore:
+    """
+    Crear el almacén configurado en memory.store (config/agent_config.yaml).
+
+    Las variables SESSION_STORE (backend) y SESSION_STORE_URL (ruta SQLite o
+    URL de Redis) tienen prioridad sobre la configuración.
+
+    Args:
+        backend: "memory", "sqlite" o "redis"
+
+    Returns:
+        Almacén de sesiones
+    """
+    memory = load_memory_config()
+    settings = memory.get("store") or {}
+    backend = (backend or os.getenv("SESSION_STORE") or settings.get("backend") or "memory").lower()
+    location = os.getenv("SESSION_STORE_URL")
+    max_messages = int(memory.get("max_history", DEFAULT_MAX_MESSAGES))
+    idle_ttl_hours = settings.get("idle_ttl_hours")
+    idle_ttl = float(idle_ttl_hours) * 3600 if idle_ttl_hours else None
+    options = {
+        "max_messages": max_messages,
+        "idle_ttl": idle_ttl,
+        "flush_interval": float(settings.get("flush_interval_ms", 50)) / 1000,
+        "batch_size": int(settings.get("batch_size", 64)),
+    }
+
+    if backend == "memory":
+        spill = (settings.get("spill") or "none").lower()
+        if spill == "memory":
+            raise ValueError("memory.store.spill debe ser none, sqlite o redis (no memory)")
+        return InMemorySessionStore(
+            max_messages,
+            max_sessions=int(settings.get("max_sessions", DEFAULT_MAX_SESSIONS)),
+            idle_ttl=idle_ttl,
+            spill=None if spill == "none" else create_session_store(spill)
+        )
+    if backend == "sqlite":
+        return SQLiteSessionStore(location or settings.get("path") or DEFAULT_SQLITE_PATH, **options)
+    if backend == "redis":
+        return RedisSessionStore(location or settings.get("url") or DEFAULT_REDIS_URL, **options)
+    raise ValueError(f"Almacén de sesiones no soportado: {backend}. Opciones: {', '.join(SESSION_BACKENDS)}")
+
+
+# Instancia global
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Obtener el almacén de sesiones del proceso (se crea al primer uso)"""
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = create_session_store()
+                atexit.register(store.close)
+                logger.info(f"✓ Almacén de sesiones: {type(store).__name__}")
+                _store = store
+
+    return _store
@@ -0,0 +1,169 @@
+"""
+Precarga de componentes al arrancar el servidor
+
+Cada componente (agente, índice RAG, catálogo de tours, pools HTTP) se
+inicializa en paralelo en un hilo propio y se mide su tiempo. El servidor
+queda "listo" cuando todos los componentes requeridos terminaron sin error;
+los opcionales solo se registran. Los requeridos que fallan se reintentan en
+segundo plano con espera exponencial, para que un error transitorio al
+arrancar (red, API) no deje al servidor fuera de servicio para siempre.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Espera entre reintentos de componentes requeridos: se duplica hasta el máximo
+RETRY_INITIAL_SECONDS = 5.0
+RETRY_MAX_SECONDS = 300.0
+
+
+class StartupWarmup:
+    """Inicialización paralela de componentes con tiempos y estado de preparación"""
+
+    def __init__(
+        self,
+        components: Dict[str, Callable[[], Any]],
+        required: Optional[Iterable[str]] = None,
+        retry_initial: float = RETRY_INITIAL_SECONDS,
+        retry_max: float = RETRY_MAX_SECONDS
+    ):
+        """
+        Args:
+            components: Nombre -> función que inicializa el componente
+            required: Componentes sin los cuales el servidor no está listo (por defecto todos)
+            retry_initial: Segundos antes del primer reintento de un requerido que falló
+            retry_max: Espera máxima entre reintentos
+        """
+        self.components = components
+        self.required = set(components if required is None else required)
+        self.results: Dict[str, Dict[str, Any]] = {name: {"status": "pending"} for name in components}
+        self.started_at: Optional[float] = None
+        self.total_seconds: Optional[float] = None
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self._done = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run_component(self, name: str):
+        attempts = self.results[name].get("attempts", 0) + 1
+        start = time.perf_counter()
+        try:
+            self.components[name]()
+            self.results[name] = {
+                "status": "ok",
+                "seconds": round(time.perf_counter() - start, 3),
+                "attempts": attempts,
+            }
+        except Exception as e:
+            self.results[name] = {
+                "status": "error",
+                "seconds": round(time.perf_counter() - start, 3),
+                "attempts": attempts,
+                "error": str(e),
+            }
+            logger.error(f"Error inicializando {name} (intento {attempts}): {str(e)}")
+
+    def failed_required(self) -> List[str]:
+        """Componentes requeridos cuyo último intento falló"""
+        return [name for name in self.required if self.results[name]["status"] == "error"]
+
+    def retry_failed(self):
+        """
+        Reintentar los componentes requeridos que fallaron, con espera
+        exponencial, hasta que todos terminen bien o se llame a stop().
+        """
+        delay = self.retry_initial
+        while self.failed_required() and not self._stop.wait(delay):
+            for name in self.failed_required():
+                logger.info(f"Reintentando {name}...")
+                self._run_component(name)
+            if not self.failed_required():
+                logger.info("✓ Componentes requeridos listos tras reintentar")
+            delay = min(delay * 2, self.retry_max)
+
+    def skip(self):
+        """
+        Dar la precarga por terminada sin ejecutarla: los componentes se
+        inicializan al primer uso y el servidor queda listo de inmediato.
+        """
+        for name in self.components:
+            self.results[name] = {"status": "skipped"}
+        self.total_seconds = 0.0
+        self._done.set()
+        logger.info("Precarga desactivada: los componentes se inicializan al primer uso")
+
+    def stop(self):
+        """Cancelar los reintentos pendientes (al apagar el servidor)"""
+        self._stop.set()
+
+    def run(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Inicializar todos los componentes en paralelo y esperar a que terminen.
+
+        Returns:
+            Estado y segundos por componente
+        """
+        self.started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(len(self.components), 1), thread_name_prefix="warmup") as pool:
+            list(pool.map(self._run_component, self.components))
+        self.total_seconds = round(time.perf_counter() - self.started_at, 3)
+        self._done.set()
+        logger.info(self.summary())
+        return self.results
+
+    def summary(self) -> str:
+        """Tiempo total y por componente, del más lento al más rápido"""
+        finished = [(name, result) for name, result in self.results.items() if "seconds" in result]
+        breakdown = ", ".join(
+            f"{name} {result['seconds']:.2f}s" + ("" if result["status"] == "ok" else " ❌")
+            for name, result in sorted(finished, key=lambda item: -item[1]["seconds"])
+        )
+        total = f"{self.total_seconds:.2f}s" if self.total_seconds is not None else "en curso"
+        return f"⏱️ Arranque ({total}): {breakdown}"
+
+    def start(self, on_complete: Optional[Callable[["StartupWarmup"], Any]] = None) -> threading.Thread:
+        """
+        Ejecutar run() en segundo plano (el servidor acepta conexiones mientras
+        tanto) y luego reintentar los componentes requeridos que fallaron.
+
+        Args:
+            on_complete: Función a llamar con la precarga al terminar
+        """
+        def target():
+            self.run()
+            if on_complete:
+                on_complete(self)
+            self.retry_failed()
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=target, name="startup-warmup", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Esperar a que termine la precarga"""
+        return self._done.wait(timeout)
+
+    @property
+    def ready(self) -> bool:
+        """Precarga terminada (u omitida) y sin errores en los componentes requeridos"""
+        return self._done.is_set() and all(
+            self.results[name]["status"] in ("ok", "skipped") for name in self.required
+        )
+
+    def status(self) -> Dict[str, Any]:
+        """Estado para /ready"""
+        return {
+            "ready": self.ready,
+            "finished": self._done.is_set(),
+            "total_seconds": self.total_seconds,
+            "components": {
+                name: dict(result, required=name in self.required)
+                for name, result in self.results.items()
+            },
+        }
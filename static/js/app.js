@@ -17,6 +17,7 @@ const state = {
     reconnectAttempts: 0,
     isConnected: false,
     currentSession: 'default',
+    pending: null,  // { id, message } esperando respuesta
     attractions: [],
     stats: {}
 };
@@ -183,6 +184,7 @@ function initializeChat() {
     // New chat
     newChatBtn.addEventListener('click', () => {
         state.currentSession = generateSessionId();
+        state.pending = null;
         clearChat();
         connectWebSocket();
     });
@@ -225,6 +227,11 @@ function connectWebSocket() {
             console.log('🔌 WebSocket cerrado');
             state.isConnected = false;
             updateConnectionStatus('Desconectado', false);
+            // Reintentar por HTTP el mensaje sin respuesta con el mismo id: el
+            // servidor devuelve la respuesta ya calculada en lugar de repetirla
+            if (state.pending) {
+                sendMessageHTTP(state.pending.message, state.pending.id);
+            }
             attemptReconnect();
         };
     } catch (error) {
@@ -276,41 +283,71 @@ function sendMessage() {
     // Show typing indicator
     showTypingIndicator();
     
+    // Mismo id para todos los reintentos de este mensaje
+    const messageId = generateMessageId();
+    state.pending = { id: messageId, message };
+    
     // Send via WebSocket or HTTP
     if (state.isConnected && state.ws.readyState === WebSocket.OPEN) {
-        state.ws.send(JSON.stringify({ message }));
+        state.ws.send(JSON.stringify({ message, message_id: messageId }));
     } else {
         // Fallback to HTTP
-        sendMessageHTTP(message);
+        sendMessageHTTP(message, messageId);
     }
 }
 
-async function sendMessageHTTP(message) {
+async function sendMessageHTTP(message, messageId) {
     try {
         const response = await fetch(`${CONFIG.API_BASE_URL}/chat`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
                 message,
-                session_id: state.currentSession
+                session_id: state.currentSession,
+                message_id: messageId
             })
         });
         
         const data = await response.json();
+        // Ya respondido (p. ej. por el WebSocket antes de cortarse)
+        if (!isPending(messageId)) return;
+        state.pending = null;
         hideTypingIndicator();
+        // 429 (límite de tasa) / 503 (sobrecarga): avisar cuándo reintentar
+        if (response.status === 429 || response.status === 503) {
+            const retryAfter = response.headers.get('Retry-After') || data.detail.retry_after;
+            addMessageToChat('bot', `⏳ ${data.detail.reason}. Intenta de nuevo en ${retryAfter} segundos.`);
+            return;
+        }
         addMessageToChat('bot', data.response);
     } catch (error) {
         console.error('Error al enviar mensaje:', error);
+        if (!isPending(messageId)) return;
+        state.pending = null;
         hideTypingIndicator();
         addMessageToChat('bot', '❌ Error al procesar tu mensaje. Por favor, intenta de nuevo.');
     }
 }
 
 function handleIncomingMessage(data) {
+    // Aviso del servidor (cambio de precio, clima): no es la respuesta esperada
+    if (data.type === 'alert') {
+        addMessageToChat('bot', `🔔 ${data.content}`);
+        return;
+    }
+    
+    // Las respuestas llevan el id del mensaje que responden; ignorar duplicados tardíos
+    if (data.message_id) {
+        if (!isPending(data.message_id)) return;
+        state.pending = null;
+    }
+    
     hideTypingIndicator();
     
     if (data.type === 'bot' || data.type === 'system') {
         addMessageToChat('bot', data.content);
+    } else if (data.type === 'busy') {
+        addMessageToChat('bot', `⏳ ${data.content}`);
     } else if (data.type === 'error') {
         addMessageToChat('bot', `❌ ${data.content}`);
     }
@@ -603,6 +640,17 @@ function generateSessionId() {
     return `session_${Date.now()}_${Math.random().toString(36).substring(7)}`;
 }
 
+function generateMessageId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `msg_${Date.now()}_${Math.random().toString(36).substring(2)}`;
+}
+
+function isPending(messageId) {
+    return state.pending !== null && state.pending.id === messageId;
+}
+
 function showNotification(message, type = 'info') {
     // Simple notification (can be enhanced with a library)
     const notification = document.createElement('div');
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Readiness (/ready) con la precarga desactivada y con fallos transitorios
+
+    python test_readiness.py
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+# Agregar raíz al path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+os.chdir(project_root)
+
+os.environ["WARMUP_ON_STARTUP"] = "false"
+os.environ.setdefault("SESSION_STORE", "memory")
+
+from fastapi.testclient import TestClient
+
+import app
+from src.utils.warmup import StartupWarmup
+
+failed = False
+
+print("✓ /ready con WARMUP_ON_STARTUP=false...")
+with TestClient(app.app) as client:
+    response = client.get("/ready")
+if response.status_code == 200 and response.json()["ready"]:
+    print("✓ Listo de inmediato (componentes al primer uso)")
+else:
+    print(f"✗ /ready respondió {response.status_code}: {response.json()}")
+    failed = True
+
+print("✓ Componente requerido con un fallo transitorio...")
+attempts = []
+
+
+def flaky():
+    attempts.append(time.time())
+    if len(attempts) == 1:
+        raise RuntimeError("fallo transitorio")
+
+
+warmup = StartupWarmup({"flaky": flaky}, retry_initial=0.05, retry_max=0.1)
+warmup.start()
+deadline = time.time() + 5
+while not warmup.ready and time.time() < deadline:
+    time.sleep(0.05)
+warmup.stop()
+if warmup.ready and len(attempts) == 2:
+    print("✓ Listo tras reintentar")
+else:
+    print(f"✗ Sin recuperarse: {warmup.status()}")
+    failed = True
+
+sys.exit(1 if failed else 0)